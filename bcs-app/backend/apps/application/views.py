@@ -30,6 +30,7 @@ from backend.apps.configuration.models import Template, VersionedEntity, ShowVer
 from backend.apps.instance.models import (
     VersionInstance, InstanceConfig, InstanceEvent, MetricConfig
 )
+from backend.utils.concurrency import fan_out
 from backend.utils.errcodes import ErrorCode
 from backend.apps.application.base_views import BaseAPI, error_codes, InstanceAPI
 from backend.apps.configuration.models import MODULE_DICT
@@ -323,45 +324,50 @@ class GetMusterTemplate(BaseMusterMetric):
         """针对deployment获取对应的application
         """
         ret_data = {}
-        for cluster_id, val in cluster_ns_inst.items():
-            if val.get("deployment"):
-                flag, resp = self.get_app_deploy_with_post(
-                    request, project_id, cluster_id, ",".join(set(val["deployment"]["inst_list"])),
-                    category=DEPLOYMENT_CATEGORY, project_kind=kind,
-                    namespace=",".join(set(val["deployment"]["ns_list"])),
-                    field="data.application,data.application_ext,data.metadata"
-                )
-                if not flag:
-                    raise error_codes.APIError.f(resp.data.get("message"))
-                # 组装数据
-                for val in resp.get("data") or []:
-                    metadata = val.get("data", {}).get("metadata", {})
-                    application = val.get("data", {}).get("application", {})
-                    application_ext = val.get("data", {}).get("application_ext", {})
-                    item_name = []
-                    ns_list = []
-                    if application:
-                        item_name.append(application.get("name"))
-                    if application_ext:
-                        item_name.append(application_ext.get("name"))
-                    ns_list.append(metadata.get("namespace"))
-                    if cluster_ns_inst[cluster_id].get("application"):
-                        cluster_ns_inst[cluster_id]["application"]["inst_list"].extend(item_name)
-                        cluster_ns_inst[cluster_id]["application"]["ns_list"].extend(ns_list)
-                    else:
-                        cluster_ns_inst[cluster_id].update({
-                            "application": {
-                                "inst_list": item_name,
-                                "ns_list": ns_list
-                            }
-                        })
-                    # 组装deployment和applcation的关系
-                    if application:
-                        key_name = "application:%s" % application.get("name")
-                        ret_data[key_name] = "deployment:%s" % metadata.get("name")
-                    if application_ext:
-                        key_name = "application:%s" % application_ext.get("name")
-                        ret_data[key_name] = "deployment:%s" % metadata.get("name")
+        # 并发查询各集群的deployment
+        calls = {
+            cluster_id: (
+                request, project_id, cluster_id, ",".join(set(val["deployment"]["inst_list"])),
+                DEPLOYMENT_CATEGORY, kind, ",".join(set(val["deployment"]["ns_list"])),
+                "data.application,data.application_ext,data.metadata",
+            )
+            for cluster_id, val in cluster_ns_inst.items()
+            if val.get("deployment")
+        }
+        results = fan_out(self.get_app_deploy_with_post, calls)
+        results.raise_for_error()
+        for cluster_id, (flag, resp) in results.succeeded.items():
+            if not flag:
+                raise error_codes.APIError.f(resp.data.get("message"))
+            # 组装数据
+            for val in resp.get("data") or []:
+                metadata = val.get("data", {}).get("metadata", {})
+                application = val.get("data", {}).get("application", {})
+                application_ext = val.get("data", {}).get("application_ext", {})
+                item_name = []
+                ns_list = []
+                if application:
+                    item_name.append(application.get("name"))
+                if application_ext:
+                    item_name.append(application_ext.get("name"))
+                ns_list.append(metadata.get("namespace"))
+                if cluster_ns_inst[cluster_id].get("application"):
+                    cluster_ns_inst[cluster_id]["application"]["inst_list"].extend(item_name)
+                    cluster_ns_inst[cluster_id]["application"]["ns_list"].extend(ns_list)
+                else:
+                    cluster_ns_inst[cluster_id].update({
+                        "application": {
+                            "inst_list": item_name,
+                            "ns_list": ns_list
+                        }
+                    })
+                # 组装deployment和applcation的关系
+                if application:
+                    key_name = "application:%s" % application.get("name")
+                    ret_data[key_name] = "deployment:%s" % metadata.get("name")
+                if application_ext:
+                    key_name = "application:%s" % application_ext.get("name")
+                    ret_data[key_name] = "deployment:%s" % metadata.get("name")
         return ret_data
 
     def get_inst_status_for_tmpl(self, request, cluster_ns_inst, project_id, kind, application_deploy_map):
@@ -369,42 +375,26 @@ class GetMusterTemplate(BaseMusterMetric):
         """
         # 根据application查询状态，如果有异常则计数异常数量
         ret_data = {}
-        for cluster_id, info in cluster_ns_inst.items():
-            if not info.get("application"):
-                continue
-            flag, resp = self.get_app_deploy_with_post(
-                request, project_id, cluster_id, ",".join(set(info["application"]["inst_list"])),
-                category=APPLICATION_CATEGORY, project_kind=kind,
-                namespace=",".join(set(info["application"]["ns_list"]))
-            )
-            if not flag:
-                raise error_codes.APIError.f(resp.data.get("message"))
-            for val in resp.get("data", []):
-                data = val.get("data", {})
-                metadata = data.get("metadata", {})
-                # 按照名称进行过滤
-                key_name = "application:%s" % metadata.get("name")
-                if data.get("status") in app_constants.UNNORMAL_STATUS:
-                    if key_name not in ret_data:
-                        ret_data[key_name] = 1
-                    else:
-                        ret_data[key_name] += 1
-        # 处理deployment状态
-        for cluster_id, info in cluster_ns_inst.items():
-            if not info.get("deployment"):
-                continue
-            flag, resp = self.get_app_deploy_with_post(
-                request, project_id, cluster_id, ",".join(set(info["deployment"]["inst_list"])),
-                category=DEPLOYMENT_CATEGORY, project_kind=kind,
-                namespace=",".join(set(info["deployment"]["ns_list"]))
-            )
+        # 并发查询各集群的application和deployment状态
+        calls = {}
+        for category in [APPLICATION_CATEGORY, DEPLOYMENT_CATEGORY]:
+            for cluster_id, info in cluster_ns_inst.items():
+                if not info.get(category):
+                    continue
+                calls[(category, cluster_id)] = (
+                    request, project_id, cluster_id, ",".join(set(info[category]["inst_list"])),
+                    category, kind, ",".join(set(info[category]["ns_list"])),
+                )
+        results = fan_out(self.get_app_deploy_with_post, calls)
+        results.raise_for_error()
+        for (category, cluster_id), (flag, resp) in results.succeeded.items():
             if not flag:
                 raise error_codes.APIError.f(resp.data.get("message"))
             for val in resp.get("data", []):
                 data = val.get("data", {})
                 metadata = data.get("metadata", {})
                 # 按照名称进行过滤
-                key_name = "deployment:%s" % metadata.get("name")
+                key_name = "%s:%s" % (category, metadata.get("name"))
                 if data.get("status") in app_constants.UNNORMAL_STATUS:
                     if key_name not in ret_data:
                         ret_data[key_name] = 1
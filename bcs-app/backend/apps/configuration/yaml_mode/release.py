@@ -12,15 +12,31 @@
 # specific language governing permissions and limitations under the License.
 #
 import datetime
+import hashlib
 
 import jinja2
 from dataclasses import dataclass
+from django.conf import settings
 from rest_framework.exceptions import ParseError
 
 from backend.apps.configuration.constants import FileResourceName
 from backend.apps.configuration.models import ShowVersion
 from backend.bcs_k8s.app import bcs_info_injector
 from backend.bcs_k8s.helm import bcs_variable
+from backend.utils.cache import LocalTTLCache
+
+# 与 jinja2.Template 使用相同的默认配置
+jinja_env = jinja2.Environment()
+# 编译后的模板按文件内容缓存，同一版本发布到多个命名空间时只编译一次
+compiled_template_cache = LocalTTLCache(
+    ttl=getattr(settings, "YAML_TEMPLATE_CACHE_TTL", 3600),
+    maxsize=getattr(settings, "YAML_TEMPLATE_CACHE_MAXSIZE", 512),
+)
+
+
+def get_compiled_template(raw_content):
+    key = hashlib.sha1(raw_content.encode("utf-8")).hexdigest()
+    return compiled_template_cache.get_or_set(key, lambda: jinja_env.from_string(raw_content))
 
 
 @dataclass
@@ -54,7 +70,7 @@ class ReleaseDataProcessor:
         return sys_variables
 
     def _render_with_variables(self, raw_content, bcs_variables):
-        t = jinja2.Template(raw_content)
+        t = get_compiled_template(raw_content)
         return t.render(bcs_variables)
 
     def _set_namespace(self, resources):
@@ -13,15 +13,26 @@
 #
 import logging
 import math
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
 
 from backend.apps.constants import NodeStatus
 from backend.apps.instance.models import InstanceConfig, VersionInstance, InstanceEvent, MetricConfig
 from backend.components import paas_cc
 from backend.utils.exceptions import Rollback, APIError, ConfigError
 from backend.apps.instance.constants import EventType, InsState
+from backend.utils.concurrency import fan_out
 
 logger = logging.getLogger(__name__)
 
+# 是否并发实例化多个命名空间，及最大并发数
+INSTANTIATION_CONCURRENT = getattr(settings, "INSTANTIATION_CONCURRENT", True)
+INSTANTIATION_MAX_WORKERS = getattr(settings, "INSTANTIATION_MAX_WORKERS", 10)
+# 单个集群同时进行中的下发请求数上限
+CLUSTER_MAX_INFLIGHT = getattr(settings, "INSTANTIATION_CLUSTER_MAX_INFLIGHT", 5)
+
 
 class ClusterNotReady(Exception):
     pass
@@ -57,6 +68,8 @@ class SchedulerBase(object):
         self.configuration = configuration
         self.plugin_client = SchedulerPluginCC(access_token, project_id)
         self.rollback_stack = {}
+        # 集群维度的并发控制
+        self.cluster_semaphores = {}
         self.kind = kind
         # 所有的操作都不回滚 2018-08-22
         self.is_rollback = False
@@ -105,7 +118,8 @@ class SchedulerBase(object):
                 # if ref.ins_state == InsState.INS_SUCCESS.value and not is_update:
                 #     continue
                 try:
-                    handler(ns, cluster_id, spec["config"])
+                    with self.cluster_slot(cluster_id):
+                        handler(ns, cluster_id, spec["config"])
                     if is_update:
                         ins_state = InsState.UPDATE_SUCCESS.value
                         # queryset.update(ins_state=InsState.UPDATE_SUCCESS.value, is_bcs_success=True)
@@ -149,68 +163,115 @@ class SchedulerBase(object):
         if len(normal_nodes) == 0:
             raise ClusterNotReady("没有可用节点，请添加或启用节点")
 
-    def instantiation(self, is_update=False):
-        """实例化
+    def check_clusters_ready(self):
+        """实例化前置检查，同一集群只检查一次
         """
-        instantiation_result = {"success": [], "failed": []}
+        checked_clusters = set()
         for ns_id, config in self.configuration.items():
             cluster_id = [i for i in config.values()][0][0]["context"]["SYS_CLUSTER_ID"]
             ns_name = [i for i in config.values()][0][0]["context"]["SYS_NAMESPACE"]
+            if cluster_id in checked_clusters:
+                continue
             try:
-                # 前置检查
                 self.cluster_ready(cluster_id)
             except ClusterNotReady as error:
                 logger.warning("bcs_instantiation failed, cluster not ready %s", error)
                 raise APIError("初始化失败，%s绑定的集群(%s) %s" % (ns_name, cluster_id, error))
+            checked_clusters.add(cluster_id)
 
-        for ns_id, config in self.configuration.items():
-            instance_id = [i for i in config.values()][0][0]["context"]["SYS_INSTANCE_ID"]
-            ns_name = [i for i in config.values()][0][0]["context"]["SYS_NAMESPACE"]
-            ns = {"ns_id": ns_id, "ns_name": ns_name, "instance_id": instance_id, "res_type": "", "err_msg": ""}
-            bcs_success = True
-            try:
-                self.instantiation_ns(ns_id, config, is_update)
-            except Rollback as error:
-                if self.is_rollback and (not is_update):
-                    self.handler_rollback(ns_id)
-                ns["res_type"] = error.args[0]["res_type"]
-                ns["err_msg"] = error.args[0].get("message", "")
-                bcs_success = False
-                logger.warning("bcs_api: error, %s, add failed to result %s", ns, instantiation_result)
-            except ConfigError as error:
-                if self.is_rollback and (not is_update):
-                    self.handler_rollback(ns_id)
-                bcs_success = False
-                ns["err_msg"] = str(error)
-                ns["show_err_msg"] = True
-                logger.exception("bcs_api: %s, instantiation error, %s", ns, error)
-                logger.warning("bcs_api: exception, %s, add failed to result %s", ns, instantiation_result)
-            except Exception as error:
-                if self.is_rollback and (not is_update):
-                    self.handler_rollback(ns_id)
-                bcs_success = False
-                ns["err_msg"] = str(error)
-                logger.exception("bcs_api: %s, instantiation error, %s", ns, error)
-                logger.warning("bcs_api: exception, %s, add failed to result %s", ns, instantiation_result)
-
-            # 统一修改状态
-            try:
-                VersionInstance.objects.filter(pk=instance_id).update(is_bcs_success=bcs_success)
-                # InstanceConfig.objects.filter(instance_id=instance_id).update(
-                #     is_bcs_success=bcs_success)
-                # MetricConfig.objects.filter(instance_id=instance_id).update(
-                #     is_bcs_success=bcs_success)
-            except Exception:
-                logging.exception("save is_bcs_success error")
-
-            if bcs_success is False:
+    @contextmanager
+    def cluster_slot(self, cluster_id):
+        """限制单个集群同时进行中的请求数
+        """
+        with self.cluster_semaphores.setdefault(cluster_id, threading.BoundedSemaphore(CLUSTER_MAX_INFLIGHT)):
+            yield
+
+    def instantiation(self, is_update=False, concurrent=None):
+        """实例化
+
+        :param concurrent: 是否并发实例化多个命名空间，为 None 时使用配置 INSTANTIATION_CONCURRENT
+        """
+        self.check_clusters_ready()
+
+        if concurrent is None:
+            concurrent = INSTANTIATION_CONCURRENT
+        if concurrent and len(self.configuration) > 1:
+            # 命名空间之间相互独立，并发下发；同一命名空间内仍按 INIT_ORDERING 顺序执行
+            # 不设置超时，避免放弃执行中的下发导致状态不一致
+            results = fan_out(
+                self.instantiation_ns_with_state,
+                {ns_id: (ns_id, config, is_update) for ns_id, config in self.configuration.items()},
+                max_workers=INSTANTIATION_MAX_WORKERS,
+                timeout=None,
+            )
+            ns_results = []
+            for ns_id, config in self.configuration.items():
+                result = results[ns_id]
+                if result.ok:
+                    ns_results.append(result.data)
+                else:
+                    ns = self.make_ns_result(ns_id, config)
+                    ns["err_msg"] = str(result.exc)
+                    ns["bcs_success"] = False
+                    ns_results.append(ns)
+        else:
+            ns_results = [
+                self.instantiation_ns_with_state(ns_id, config, is_update)
+                for ns_id, config in self.configuration.items()
+            ]
+
+        instantiation_result = {"success": [], "failed": []}
+        for ns in ns_results:
+            if ns.pop("bcs_success") is False:
                 instantiation_result["failed"].append(ns)
             else:
                 instantiation_result["success"].append(ns)
-            logger.info("bcs_api: instantiation_result, %s", instantiation_result)
-
+        logger.info("bcs_api: instantiation_result, %s", instantiation_result)
         return instantiation_result
 
+    def make_ns_result(self, ns_id, config):
+        instance_id = [i for i in config.values()][0][0]["context"]["SYS_INSTANCE_ID"]
+        ns_name = [i for i in config.values()][0][0]["context"]["SYS_NAMESPACE"]
+        return {"ns_id": ns_id, "ns_name": ns_name, "instance_id": instance_id, "res_type": "", "err_msg": ""}
+
+    def instantiation_ns_with_state(self, ns_id, config, is_update):
+        """单个命名空间实例化，失败时回滚该命名空间，并更新实例的下发状态
+        """
+        ns = self.make_ns_result(ns_id, config)
+        instance_id = ns["instance_id"]
+        bcs_success = True
+        try:
+            self.instantiation_ns(ns_id, config, is_update)
+        except Rollback as error:
+            if self.is_rollback and (not is_update):
+                self.handler_rollback(ns_id)
+            ns["res_type"] = error.args[0]["res_type"]
+            ns["err_msg"] = error.args[0].get("message", "")
+            bcs_success = False
+            logger.warning("bcs_api: error, %s, add failed to result", ns)
+        except ConfigError as error:
+            if self.is_rollback and (not is_update):
+                self.handler_rollback(ns_id)
+            bcs_success = False
+            ns["err_msg"] = str(error)
+            ns["show_err_msg"] = True
+            logger.exception("bcs_api: %s, instantiation error, %s", ns, error)
+        except Exception as error:
+            if self.is_rollback and (not is_update):
+                self.handler_rollback(ns_id)
+            bcs_success = False
+            ns["err_msg"] = str(error)
+            logger.exception("bcs_api: %s, instantiation error, %s", ns, error)
+
+        # 统一修改状态
+        try:
+            VersionInstance.objects.filter(pk=instance_id).update(is_bcs_success=bcs_success)
+        except Exception:
+            logging.exception("save is_bcs_success error")
+
+        ns["bcs_success"] = bcs_success
+        return ns
+
     def handler_rollback(self, ns_id):
         """
         """
@@ -16,8 +16,21 @@
 """
 import copy
 import collections
+import hashlib
+
+from django.conf import settings
 from django.template import Context, Template
 
+from backend.utils.cache import LocalTTLCache
+
+# 编译后的模板缓存，key 为模板内容的摘要
+compiled_template_cache = LocalTTLCache(
+    ttl=getattr(settings, "COMPILED_TEMPLATE_CACHE_TTL", 3600),
+    maxsize=getattr(settings, "COMPILED_TEMPLATE_CACHE_MAXSIZE", 1024),
+)
+# 模板语法的起始标记，内容中不包含时无需渲染
+TEMPLATE_TAG_MARKERS = ("{{", "{%", "{#")
+
 
 def update_nested_dict(orginal_dict, update_dict):
     """
@@ -31,8 +44,21 @@ def update_nested_dict(orginal_dict, update_dict):
     return new_dict
 
 
+def get_compiled_template(content):
+    """获取编译后的模板，相同内容的模板只编译一次
+    """
+    key = hashlib.md5(content.encode("utf-8")).hexdigest()
+    return compiled_template_cache.get_or_set(
+        key, lambda: Template(f"{{% autoescape off %}}{content}{{% endautoescape %}}")
+    )
+
+
 def render_mako_context(content, context):
     """通过mako模板做变量替换
     note: 所有的变量必须添加到 context 中
     """
-    return Template(f"{{% autoescape off %}}{content}{{% endautoescape %}}").render(Context(context))
+    content = str(content)
+    # 不包含模板语法时，渲染结果和原内容一致
+    if not any(marker in content for marker in TEMPLATE_TAG_MARKERS):
+        return content
+    return get_compiled_template(content).render(Context(context))
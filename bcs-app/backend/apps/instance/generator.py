@@ -91,6 +91,7 @@ from backend.apps.instance.constants import (
 )
 from backend.utils.func_controller import get_func_controller
 from backend.apps.instance.utils_pub import get_cluster_version
+from backend.utils.concurrency import fan_out
 from backend.apps.ticket.models import TlsCert
 from backend.apps.instance.resources.utils import handle_number_var
 from backend.apps.instance import constants as instance_constants
@@ -138,6 +139,8 @@ class ProfileGenerator:
         self.template_id = params.get("template_id")
         self.is_preview = params.get("is_preview") or False
         self.has_image_secret = params.get("has_image_secret") or False
+        # 同一次实例化中共享的上下文查询结果
+        self.inst_context = params.get("inst_context") or InstantiationContext(self.access_token, self.project_id)
 
         now_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.context = {
@@ -161,8 +164,7 @@ class ProfileGenerator:
             self.context.update(ns_context)
         self.cluster_version = params.get("cluster_version")
         if not self.cluster_version:
-            cluster_id = self.context["SYS_CLUSTER_ID"]
-            self.cluster_version = get_cluster_version(self.access_token, self.project_id, cluster_id)
+            self.cluster_version = self.inst_context.get_cluster_version(self.context["SYS_CLUSTER_ID"])
 
         self.resource_show_name = ""
         self.resource = None
@@ -244,27 +246,8 @@ class ProfileGenerator:
     def get_ns_variable(self):
         """获取命名空间相关的变量信息
         """
-        # 获取命名空间的信息
-        resp = paas_cc.get_namespace(self.access_token, self.project_id, self.namespace_id)
-        if resp.get("code") != 0:
-            raise ValidationError(
-                "{}(namespace_id:{}):{}".format(_("查询命名空间的信息出错"), self.namespace_id, resp.get("message"))
-            )
-        data = resp.get("data")
-        self.context["SYS_CLUSTER_ID"] = data.get("cluster_id")
-        self.context["SYS_NAMESPACE"] = data.get("name")
-        self.has_image_secret = data.get("has_image_secret")
-        # 获取镜像地址
-        self.context["SYS_JFROG_DOMAIN"] = paas_cc.get_jfrog_domain(
-            self.access_token, self.project_id, self.context["SYS_CLUSTER_ID"]
-        )
-
-        self.context["SYS_IMAGE_REGISTRY_LIST"] = paas_cc.get_image_registry_list(
-            self.access_token, self.context["SYS_CLUSTER_ID"]
-        )
-
-        bcs_context = get_bcs_context(self.access_token, self.project_id)
-        self.context.update(bcs_context)
+        self.has_image_secret, ns_context = self.inst_context.get_ns_context(self.namespace_id)
+        self.context.update(ns_context)
 
     def format_config_profile(self, config_profile):
         return config_profile
@@ -1127,6 +1110,98 @@ def get_bcs_context(access_token, project_id):
     return context
 
 
+class InstantiationContext:
+    """一次实例化过程中共享的上下文
+
+    模板集实例化到多个命名空间时，各资源的 ProfileGenerator 共享该对象，
+    命名空间、集群、项目相关的信息只查询一次
+    """
+
+    def __init__(self, access_token, project_id):
+        self.access_token = access_token
+        self.project_id = project_id
+        self._namespaces = {}
+        self._cluster_contexts = {}
+        self._cluster_versions = {}
+        self._bcs_context = None
+
+    def prefetch(self, namespace_id_list):
+        """并发预取所有命名空间及其所属集群的信息
+        """
+        ns_results = fan_out(self._query_namespace, {ns_id: (ns_id,) for ns_id in namespace_id_list})
+        for ns_id, result in ns_results.items():
+            # 查询失败时不缓存，实际使用时再抛出异常
+            if result.ok:
+                self._namespaces[ns_id] = result.data
+
+        cluster_id_list = {ns["cluster_id"] for ns in self._namespaces.values()} - set(self._cluster_contexts)
+        cluster_results = fan_out(self._query_cluster_context, {cluster_id: (cluster_id,) for cluster_id in cluster_id_list})
+        self._cluster_contexts.update(cluster_results.succeeded)
+        version_results = fan_out(
+            self._query_cluster_version,
+            {cluster_id: (cluster_id,) for cluster_id in cluster_id_list if cluster_id not in self._cluster_versions},
+        )
+        self._cluster_versions.update(version_results.succeeded)
+        self.get_bcs_context()
+
+    def _query_namespace(self, namespace_id):
+        resp = paas_cc.get_namespace(self.access_token, self.project_id, namespace_id)
+        if resp.get("code") != 0:
+            raise ValidationError(
+                "{}(namespace_id:{}):{}".format(_("查询命名空间的信息出错"), namespace_id, resp.get("message"))
+            )
+        return resp.get("data")
+
+    def _query_cluster_context(self, cluster_id):
+        return {
+            "SYS_JFROG_DOMAIN": paas_cc.get_jfrog_domain(self.access_token, self.project_id, cluster_id),
+            "SYS_IMAGE_REGISTRY_LIST": paas_cc.get_image_registry_list(self.access_token, cluster_id),
+        }
+
+    def _query_cluster_version(self, cluster_id):
+        return get_cluster_version(self.access_token, self.project_id, cluster_id)
+
+    def get_namespace(self, namespace_id):
+        if namespace_id not in self._namespaces:
+            self._namespaces[namespace_id] = self._query_namespace(namespace_id)
+        return self._namespaces[namespace_id]
+
+    def get_cluster_context(self, cluster_id):
+        if cluster_id not in self._cluster_contexts:
+            self._cluster_contexts[cluster_id] = self._query_cluster_context(cluster_id)
+        return self._cluster_contexts[cluster_id]
+
+    def get_cluster_version(self, cluster_id):
+        if cluster_id not in self._cluster_versions:
+            self._cluster_versions[cluster_id] = self._query_cluster_version(cluster_id)
+        return self._cluster_versions[cluster_id]
+
+    def get_bcs_context(self):
+        if self._bcs_context is None:
+            self._bcs_context = get_bcs_context(self.access_token, self.project_id)
+        return self._bcs_context
+
+    def get_ns_context(self, namespace_id):
+        """获取命名空间相关的变量
+
+        :return: (has_image_secret, context)
+        """
+        data = self.get_namespace(namespace_id)
+        cluster_id = data.get("cluster_id")
+        context = {"SYS_CLUSTER_ID": cluster_id, "SYS_NAMESPACE": data.get("name")}
+        context.update(self.get_cluster_context(cluster_id))
+        context.update(self.get_bcs_context())
+        return data.get("has_image_secret"), context
+
+    def get_ns_variable(self, namespace_id):
+        """获取命名空间相关的变量信息
+
+        :return: (has_image_secret, cluster_version, context)
+        """
+        has_image_secret, context = self.get_ns_context(namespace_id)
+        return has_image_secret, self.get_cluster_version(context["SYS_CLUSTER_ID"]), context
+
+
 def remove_key(d, key):
     if key in d:
         del d[key]
@@ -28,9 +28,8 @@ from backend.apps.configuration.models import CATE_ABBR_NAME, ShowVersion, Templ
 from backend.apps.constants import ALL_LIMIT
 from backend.apps.instance.constants import InsState
 from backend.apps.instance.drivers import get_scheduler_driver
-from backend.apps.instance.generator import GENERATOR_DICT, get_bcs_context
+from backend.apps.instance.generator import GENERATOR_DICT, InstantiationContext
 from backend.apps.instance.models import InstanceConfig, MetricConfig, VersionInstance
-from backend.apps.instance.utils_pub import get_cluster_version
 from backend.apps.whitelist_bk import enabled_hpa_feature
 from backend.components import paas_cc
 from backend.components.bcs.k8s import K8SClient
@@ -237,27 +236,11 @@ def validate_instance_entity(req_instance_entity, tem_instance_entity):
     return instance_entity
 
 
-def get_ns_variable(access_token, project_id, namespace_id):
+def get_ns_variable(access_token, project_id, namespace_id, inst_context=None):
     """获取命名空间相关的变量信息
     """
-    context = {}
-    # 获取命名空间的信息
-    resp = paas_cc.get_namespace(access_token, project_id, namespace_id)
-    if resp.get('code') != 0:
-        raise ValidationError('{}(namespace_id:{}):{}'.format(_("查询命名空间的信息出错"), namespace_id, resp.get('message')))
-    data = resp.get('data')
-    cluster_id = data.get('cluster_id')
-    context['SYS_CLUSTER_ID'] = cluster_id
-    context['SYS_NAMESPACE'] = data.get('name')
-    has_image_secret = data.get('has_image_secret')
-    # 获取镜像地址
-    context['SYS_JFROG_DOMAIN'] = paas_cc.get_jfrog_domain(access_token, project_id, context['SYS_CLUSTER_ID'])
-    context['SYS_IMAGE_REGISTRY_LIST'] = paas_cc.get_image_registry_list(access_token, cluster_id)
-    bcs_context = get_bcs_context(access_token, project_id)
-    context.update(bcs_context)
-    # k8s 集群获取集群版本信息
-    cluster_version = get_cluster_version(access_token, project_id, cluster_id)
-    return has_image_secret, cluster_version, context
+    inst_context = inst_context or InstantiationContext(access_token, project_id)
+    return inst_context.get_ns_variable(namespace_id)
 
 
 def generate_namespace_config(namespace_id, instance_entity, is_save, is_validate=True, **params):
@@ -271,7 +254,10 @@ def generate_namespace_config(namespace_id, instance_entity, is_save, is_validat
     # 查询命名空间相关的参数
     project_id = params.get('project_id')
     access_token = params.get('access_token')
-    has_image_secret, cluster_version, context = get_ns_variable(access_token, project_id, namespace_id)
+    # 同一次实例化的多个命名空间共享查询结果
+    inst_context = params.get('inst_context') or InstantiationContext(access_token, project_id)
+    params['inst_context'] = inst_context
+    has_image_secret, cluster_version, context = get_ns_variable(access_token, project_id, namespace_id, inst_context)
     params['has_image_secret'] = has_image_secret
     params['cluster_version'] = cluster_version
     params['context'] = context
@@ -381,6 +367,9 @@ def save_all_config(slz_data, access_token="", username="", is_update=False):
     show_version_id = slz_data['show_version_id']
     show_version_name = ShowVersion.objects.get(id=show_version_id).name
     configuration = {}
+    # 并发预取所有命名空间及集群的信息，避免逐个命名空间串行查询
+    inst_context = InstantiationContext(access_token, slz_data['project_id'])
+    inst_context.prefetch(ns_list)
     for ns in ns_list:
         if is_update:
             instance = VersionInstance.objects.filter(
@@ -423,7 +412,8 @@ def save_all_config(slz_data, access_token="", username="", is_update=False):
             "access_token": access_token,
             "username": username,
             "lb_info": slz_data.get('lb_info', {}),
-            "variable_dict": variable_dict
+            "variable_dict": variable_dict,
+            "inst_context": inst_context,
         }
         configuration[ns] = generate_namespace_config(
             ns, instance_entity, is_save=True, **params)
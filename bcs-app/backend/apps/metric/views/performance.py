@@ -44,25 +44,12 @@ class Cluster(base.MetricViewMixin, viewsets.ViewSet):
         else:
             dimensions = dimensions.split(",")
 
-        data = {}
-
-        # 其他维度数据动态请求
-        dimensions_func = {
-            "cpu_usage": prometheus.get_cluster_cpu_usage,
-            "mem_usage": prometheus.get_cluster_memory_usage,
-            "disk_usage": prometheus.get_cluster_disk_usage,
-            "mesos_memory_usage": prometheus.mesos_cluster_memory_usage,
-            "mesos_cpu_usage": prometheus.mesos_cluster_cpu_usage,
-        }
-
         for dimension in dimensions:
-            if dimension not in dimensions_func:
+            if dimension not in prometheus.CLUSTER_OVERVIEW_DIMENSIONS:
                 raise error_codes.APIError(_("dimension not valid"))
 
-            func = dimensions_func[dimension]
-            result = func(cluster_id, node_list)
-            data[dimension] = result
-
+        # 所有维度的查询合并后并发请求
+        data = prometheus.get_cluster_overview(cluster_id, node_list, dimensions)
         return response.Response(data)
 
     def cpu_usage(self, request, project_id, cluster_id):
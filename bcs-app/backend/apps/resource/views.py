@@ -51,6 +51,7 @@ from backend.apps.network.serializers import BatchResourceSLZ
 from backend.apps.application.constants import SOURCE_TYPE_MAP
 from backend.utils.renderers import BKAPIRenderer
 from backend.utils.basic import getitems
+from backend.utils.concurrency import fan_out
 from backend.apps import utils as app_utils
 from backend.apps.constants import ProjectKind
 from backend.apps.instance import constants as inst_constants
@@ -65,6 +66,23 @@ RE_COMPILE = re.compile(r'[^T.]+')
 MESOS_VALUE = ProjectKind.MESOS.value
 
 
+def is_k8s_page_mode(project_kind, params):
+    """k8s项目指定集群且传递limit时，按limit/continue分页查询，避免一次性加载集群下的全部资源
+    """
+    return project_kind != MESOS_VALUE and bool(params.get('cluster_id')) and bool(params.get('limit'))
+
+
+def validate_page_limit(params):
+    """分页查询时limit必须为正整数
+    """
+    try:
+        limit = int(params['limit'])
+    except (TypeError, ValueError):
+        limit = 0
+    if limit <= 0:
+        raise ValidationError(_("参数limit必须为正整数"))
+
+
 class ConfigMapBase:
 
     def k8s_configmaps(self, access_token, project_id, cluster_id, fields):
@@ -555,7 +573,10 @@ class ConfigMaps(viewsets.ViewSet, BaseAPI, ResourceOperate):
             })
             client = k8s.K8SClient(
                 access_token, project_id, cluster_id, env=None)
-            resp = client.get_configmap(params)
+            if is_k8s_page_mode(project_kind, params):
+                resp = client.get_configmap_page(params)
+            else:
+                resp = client.get_configmap(params)
 
         if resp.get("code") != ErrorCode.NoError:
             logger.error(u"bcs_api error: %s" % resp.get("message", ""))
@@ -584,17 +605,37 @@ class ConfigMaps(viewsets.ViewSet, BaseAPI, ResourceOperate):
         # get project namespace info
         namespace_dict = app_utils.get_ns_id_map(access_token, project_id)
 
+        page_mode = is_k8s_page_mode(project_kind, params)
+        continue_token = ''
+        if page_mode:
+            validate_page_limit(params)
+
+        # 并发查询各集群的数据
+        calls = {
+            cluster_info['cluster_id']: (request, copy.copy(params), project_id, cluster_info['cluster_id'], project_kind)
+            for cluster_info in cluster_data
+            # 当参数中集群ID存在时，只查询匹配的集群
+            if not params.get('cluster_id') or params['cluster_id'] == cluster_info.get('cluster_id')
+        }
+        cluster_results = fan_out(self.get_configmaps_by_cluster_id, calls)
+
+        failed_clusters = []
         for cluster_info in cluster_data:
             cluster_id = cluster_info.get('cluster_id')
-            # 当参数中集群ID存在时，判断集群ID匹配成功后，继续后续逻辑
-            if params.get('cluster_id') and params['cluster_id'] != cluster_id:
+            if cluster_id not in cluster_results:
                 continue
             cluster_env = cluster_info.get('environment')
-            code, cluster_configmaps = self.get_configmaps_by_cluster_id(
-                request, params, project_id, cluster_id, project_kind=project_kind)
-            # 单个集群错误时，不抛出异常信息
+            # 单个集群错误时，不抛出异常信息，记录在failed_clusters中返回
+            if not cluster_results[cluster_id].ok:
+                failed_clusters.append(cluster_id)
+                continue
+            code, cluster_configmaps = cluster_results[cluster_id].data
             if code != ErrorCode.NoError:
+                failed_clusters.append(cluster_id)
                 continue
+            if page_mode:
+                continue_token = cluster_configmaps['continue']
+                cluster_configmaps = cluster_configmaps['items']
             self.handle_data(request, cluster_configmaps, project_kind, s_cate,
                              access_token, project_id, cluster_id,
                              is_decode, cluster_env, cluster_info.get('name', ''), namespace_dict=namespace_dict)
@@ -603,12 +644,12 @@ class ConfigMaps(viewsets.ViewSet, BaseAPI, ResourceOperate):
         # 按时间倒序排列
         data.sort(key=lambda x: x.get('createTime', ''), reverse=True)
 
+        resp_data = {"data": data, "length": len(data), "failed_clusters": failed_clusters}
+        if page_mode:
+            resp_data["continue"] = continue_token
         return APIResponse({
             "code": ErrorCode.NoError,
-            "data": {
-                "data": data,
-                "length": len(data)
-            },
+            "data": resp_data,
             "message": "ok"
         })
 
@@ -682,7 +723,10 @@ class Secrets(viewsets.ViewSet, BaseAPI, ResourceOperate):
             })
             client = k8s.K8SClient(
                 access_token, project_id, cluster_id, env=None)
-            resp = client.get_secret(params)
+            if is_k8s_page_mode(project_kind, params):
+                resp = client.get_secret_page(params)
+            else:
+                resp = client.get_secret(params)
 
         if resp.get("code") != ErrorCode.NoError:
             logger.error(u"bcs_api error: %s" % resp.get("message", ""))
@@ -710,17 +754,37 @@ class Secrets(viewsets.ViewSet, BaseAPI, ResourceOperate):
         # get project namespace info
         namespace_dict = app_utils.get_ns_id_map(request.user.token.access_token, project_id)
 
+        page_mode = is_k8s_page_mode(project_kind, params)
+        continue_token = ''
+        if page_mode:
+            validate_page_limit(params)
+
+        # 并发查询各集群的数据
+        calls = {
+            cluster_info['cluster_id']: (request, copy.copy(params), project_id, cluster_info['cluster_id'], project_kind)
+            for cluster_info in cluster_data
+            # 当参数中集群ID存在时，只查询匹配的集群
+            if not params.get('cluster_id') or params['cluster_id'] == cluster_info.get('cluster_id')
+        }
+        cluster_results = fan_out(self.get_secrets_by_cluster_id, calls)
+
+        failed_clusters = []
         for cluster_info in cluster_data:
             cluster_id = cluster_info.get('cluster_id')
-            # 当参数中集群ID存在时，判断集群ID匹配成功后，继续后续逻辑
-            if params.get('cluster_id') and params['cluster_id'] != cluster_id:
+            if cluster_id not in cluster_results:
                 continue
             cluster_env = cluster_info.get('environment')
-            code, cluster_secrets = self.get_secrets_by_cluster_id(
-                request, params, project_id, cluster_id, project_kind=project_kind)
-            # 单个集群错误时，不抛出异常信息
+            # 单个集群错误时，不抛出异常信息，记录在failed_clusters中返回
+            if not cluster_results[cluster_id].ok:
+                failed_clusters.append(cluster_id)
+                continue
+            code, cluster_secrets = cluster_results[cluster_id].data
             if code != ErrorCode.NoError:
+                failed_clusters.append(cluster_id)
                 continue
+            if page_mode:
+                continue_token = cluster_secrets['continue']
+                cluster_secrets = cluster_secrets['items']
             self.handle_data(request, cluster_secrets, project_kind, s_cate,
                              access_token, project_id, cluster_id,
                              is_decode, cluster_env, cluster_info.get('name', ''), namespace_dict=namespace_dict)
@@ -728,12 +792,12 @@ class Secrets(viewsets.ViewSet, BaseAPI, ResourceOperate):
 
         # 按时间倒序排列
         data.sort(key=lambda x: x.get('createTime', ''), reverse=True)
+        resp_data = {"data": data, "length": len(data), "failed_clusters": failed_clusters}
+        if page_mode:
+            resp_data["continue"] = continue_token
         return APIResponse({
             "code": ErrorCode.NoError,
-            "data": {
-                "data": data,
-                "length": len(data)
-            },
+            "data": resp_data,
             "message": "ok"
         })
 
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""
+Usage: python manage.py init_variable_quotes [-p project_id]
+"""
+from django.core.management.base import BaseCommand
+
+from backend.apps.variable.utils import rebuild_variable_quotes
+
+
+class Command(BaseCommand):
+    help = u"初始化模板集中变量的引用索引"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-p',
+            '--project_id',
+            action='store',
+            dest='project_id',
+            default='',
+            help='only rebuild quotes of the project',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_variable_quotes(options.get('project_id') or None)
+        self.stdout.write(self.style.SUCCESS('Successfully rebuild variable quotes of %s show versions' % count))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('variable', '0007_update_sys_vars'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VariableQuote',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_id', models.CharField(max_length=32, verbose_name='项目ID')),
+                ('key', models.CharField(max_length=255, verbose_name='KEY')),
+                ('template_id', models.IntegerField(verbose_name='模板集ID')),
+                ('show_version_id', models.IntegerField(db_index=True, verbose_name='可见版本ID')),
+                ('category', models.CharField(max_length=32, verbose_name='资源类型')),
+                ('resource_id', models.IntegerField(verbose_name='资源ID')),
+                ('resource_name', models.CharField(default='', max_length=255, verbose_name='资源名称')),
+                ('quote_key', models.CharField(max_length=255, verbose_name='引用字段')),
+                ('context', models.TextField(verbose_name='引用内容')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='variablequote',
+            index_together=set([('project_id', 'key')]),
+        ),
+    ]
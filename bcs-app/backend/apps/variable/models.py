@@ -317,3 +317,22 @@ class NameSpaceVariable(BaseModel):
                 'data': json.dumps({'value': var_dict.get(ns_id)})
             }
             cls.objects.update_or_create(ns_id=ns_id, var_id=var_id, defaults=defaults)
+
+
+class VariableQuote(models.Model):
+    """变量引用的倒排索引：变量 KEY -> 模板集/可见版本/资源/字段
+
+    模板集保存版本时更新，存量数据通过 init_variable_quotes 命令初始化
+    """
+    project_id = models.CharField(_("项目ID"), max_length=32)
+    key = models.CharField("KEY", max_length=255)
+    template_id = models.IntegerField(_("模板集ID"))
+    show_version_id = models.IntegerField(_("可见版本ID"), db_index=True)
+    category = models.CharField(_("资源类型"), max_length=32)
+    resource_id = models.IntegerField(_("资源ID"))
+    resource_name = models.CharField(_("资源名称"), max_length=255, default="")
+    quote_key = models.CharField(_("引用字段"), max_length=255)
+    context = models.TextField(_("引用内容"))
+
+    class Meta:
+        index_together = ("project_id", "key")
@@ -60,6 +60,10 @@ class ListVariableSLZ(serializers.ModelSerializer):
         search_type = self.context['search_type']
         if search_type == 'base':
             return 0
+        # 列表页批量查询引用数量，避免逐个变量查询
+        quote_nums = self.context.get('quote_nums')
+        if quote_nums is not None:
+            return quote_nums.get(obj.key, 0)
         return get_variable_quote_num(obj.key, self.context['project_id'])
 
     def get_name(self, obj):
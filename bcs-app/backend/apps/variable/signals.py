@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""模板集变更时维护变量引用索引
+"""
+import logging
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from backend.apps.configuration.constants import TemplateEditMode
+from backend.apps.configuration.models import ShowVersion, Template
+
+from .utils import delete_template_quotes, refresh_show_version_quotes
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=ShowVersion)
+def update_show_version_quotes(sender, instance, **kwargs):
+    # 索引更新失败不影响模板集的保存，可通过 init_variable_quotes 命令修复
+    try:
+        refresh_show_version_quotes(instance)
+    except Exception as error:
+        logger.exception("refresh variable quotes of show version %s error, %s", instance.id, error)
+
+
+@receiver(post_save, sender=Template)
+def delete_template_quotes_on_delete(sender, instance, **kwargs):
+    if not (instance.is_deleted or instance.edit_mode != TemplateEditMode.PageForm.value):
+        return
+    try:
+        delete_template_quotes(instance.id)
+    except Exception as error:
+        logger.exception("delete variable quotes of template %s error, %s", instance.id, error)
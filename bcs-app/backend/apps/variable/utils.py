@@ -11,19 +11,108 @@
 # an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 #
+import logging
 import re
+from typing import Dict, Iterable, List
 
-from backend.apps.configuration.utils import get_all_template_config
+from django.db import transaction
+from django.db.models import Count
+
+from backend.apps.configuration.constants import TemplateEditMode
+from backend.apps.configuration.models import MODULE_DICT, ShowVersion, Template, VersionedEntity
+from backend.apps.variable.models import VariableQuote
+
+logger = logging.getLogger(__name__)
+
+# 配置中引用了变量的字段，如 "image": "{{SYS_JFROG_DOMAIN}}/nginx"
+QUOTE_FIELD_PATTERN = re.compile(r'"([^"]+)":\s*"([^"]*{{[^"]*}}[^"]*)"')
+QUOTE_KEY_PATTERN = re.compile(r'{{([^{}"]+)}}')
+
+
+def parse_config_quotes(config: str) -> List[Dict]:
+    """解析配置中所有的变量引用，同一字段中多次引用同一变量只记录一次
+    """
+    quotes = []
+    for quote_key, context in QUOTE_FIELD_PATTERN.findall(config or ''):
+        for key in set(QUOTE_KEY_PATTERN.findall(context)):
+            quotes.append({'key': key, 'quote_key': quote_key, 'context': context})
+    return quotes
+
+
+def _build_show_version_quotes(template: Template, show_version: ShowVersion) -> List[VariableQuote]:
+    try:
+        ventity = VersionedEntity.objects.get(id=show_version.real_version_id)
+    except VersionedEntity.DoesNotExist:
+        return []
+
+    quote_list = []
+    for category, ids in ventity.get_entity().items():
+        id_list = ids.split(',') if ids else []
+        res_list = MODULE_DICT.get(category).objects.filter(id__in=id_list).values('id', 'name', 'config')
+        for resource in res_list:
+            for quote in parse_config_quotes(resource['config']):
+                quote_list.append(VariableQuote(
+                    project_id=template.project_id,
+                    template_id=template.id,
+                    show_version_id=show_version.id,
+                    category=category,
+                    resource_id=resource['id'],
+                    resource_name=resource['name'],
+                    **quote
+                ))
+    return quote_list
+
+
+def refresh_show_version_quotes(show_version: ShowVersion):
+    """重建单个可见版本的变量引用索引
+    """
+    template = Template.default_objects.filter(id=show_version.template_id).first()
+    quote_list = []
+    # 暂时不支持YAML模板，与 get_all_template_config 保持一致
+    if (
+        template
+        and not template.is_deleted
+        and not show_version.is_deleted
+        and template.edit_mode == TemplateEditMode.PageForm.value
+    ):
+        quote_list = _build_show_version_quotes(template, show_version)
+
+    with transaction.atomic():
+        VariableQuote.objects.filter(show_version_id=show_version.id).delete()
+        VariableQuote.objects.bulk_create(quote_list)
+
+
+def delete_template_quotes(template_id: int):
+    VariableQuote.objects.filter(template_id=template_id).delete()
+
+
+def rebuild_variable_quotes(project_id: str = None) -> int:
+    """全量重建变量引用索引，返回重建的可见版本数量
+    """
+    templates = Template.objects.filter(edit_mode=TemplateEditMode.PageForm.value)
+    quotes = VariableQuote.objects.all()
+    if project_id:
+        templates = templates.filter(project_id=project_id)
+        quotes = quotes.filter(project_id=project_id)
+    # 清理已删除模板集的索引
+    quotes.exclude(template_id__in=templates.values('id')).delete()
+
+    show_versions = ShowVersion.objects.filter(template_id__in=templates.values('id'))
+    for show_version in show_versions:
+        refresh_show_version_quotes(show_version)
+    return len(show_versions)
 
 
 def get_variable_quote_num(variable_key, project_id) -> int:
-    quote_num = 0
-    key_pattern = re.compile(r'"([^"]+)":\s*"([^"]*{{%s}}[^"]*)"' % variable_key)
-    template_configs = get_all_template_config(project_id)
+    return VariableQuote.objects.filter(project_id=project_id, key=variable_key).count()
 
-    for c in template_configs:
-        config_str = c.get('config')
-        match_list = key_pattern.findall(config_str)
-        quote_num += len(match_list)
 
-    return quote_num
+def get_variable_quote_nums(variable_keys: Iterable[str], project_id) -> Dict[str, int]:
+    """批量获取变量的引用数量
+    """
+    quote_nums = (
+        VariableQuote.objects.filter(project_id=project_id, key__in=list(variable_keys))
+        .values('key')
+        .annotate(num=Count('id'))
+    )
+    return {item['key']: item['num'] for item in quote_nums}
@@ -13,7 +13,6 @@
 #
 import time
 import json
-import re
 
 from django.db import transaction
 from django.utils import timezone
@@ -29,12 +28,12 @@ from .import_vars import import_vars
 from backend.accounts import bcs_perm
 from backend.activity_log import client
 from backend.utils.views import FinalizeResponseMixin
-from backend.apps.configuration.utils import get_all_template_info_by_project
-from backend.apps.variable.models import Variable, ClusterVariable, NameSpaceVariable
+from backend.apps.variable.models import Variable, ClusterVariable, NameSpaceVariable, VariableQuote
+from backend.apps.variable.utils import get_variable_quote_nums
 from backend.apps.instance.utils import validate_version_id
 from backend.apps.instance.constants import APPLICATION_ID_SEPARATOR
 from backend.apps.instance.serializers import VariableNamespaceSLZ
-from backend.apps.configuration.models import MODULE_DICT, VersionedEntity
+from backend.apps.configuration.models import CATE_SHOW_NAME, MODULE_DICT, ShowVersion, Template, VersionedEntity
 from backend.apps.configuration.utils import check_var_by_config
 from backend.apps.constants import ALL_LIMIT
 from backend.components import paas_cc
@@ -93,8 +92,11 @@ class ListCreateVariableView(generics.ListCreateAPIView):
 
         offset, limit = data['offset'], data['limit']
         variables = self.get_variables_by_search_params(data)
-        serializer = serializers.ListVariableSLZ(variables[offset:limit + offset], many=True,
-                                                 context={'search_type': data['type'], 'project_id': project_id})
+        page_variables = variables[offset:limit + offset]
+        context = {'search_type': data['type'], 'project_id': project_id}
+        if data['type'] != 'base':
+            context['quote_nums'] = get_variable_quote_nums([v.key for v in page_variables], project_id)
+        serializer = serializers.ListVariableSLZ(page_variables, many=True, context=context)
         num_of_variables = variables.count()
         return Response({
             'count': num_of_variables,
@@ -304,28 +306,27 @@ class VariableOverView(viewsets.ViewSet):
             raise ValidationError(u"not found")
         qs = qs.first()
         quote_list = []
-        all_template_info = get_all_template_info_by_project(project_id)
-        for tem in all_template_info:
-            config = tem.get('config') or ''
-
-            key_pattern = re.compile(
-                r'"([^"]+)":\s*"([^"]*{{%s}}[^"]*)"' % qs.key)
-            search_list = key_pattern.findall(config)
-
-            for _q in search_list:
-                quote_key = _q[0]
-                context = _q[1]
-                quote_list.append({
-                    "context": context,
-                    "quote_location": "%s/%s/%s/%s/%s" % (tem['template_name'], tem['show_version_name'],
-                                                          tem['category_name'], tem['resource_name'], quote_key),
-                    "key": qs.key,
-                    'template_id': tem['template_id'],
-                    'template_name': tem['template_name'],
-                    'show_version_id': tem['show_version_id'],
-                    'category': tem['category'],
-                    'resource_id': tem['resource_id'],
-                })
+        quotes = VariableQuote.objects.filter(project_id=project_id, key=qs.key).order_by('id')
+        tem_names = dict(
+            Template.objects.filter(id__in={q.template_id for q in quotes}).values_list('id', 'name')
+        )
+        show_version_names = dict(
+            ShowVersion.objects.filter(id__in={q.show_version_id for q in quotes}).values_list('id', 'name')
+        )
+        for _q in quotes:
+            template_name = tem_names.get(_q.template_id)
+            category_name = CATE_SHOW_NAME.get(_q.category, _q.category)
+            quote_list.append({
+                "context": _q.context,
+                "quote_location": "%s/%s/%s/%s/%s" % (template_name, show_version_names.get(_q.show_version_id),
+                                                      category_name, _q.resource_name, _q.quote_key),
+                "key": qs.key,
+                'template_id': _q.template_id,
+                'template_name': template_name,
+                'show_version_id': _q.show_version_id,
+                'category': _q.category,
+                'resource_id': _q.resource_id,
+            })
         # 添加模板集的权限信息
         if quote_list:
             perm = bcs_perm.Templates(request, project_id, bcs_perm.NO_RES)
@@ -14,6 +14,9 @@
 import re
 from collections import OrderedDict
 
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
 CLUSTER_IMPORT_TPL = ""
 
 DEFAULT_DASHBOARD_CTL_VERSION = "v1"
@@ -29,3 +32,7 @@ DASHBOARD_CTL_VERSION = OrderedDict(
         "v2": [re.compile(r"^[vV]?1\.18\.\S+$")],
     }
 )
+
+# Helm 执行超时时间，设置为10min
+HELM_TASK_TIMEOUT = timezone.timedelta(minutes=10)
+HELM_TASK_TIMEOUT_MESSAGE = _("Helm操作超时，请重试!")
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""
+对比 web console 终端输出记录新旧实现的吞吐，模拟持续高速输出(如 tail -f、进度条)
+"""
+import time
+
+import arrow
+from django.core.management.base import BaseCommand
+
+from backend.web_console import constants
+from backend.web_console.recorder import OutputRecorder
+from backend.web_console.utils import clean_bash_escape
+
+
+class LegacyRecorder:
+    """原 BCSClientBase.run 中的实现，仅用于对比"""
+
+    def __init__(self):
+        self.output_record = []
+        self.output_buffer = ""
+
+    def feed(self, msg):
+        self.output_buffer += msg
+        if constants.OUTPUT_LINE_BREAKER in self.output_buffer:
+            line_msg = self.output_buffer.split(constants.OUTPUT_LINE_BREAKER)
+            for i in line_msg[:-1]:
+                record = "%s: %s" % (arrow.now().strftime("%Y-%m-%d %H:%M:%S.%f"), clean_bash_escape(i))
+                self.output_record.append(record)
+            self.output_buffer = line_msg[-1]
+
+    def flush(self):
+        record = self.output_record[:]
+        self.output_record = []
+        return record
+
+
+def make_messages(count, lines, width, progress):
+    """progress 为 True 时模拟只有 \\r 没有换行的进度条输出"""
+    messages = []
+    for i in range(count):
+        if progress:
+            messages.append(f"\r\x1b[32m{i % 100:3d}%\x1b[0m " + "#" * (width - 6))
+        else:
+            line = f"\x1b[33m{i}\x1b[0m " + "x" * width
+            # 每条消息的末尾不完整，下一条消息补齐
+            messages.append((line + constants.OUTPUT_LINE_BREAKER) * lines + line[: width // 2])
+    return messages
+
+
+class Command(BaseCommand):
+    help = "benchmark web console output recorder"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=20000)
+        parser.add_argument("--lines", type=int, default=20, help="lines per message")
+        parser.add_argument("--width", type=int, default=120, help="chars per line")
+        parser.add_argument("--flush-every", type=int, default=5000, help="messages per record interval")
+        parser.add_argument("--progress", action="store_true", help="progress bar output without line breaks")
+
+    def run(self, recorder, messages, flush_every):
+        start = time.perf_counter()
+        records = 0
+        for index, msg in enumerate(messages, 1):
+            recorder.feed(msg)
+            if index % flush_every == 0:
+                records += len(recorder.flush())
+        records += len(recorder.flush())
+        return time.perf_counter() - start, records
+
+    def handle(self, *args, **options):
+        messages = make_messages(options["messages"], options["lines"], options["width"], options["progress"])
+        size = sum(len(i) for i in messages) / 1024 / 1024
+        self.stdout.write(f"messages: {options['messages']}, size: {size:.2f}MB")
+
+        for name, recorder in [("legacy", LegacyRecorder()), ("current", OutputRecorder())]:
+            cost, records = self.run(recorder, messages, options["flush_every"])
+            self.stdout.write(f"{name}: {cost:.3f}s, {size / cost:.2f}MB/s, {records} records")
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""
+对比 YAML 模式发布时渲染模板、解析和重新生成 manifest 的新旧实现耗时，模拟同一版本发布到多个命名空间
+"""
+import time
+
+import jinja2
+import yaml
+from django.core.management.base import BaseCommand
+
+from backend.apps.configuration.yaml_mode import release
+from backend.bcs_k8s.app import bcs_info_injector, utils
+
+
+def legacy_yaml_load(content):
+    return yaml.load(content, Loader=yaml.FullLoader)
+
+
+class LegacyNoAliasDumper(yaml.SafeDumper):
+    def ignore_aliases(self, data):
+        return True
+
+
+def legacy_yaml_dump(obj):
+    return yaml.dump(obj, default_flow_style=False, Dumper=LegacyNoAliasDumper)
+
+
+def make_template(documents, keys):
+    """每个文档为一个带变量的 Deployment，data 部分放大文档体积"""
+    docs = []
+    for i in range(documents):
+        env = "".join(f'        - name: KEY_{j}\n          value: "{{{{ value_{j % 10} }}}}-{j}"\n' for j in range(keys))
+        docs.append(
+            f"""apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: app-{i}
+  labels:
+    app: app-{i}
+spec:
+  replicas: {{{{ replicas }}}}
+  selector:
+    matchLabels:
+      app: app-{i}
+  template:
+    metadata:
+      labels:
+        app: app-{i}
+    spec:
+      containers:
+      - name: main
+        image: "{{{{ image }}}}:{{{{ tag }}}}"
+        env:
+{env}"""
+        )
+    return "---\n".join(docs)
+
+
+class Command(BaseCommand):
+    help = "benchmark yaml mode release rendering"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=20)
+        parser.add_argument("--keys", type=int, default=100, help="env items per document")
+        parser.add_argument("--namespaces", type=int, default=5)
+
+    def release(self, render, load, dump, raw_content, namespaces):
+        origin = bcs_info_injector.yaml_load, bcs_info_injector.yaml_dump
+        bcs_info_injector.yaml_load, bcs_info_injector.yaml_dump = load, dump
+        try:
+            start = time.perf_counter()
+            for i in range(namespaces):
+                variables = {"replicas": 1, "image": "nginx", "tag": str(i)}
+                variables.update({f"value_{j}": f"ns-{i}" for j in range(10)})
+                content = render(raw_content).render(variables)
+                resources = bcs_info_injector.parse_manifest(content)
+                bcs_info_injector.join_manifest(resources)
+            return time.perf_counter() - start
+        finally:
+            bcs_info_injector.yaml_load, bcs_info_injector.yaml_dump = origin
+
+    def handle(self, *args, **options):
+        raw_content = make_template(options["documents"], options["keys"])
+        self.stdout.write(f"template size: {len(raw_content) / 1024 / 1024:.2f}MB, libyaml: {yaml.__with_libyaml__}")
+
+        release.compiled_template_cache.clear()
+        cases = [
+            ("legacy", jinja2.Template, legacy_yaml_load, legacy_yaml_dump),
+            ("current", release.get_compiled_template, utils.yaml_load, utils.yaml_dump),
+        ]
+        for name, render, load, dump in cases:
+            cost = self.release(render, load, dump, raw_content, options["namespaces"])
+            self.stdout.write(f"{name}: {cost:.3f}s for {options['namespaces']} namespaces")
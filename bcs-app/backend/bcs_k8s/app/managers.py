@@ -18,10 +18,12 @@ from django.utils.crypto import get_random_string
 from django.db import models
 from rest_framework.serializers import ValidationError
 from django.db.models import Max
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 from backend.bcs_k8s.helm.constants import TEMPORARY_APP_ID, DEFAULT_VALUES_FILE_NAME
 from backend.bcs_k8s.helm.models import ChartVersionSnapshot, ChartRelease
+from .constants import HELM_TASK_TIMEOUT, HELM_TASK_TIMEOUT_MESSAGE
 from .deployer import AppDeployer
 from backend.activity_log import client
 
@@ -36,6 +38,14 @@ class AppManager(models.Manager):
         max_value = self.model.objects.all().aggregate(Max('unique_ns'))
         return max_value["unique_ns__max"]
 
+    def reconcile_timeout_apps(self):
+        """将超时仍处于执行中的 release 标记为失败，返回更新的数量"""
+        return self.filter(transitioning_on=True, updated__lt=timezone.now() - HELM_TASK_TIMEOUT).update(
+            transitioning_on=False,
+            transitioning_result=False,
+            transitioning_message=HELM_TASK_TIMEOUT_MESSAGE,
+        )
+
     def record_initialize_app(self, access_token, project_id, cluster_id, namespace_id, namespace,
                               chart_version, answers, customs, creator, updator, valuefile=None,
                               name=None, unique_ns=0, sys_variables=None,
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""Helm Release 资源状态
+
+直接通过 kubernetes client 查询 Release 中的资源，按资源类型批量查询，
+返回与 dashboard-ctl overview 兼容的状态结构
+"""
+import logging
+from collections import defaultdict
+from typing import Dict, List
+
+from backend.components.bcs.resources.configmap import ConfigMap
+from backend.components.bcs.resources.daemonset import DaemonSet
+from backend.components.bcs.resources.deployment import Deployment
+from backend.components.bcs.resources.event import Event
+from backend.components.bcs.resources.ingress import Ingress
+from backend.components.bcs.resources.job import Job
+from backend.components.bcs.resources.pod import Pod
+from backend.components.bcs.resources.pvc import PersistentVolumeClaim
+from backend.components.bcs.resources.secret import Secret
+from backend.components.bcs.resources.service import Service
+from backend.components.bcs.resources.statefulset import StatefulSet
+from backend.utils.basic import getitems
+
+logger = logging.getLogger(__name__)
+
+# 资源类型 -> (资源类, 按命名空间查询列表的方法名)
+RESOURCE_LIST_FUNCS = {
+    "deployment": (Deployment, "list_namespaced_deployment"),
+    "statefulset": (StatefulSet, "list_namespaced_stateful_set"),
+    "daemonset": (DaemonSet, "list_namespaced_daemon_set"),
+    "job": (Job, "list_namespaced_job"),
+    "service": (Service, "list_namespaced_service"),
+    "configmap": (ConfigMap, "list_namespaced_config_map"),
+    "secret": (Secret, "list_namespaced_secret"),
+    "ingress": (Ingress, "list_namespaced_ingress"),
+    "persistentvolumeclaim": (PersistentVolumeClaim, "list_namespaced_persistent_volume_claim"),
+}
+# 需要统计 pod 状态的资源类型
+WORKLOAD_KINDS = {"deployment", "statefulset", "daemonset", "job"}
+
+
+def match_selector(selector: Dict, labels: Dict) -> bool:
+    """判断 labels 是否满足 LabelSelector，空的 selector 不匹配任何资源
+    """
+    if not selector:
+        return False
+    match_labels = selector.get("matchLabels") or {}
+    match_expressions = selector.get("matchExpressions") or []
+    if not (match_labels or match_expressions):
+        return False
+    if any(labels.get(key) != value for key, value in match_labels.items()):
+        return False
+    for expr in match_expressions:
+        key, operator, values = expr["key"], expr["operator"], expr.get("values") or []
+        if operator == "In" and labels.get(key) not in values:
+            return False
+        if operator == "NotIn" and key in labels and labels[key] in values:
+            return False
+        if operator == "Exists" and key not in labels:
+            return False
+        if operator == "DoesNotExist" and key in labels:
+            return False
+    return True
+
+
+def get_desired_pods(kind: str, workload: Dict) -> int:
+    if kind == "daemonset":
+        return getitems(workload, ["status", "desiredNumberScheduled"], 0) or 0
+    if kind == "job":
+        return getitems(workload, ["spec", "completions"], None) or getitems(workload, ["spec", "parallelism"], 1) or 0
+    replicas = getitems(workload, ["spec", "replicas"], None)
+    return 1 if replicas is None else replicas
+
+
+def is_pod_ready(pod: Dict) -> bool:
+    conditions = getitems(pod, ["status", "conditions"], []) or []
+    return any(c.get("type") == "Ready" and c.get("status") == "True" for c in conditions)
+
+
+class ReleaseStatusCollector:
+    """查询 Release 中资源的状态
+
+    每类资源只查询一次命名空间下的列表，工作负载的 pod 和告警事件各查询一次
+    """
+
+    def __init__(self, api_client, namespace: str):
+        self.api_client = api_client
+        self.namespace = namespace
+
+    def list_resources(self, kind: str) -> List[Dict]:
+        resource_cls, func_name = RESOURCE_LIST_FUNCS[kind]
+        resource = resource_cls(self.api_client)
+        list_func = getattr(resource.api_instance, func_name)
+        return list(resource.iter_list_items(list_func, self.namespace))
+
+    def list_pods(self) -> List[Dict]:
+        pod = Pod(self.api_client)
+        return list(pod.iter_list_items(pod.api_instance.list_namespaced_pod, self.namespace))
+
+    def list_warning_events(self) -> Dict[str, List[Dict]]:
+        """查询命名空间下 pod 的告警事件，按 pod 名称分组
+        """
+        event = Event(self.api_client)
+        events = event.iter_list_items(
+            event.api_instance.list_namespaced_event,
+            self.namespace,
+            field_selector="type=Warning,involvedObject.kind=Pod",
+        )
+        pod_events = defaultdict(list)
+        for item in events:
+            pod_events[getitems(item, ["involvedObject", "name"], "")].append(item)
+        return pod_events
+
+    def make_pods_info(self, kind: str, workload: Dict, pods: List[Dict], pod_events: Dict) -> Dict:
+        selector = getitems(workload, ["spec", "selector"], {})
+        matched_pods = [p for p in pods if match_selector(selector, getitems(p, ["metadata", "labels"], {}) or {})]
+        phases = [getitems(p, ["status", "phase"], "") for p in matched_pods]
+        warnings = []
+        # 只展示未就绪 pod 的告警事件
+        for p in matched_pods:
+            if is_pod_ready(p):
+                continue
+            for event in pod_events.get(getitems(p, ["metadata", "name"], ""), []):
+                warnings.append(
+                    {
+                        "message": event.get("message", ""),
+                        "reason": event.get("reason", ""),
+                        "object": getitems(event, ["involvedObject", "name"], ""),
+                        "count": event.get("count", 0),
+                        "type": event.get("type", ""),
+                        "lastSeen": event.get("lastTimestamp", ""),
+                    }
+                )
+        return {
+            "current": len(matched_pods),
+            "desired": get_desired_pods(kind, workload),
+            "running": phases.count("Running"),
+            "pending": phases.count("Pending"),
+            "failed": phases.count("Failed"),
+            "succeeded": phases.count("Succeeded"),
+            "warnings": warnings,
+        }
+
+    def collect(self, structure: List[Dict]) -> Dict[tuple, Dict]:
+        """查询资源状态
+
+        :param structure: Release 中的资源列表，如 [{"kind": "Deployment", "name": "nginx"}]
+        :return: key 为 (kind, name)，value 为资源状态；资源不存在时为空字典
+        """
+        names_by_kind = defaultdict(set)
+        for item in structure:
+            names_by_kind[item["kind"].lower()].add(item["name"])
+
+        objects = {}
+        for kind, names in names_by_kind.items():
+            if kind not in RESOURCE_LIST_FUNCS:
+                continue
+            for obj in self.list_resources(kind):
+                name = getitems(obj, ["metadata", "name"], "")
+                if name in names:
+                    objects[(kind, name)] = obj
+
+        has_workload = any(kind in WORKLOAD_KINDS for kind, _ in objects)
+        pods = self.list_pods() if has_workload else []
+        pod_events = self.list_warning_events() if has_workload else {}
+
+        result = {}
+        for item in structure:
+            kind, name = item["kind"], item["name"]
+            key = (kind.lower(), name)
+            if key[0] not in RESOURCE_LIST_FUNCS:
+                # 暂不支持查询的资源类型，只返回基本信息
+                result[(kind, name)] = {"objectMeta": {"name": name, "namespace": self.namespace}, "typeMeta": {"kind": kind}}
+                continue
+            obj = objects.get(key)
+            if not obj:
+                result[(kind, name)] = {}
+                continue
+            status = {"objectMeta": obj.get("metadata", {}), "typeMeta": {"kind": kind}}
+            if key[0] in WORKLOAD_KINDS:
+                status["pods"] = self.make_pods_info(key[0], obj, pods, pod_events)
+            result[(kind, name)] = status
+        return result
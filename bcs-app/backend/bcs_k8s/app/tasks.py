@@ -11,12 +11,16 @@
 # an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 #
+import logging
+
 from django.conf import settings
 
 from celery import shared_task
 
 from .models import App
 
+logger = logging.getLogger(__name__)
+
 
 @shared_task
 def destroy_app(app_id, access_token, username):
@@ -46,6 +50,14 @@ def first_deploy(app_id, access_token, activity_log_id, deploy_options):
     )
 
 
+@shared_task
+def reconcile_timeout_apps():
+    """周期任务: 将执行超时的 release 标记为失败"""
+    count = App.objects.reconcile_timeout_apps()
+    if count:
+        logger.info("mark %s timeout helm apps as failed", count)
+
+
 def sync_or_async(task_method):
     if settings.HELM_SYNC_DO_DEPLOY:
         return getattr(task_method, "apply")
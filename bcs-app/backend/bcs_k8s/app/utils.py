@@ -27,12 +27,12 @@ from django.conf import settings
 
 from backend.bcs_k8s.helm.utils.util import fix_rancher_value_by_type, EmptyVaue
 from backend.utils.client import make_dashboard_ctl_client
-from backend.bcs_k8s.diff import parser
 from backend.bcs_k8s.dashboard.exceptions import DashboardExecutionError
 from backend.components import paas_cc, bcs
 from backend.utils.basic import get_bcs_component_version
 
 from .constants import DASHBOARD_CTL_VERSION, DEFAULT_DASHBOARD_CTL_VERSION
+from .status import ReleaseStatusCollector
 
 yaml.reader.Reader.NON_PRINTABLE = re.compile(
     '[^\x09\x0A\x0D\x20-\x7E\x85\xA0-\uD7FF\uE000-\uFFFD\U00010000-\U0010FFFF]'
@@ -61,14 +61,22 @@ def ruamel_yaml_dump(yaml_obj):
     return content
 
 
+# 优先使用 libyaml 实现的 loader/dumper，未编译 libyaml 时退回纯 Python 实现
+YAMLLoader = getattr(yaml, "CFullLoader", yaml.FullLoader)
+_SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+class NoAliasDumper(_SafeDumper):
+    def ignore_aliases(self, data):
+        return True
+
+
 def yaml_load(content):
-    return yaml.load(content)
+    return yaml.load(content, Loader=YAMLLoader)
 
 
 def yaml_dump(obj):
-    noalias_dumper = yaml.dumper.SafeDumper
-    noalias_dumper.ignore_aliases = lambda self, data: True
-    return yaml.dump(obj, default_flow_style=False, Dumper=noalias_dumper)
+    return yaml.dump(obj, default_flow_style=False, Dumper=NoAliasDumper)
 
 
 def sync_dict2yaml(obj_list, yaml_content):
@@ -266,78 +274,52 @@ def extract_state_info_from_dashboard_overview(overview_status, kind, namespace,
     return dict()
 
 
-def collect_resource_status(base_url, kubeconfig, app, project_code, bin_path=settings.DASHBOARD_CTL_BIN):
-    """
-    dashboard_client = make_dashboard_ctl_client(
-        kubeconfig=kubeconfig
-    )
-    """
+def status_sumary(status, app):
+    if not status and not app.transitioning_result:
+        return {
+            "messages": _("未找到资源，可能未部署成功，请在Helm Release列表也查看失败原因."),
+            "is_normal": False,
+            "desired_pods": "-",
+            "ready_pods": "-",
+        }
 
-    def status_sumary(status, app, bin_path=settings.DASHBOARD_CTL_BIN):
-        if not status and not app.transitioning_result:
-            return {
-                "messages": _("未找到资源，可能未部署成功，请在Helm Release列表也查看失败原因."),
-                "is_normal": False,
-                "desired_pods": "-",
-                "ready_pods": "-",
-            }
-
-        # 暂未实现该类资源状态信息
-        if "pods" not in status:
-            return {
-                "messages": "",
-                "is_normal": True,
-                "desired_pods": "-",
-                "ready_pods": "-",
-            }
-
-        messages = [item["message"] for item in status["pods"]["warnings"]]
-        messages = filter(lambda x: x, messages)
-
-        desired_pods = safe_get(status, "pods.desired", None)
-        ready_pods = safe_get(status, "pods.running", None)
-        data = {
-            "desired_pods": str(desired_pods),
-            "ready_pods": str(ready_pods),
-            "messages": "\n".join(messages),
-            "is_normal": desired_pods == ready_pods,
+    # 暂未实现该类资源状态信息
+    if "pods" not in status:
+        return {
+            "messages": "",
+            "is_normal": True,
+            "desired_pods": "-",
+            "ready_pods": "-",
         }
-        return data
 
+    messages = [item["message"] for item in status["pods"]["warnings"]]
+    messages = filter(lambda x: x, messages)
+
+    desired_pods = safe_get(status, "pods.desired", None)
+    ready_pods = safe_get(status, "pods.running", None)
+    data = {
+        "desired_pods": str(desired_pods),
+        "ready_pods": str(ready_pods),
+        "messages": "\n".join(messages),
+        "is_normal": desired_pods == ready_pods,
+    }
+    return data
+
+
+def format_resource_status(base_url, app, project_code, get_status):
+    """组装 Release 中各资源的状态
+
+    :param get_status: 根据 kind 和 name 获取资源状态的函数
+    """
     namespace = app.namespace
-    content = app.release.content
-    resources = parser.parse(content, app.namespace)
-    resources = resources.values()
     release_name = app.name
 
-    dashboard_overview = dashboard_get_overview(kubeconfig=kubeconfig, namespace=namespace, bin_path=bin_path)
-
     result = {}
     structure = app.release.extract_structure(namespace)
     for item in structure:
         kind = item["kind"]
         name = item["name"]
-
-        status = extract_state_info_from_dashboard_overview(
-            overview_status=dashboard_overview, kind=kind, namespace=namespace, name=name
-        )
-        """
-        status = {}
-        if kind.lower() in ["deployment", "replicaset", "daemonset",
-                            "job", "statefulset", "cronjob", "replicationcontroller"]:
-            try:
-                status = dashboard_client.workload_status(
-                    kind=kind,
-                    name=name,
-                    namespace=namespace,
-                    parameters=dict()
-                )
-            except DashboardExecutionError as e:
-                if "handler returned wrong status code: got 404 want 200" in e.output:
-                    pass
-                else:
-                    raise
-        """
+        status = get_status(kind, name)
 
         if status:
             link = resource_link(
@@ -367,6 +349,28 @@ def collect_resource_status(base_url, kubeconfig, app, project_code, bin_path=se
     return result
 
 
+def collect_resource_status(base_url, kubeconfig, app, project_code, bin_path=settings.DASHBOARD_CTL_BIN):
+    """通过 dashboard-ctl 查询整个命名空间的资源概览，获取 Release 中资源的状态
+    """
+    namespace = app.namespace
+    dashboard_overview = dashboard_get_overview(kubeconfig=kubeconfig, namespace=namespace, bin_path=bin_path)
+
+    def get_status(kind, name):
+        return extract_state_info_from_dashboard_overview(
+            overview_status=dashboard_overview, kind=kind, namespace=namespace, name=name
+        )
+
+    return format_resource_status(base_url, app, project_code, get_status)
+
+
+def collect_resource_status_native(base_url, api_client, app, project_code):
+    """通过 kubernetes client 只查询 Release 中的资源，获取资源状态
+    """
+    structure = app.release.extract_structure(app.namespace)
+    statuses = ReleaseStatusCollector(api_client, app.namespace).collect(structure)
+    return format_resource_status(base_url, app, project_code, lambda kind, name: statuses.get((kind, name), {}))
+
+
 def get_base_url(request):
     base_url = request.META.get("HTTP_REFERER") or request.META.get("HTTP_HOST")
     base_url = base_url.split("/console/bcs")[0]
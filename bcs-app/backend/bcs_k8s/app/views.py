@@ -19,7 +19,6 @@ import logging
 
 from operator import itemgetter
 from itertools import groupby
-import tempfile
 from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
@@ -33,10 +32,12 @@ from django.conf import settings
 from django.core.cache import cache
 from django.http import HttpResponse
 from django.db import IntegrityError
+from django.db.models import Case, CharField, F, Q, When
 from jinja2 import Template
 from django.template.loader import render_to_string
 from django.utils.translation import ugettext_lazy as _
 
+from .constants import HELM_TASK_TIMEOUT, HELM_TASK_TIMEOUT_MESSAGE
 from .models import App
 from .serializers import (
     AppSLZ,
@@ -72,7 +73,13 @@ from backend.utils.views import AccessTokenMixin, ProjectMixin, AppMixin, with_c
 from backend.bcs_k8s.authtoken.authentication import TokenAuthentication
 from backend.utils import client as bcs_utils_client
 from backend.components.bcs import k8s
-from .utils import collect_resource_state, collect_resource_status, get_base_url, resource_link
+from .utils import (
+    collect_resource_state,
+    collect_resource_status,
+    collect_resource_status_native,
+    get_base_url,
+    resource_link,
+)
 from backend.accounts import bcs_perm
 from backend.bcs_k8s.bke_client.client import BCSClusterNotFound, BCSClusterCredentialsNotFound
 from backend.bcs_k8s.dashboard.exceptions import DashboardError, DashboardExecutionError
@@ -81,11 +88,12 @@ from backend.utils.errcodes import ErrorCode
 from backend.bcs_k8s.app.serializers import FilterNamespacesSLZ
 from backend.bcs_k8s.app.utils_bk import get_or_create_private_repo
 from backend.resources.namespace.constants import K8S_SYS_PLAT_NAMESPACES
+from backend.resources.client import create_api_client
 
 logger = logging.getLogger(__name__)
 
-# Helm 执行超时时间，设置为10min
-HELM_TASK_TIMEOUT = timezone.timedelta(minutes=10)
+# Release 状态的查询方式，native: 通过 kubernetes client 查询；dashboard: 通过 dashboard-ctl 查询
+HELM_RELEASE_STATUS_ENGINE = getattr(settings, "HELM_RELEASE_STATUS_ENGINE", "native")
 
 
 class AppViewBase(AccessTokenMixin, ProjectMixin, viewsets.ModelViewSet):
@@ -131,62 +139,56 @@ class AppView(ActionSerializerMixin, AppViewBase):
                 raise ValidationError(_("命名空间作为过滤参数时，需要提供集群ID"))
             qs = qs.filter(namespace=namespace)
 
-        data = list(
-            qs.values(
-                "name",
-                "id",
-                "cluster_id",
-                "project_id",
-                "namespace",
-                "namespace_id",
-                "version",
-                "created",
-                "creator",
-                "chart__id",
-                "transitioning_action",
-                "transitioning_message",
-                "transitioning_on",
-                "transitioning_result",
-                "updated",
-                "updator",
+        # 过滤掉k8s系统和bcs平台命名空间下的release
+        qs = qs.exclude(namespace__in=K8S_SYS_PLAT_NAMESPACES)
+        # 历史数据中 version 可能为空，此时取 release 对应的 chart 版本
+        qs = qs.annotate(
+            current_version=Case(
+                When(Q(version__isnull=True) | Q(version=""), then=F("release__chartVersionSnapshot__version")),
+                default=F("version"),
+                output_field=CharField(),
             )
+        ).values(
+            "name",
+            "id",
+            "cluster_id",
+            "project_id",
+            "namespace",
+            "namespace_id",
+            "current_version",
+            "created",
+            "creator",
+            "chart__id",
+            "transitioning_action",
+            "transitioning_message",
+            "transitioning_on",
+            "transitioning_result",
+            "updated",
+            "updator",
         )
+        # 默认分页大小见 REST_FRAMEWORK.PAGE_SIZE，可通过 limit/offset 分页
+        data = self.paginate_queryset(qs)
 
-        # do fix on the data which version is emtpy
         datetime_format = "%Y-%m-%d %H:%M:%S"
+        now = timezone.now()
         app_list = []
         for item in data:
-            # 过滤掉k8s系统和bcs平台命名空间下的release
-            if item["namespace"] in K8S_SYS_PLAT_NAMESPACES:
-                continue
             cluster_info = project_cluster.get(item['cluster_id']) or {'name': item['cluster_id']}
             item['cluster_name'] = cluster_info['name']
             item['cluster_env'] = settings.CLUSTER_ENV_FOR_FRONT.get(cluster_info.get('environment'))
-            item["current_version"] = item.pop("version")
-            if not item["current_version"]:
-                version = App.objects.filter(id=item["id"]).values_list(
-                    "release__chartVersionSnapshot__version", flat=True
-                )[0]
-                App.objects.filter(id=item["id"]).update(version=version)
-                item["current_version"] = version
-
-            if item["transitioning_on"] and (timezone.now() - item["updated"]) > HELM_TASK_TIMEOUT:
-                App.objects.filter(id=item["id"]).update(
-                    transitioning_on=False,
-                    transitioning_result=False,
-                    transitioning_message=_("Helm操作超时，请重试!"),
-                )
+
+            # 超时状态由周期任务 reconcile_timeout_apps 落库，这里只调整展示
+            if item["transitioning_on"] and (now - item["updated"]) > HELM_TASK_TIMEOUT:
                 item["transitioning_result"] = False
                 item["transitioning_on"] = False
-                item["transitioning_message"] = _("Helm操作超时，请重试!")
+                item["transitioning_message"] = HELM_TASK_TIMEOUT_MESSAGE
 
             item["chart"] = item.pop("chart__id")
             item["created"] = item["created"].astimezone().strftime(datetime_format)
             item["updated"] = item["updated"].astimezone().strftime(datetime_format)
             app_list.append(item)
 
-        result = {"count": len(app_list), "next": None, "previous": None, "results": app_list}
-        return Response(data=result)
+        return self.get_paginated_response(app_list)
 
     def retrieve(self, request, *args, **kwargs):
         app_id = self.request.parser_context["kwargs"]["app_id"]
@@ -742,6 +744,28 @@ class AppStatusView(AppMixin, AccessTokenMixin, viewsets.ReadOnlyModelViewSet, P
     serializer_class = AppStateSLZ
     lookup_url_kwarg = "app_id"
 
+    def collect_status(self, app, base_url, project_code):
+        if HELM_RELEASE_STATUS_ENGINE == "native":
+            # 复用进程内缓存的 ApiClient，只查询 Release 中的资源
+            api_client = create_api_client(self.access_token, app.project_id, app.cluster_id)
+            return collect_resource_status_native(
+                base_url=base_url, api_client=api_client, app=app, project_code=project_code
+            )
+
+        # 获取dashboard对应的path
+        bin_path = get_helm_dashboard_path(
+            access_token=self.access_token, project_id=app.project_id, cluster_id=app.cluster_id
+        )
+        # 直接使用缓存的 kubeconfig 文件
+        with bcs_utils_client.make_kubectl_client(
+            access_token=self.access_token, project_id=app.project_id, cluster_id=app.cluster_id
+        ) as (client, err):
+            if err:
+                raise APIException(str(err))
+            return collect_resource_status(
+                base_url=base_url, kubeconfig=client.kubeconfig, app=app, project_code=project_code, bin_path=bin_path
+            )
+
     def retrieve(self, request, app_id, *args, **kwargs):
         app = App.objects.get(id=self.app_id)
 
@@ -766,23 +790,9 @@ class AppStatusView(AppMixin, AccessTokenMixin, viewsets.ReadOnlyModelViewSet, P
 
         check_cluster_perm(user=request.user, project_id=app.project_id, cluster_id=app.cluster_id, request=request)
 
-        kubeconfig = bcs_utils_client.get_kubectl_config_context(
-            access_token=self.access_token, project_id=app.project_id, cluster_id=app.cluster_id
-        )
-
-        # 获取dashboard对应的path
-        bin_path = get_helm_dashboard_path(
-            access_token=self.access_token, project_id=app.project_id, cluster_id=app.cluster_id
-        )
         base_url = get_base_url(request)
         try:
-            with tempfile.NamedTemporaryFile("w") as f:
-                f.write(kubeconfig)
-                f.flush()
-
-                data = collect_resource_status(
-                    base_url=base_url, kubeconfig=f.name, app=app, project_code=project_code, bin_path=bin_path
-                )
+            data = self.collect_status(app, base_url, project_code)
         except DashboardExecutionError as e:
             message = "get helm app status failed, error_no: {error_no}\n{output}".format(
                 error_no=e.error_no, output=e.output
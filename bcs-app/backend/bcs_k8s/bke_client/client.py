@@ -12,7 +12,9 @@
 # specific language governing permissions and limitations under the License.
 #
 import logging
+import hashlib
 import contextlib
+import functools
 from dataclasses import dataclass
 import json
 
@@ -26,12 +28,18 @@ from backend.components import paas_cc, bcs
 from backend.components.utils import http_post
 from backend.bcs_k8s import kubectl
 from backend.bcs_k8s.utils import get_kubectl_version
+from backend.bcs_k8s.kubectl.exceptions import KubectlBaseException
+from backend.bcs_k8s.kubehelm.exceptions import HelmBaseException
 from backend.bcs_k8s.kubehelm.helm import KubeHelmClient
 from backend.resources.cluster.utils import get_cluster_coes
 from backend.resources.cluster.constants import ClusterCOES
+from backend.utils.cache import LocalTTLCache
 
 logger = logging.getLogger(__name__)
 
+# 集群对应的 kubectl 版本
+kubectl_bin_cache = LocalTTLCache(ttl=getattr(settings, "KUBECONFIG_CACHE_TTL", 300))
+
 
 class BCSClusterNotFound(APIException):
     pass
@@ -161,8 +169,14 @@ class BCSClusterClient:
 
         return options
 
-    @contextlib.contextmanager
-    def make_kubectl_client(self):
+    @property
+    def kubeconfig_cache_key(self):
+        # 集群凭证通过用户的 access_token 获取，按用户隔离，避免绕过权限校验
+        token_digest = hashlib.sha1((self.access_token or "").encode()).hexdigest()
+        return (self.project_id, self.cluster_id, token_digest)
+
+    def render_kubeconfig(self):
+        """生成 kubeconfig 内容，返回 kubeconfig 内容及 kubectl 的参数"""
         options = self.make_kubectl_options()
         cluster = kubectl.Cluster(
             name=self.cluster_id,
@@ -171,35 +185,63 @@ class BCSClusterClient:
         )
         user = kubectl.User(name=constants.BCS_USER_NAME, token=options['token'])
         context = kubectl.Context(name=constants.BCS_USER_NAME, user=user, cluster=cluster)
+        kube_config = kubectl.KubeConfig(contexts=[context])
+        return kube_config.dumps(), options
+
+    @contextlib.contextmanager
+    def make_kubeconfig_file(self):
+        """复用按集群缓存的 kubeconfig 文件，避免每次操作都查询集群凭证并写文件"""
+        with kubectl.kubeconfig_cache.use(self.kubeconfig_cache_key, self.render_kubeconfig) as (filename, options):
+            yield filename, dict(options)
+
+    def invalidate_kubeconfig(self):
+        kubectl.kubeconfig_cache.invalidate(self.kubeconfig_cache_key)
+
+    def _invalidate_on_unauthorized(self, run_command):
+        """命令因凭证失效被拒绝时，使缓存的 kubeconfig 失效，下次操作重新获取集群凭证"""
+
+        @functools.wraps(run_command)
+        def wrapper(*args, **kwargs):
+            try:
+                return run_command(*args, **kwargs)
+            except (KubectlBaseException, HelmBaseException) as e:
+                if constants.UNAUTHORIZED_OUTPUT in str(e):
+                    logger.warning("cluster %s credentials rejected, invalidate kubeconfig", self.cluster_id)
+                    self.invalidate_kubeconfig()
+                raise
+
+        return wrapper
+
+    @contextlib.contextmanager
+    def make_kubectl_client(self):
         kubectl_bin_file, version = get_cluster_proper_kubectl(self.access_token, self.project_id, self.cluster_id)
         self.k8s_version = version
-        kube_config = kubectl.KubeConfig(contexts=[context])
-        with kube_config.as_tempfile() as filename:
+        with self.make_kubeconfig_file() as (filename, options):
             kubectl_client = kubectl.KubectlClusterClient(kubectl_bin=kubectl_bin_file, kubeconfig=filename, **options)
+            kubectl_client._run_command = self._invalidate_on_unauthorized(kubectl_client._run_command)
             yield kubectl_client
 
     @contextlib.contextmanager
     def make_helm_client(self):
         """组装携带kubeconfig的helm client"""
-        options = self.make_kubectl_options()
-        cluster = kubectl.Cluster(
-            name=self.cluster_id,
-            cert=options.pop('client-certificate'),
-            server=options.pop('server'),
-        )
-        user = kubectl.User(name=constants.BCS_USER_NAME, token=options['token'])
-        context = kubectl.Context(name=constants.BCS_USER_NAME, user=user, cluster=cluster)
         # NOTE: 这里直接使用helm3 client bin
-        kube_config = kubectl.KubeConfig(contexts=[context])
-        with kube_config.as_tempfile() as filename:
+        with self.make_kubeconfig_file() as (filename, _):
             helm_client = KubeHelmClient(
                 helm_bin=settings.HELM3_BIN,
                 kubeconfig=filename,
             )
+            helm_client._run_command = self._invalidate_on_unauthorized(helm_client._run_command)
             yield helm_client
 
 
 def get_cluster_proper_kubectl(access_token, project_id, cluster_id):
+    """获取与集群版本匹配的 kubectl，按集群缓存"""
+    return kubectl_bin_cache.get_or_set(
+        (project_id, cluster_id), lambda: _get_cluster_proper_kubectl(access_token, project_id, cluster_id)
+    )
+
+
+def _get_cluster_proper_kubectl(access_token, project_id, cluster_id):
     bcs_api_client = bcs.k8s.K8SClient(access_token, project_id, cluster_id, None)
 
     kubectl_version = get_kubectl_version(
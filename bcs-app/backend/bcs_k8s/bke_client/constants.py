@@ -23,6 +23,9 @@ CLUSTER_NOT_FOUND_CODE_NAME = 'CLUSTER_NOT_FOUND'
 # perm fail code
 CLUSTER_PERM_FAIL_CODE_NAMES = ['CHECK_USER_CLUSTER_PERM_FAIL', 'UNAUTHORIZED']
 
+# kubectl/helm 使用的集群凭证被 apiserver 拒绝时的输出，如 "error: You must be logged in to the server (Unauthorized)"
+UNAUTHORIZED_OUTPUT = 'Unauthorized'
+
 # token not found code
 TOKEN_NOT_FOUND_CODE_NAME = 'RTOKEN_NOT_FOUND'
 
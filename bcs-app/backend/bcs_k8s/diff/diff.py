@@ -11,11 +11,11 @@
 # an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 #
+import bisect
 import io
 import logging
-import sys
+from collections import Counter
 
-from difflib import Differ
 from . import parser
 
 logger = logging.getLogger(__name__)
@@ -24,6 +24,9 @@ logger = logging.getLogger(__name__)
 reference <https://github.com/databus23/helm-diff/blob/master/diff/diff.go>
 """
 
+# 单个区间允许的最大编辑距离(中间蛇搜索的轮数)，超出后直接按整体替换输出，避免差异巨大时耗时过长
+MAX_EDIT_COST = 512
+
 
 def diff_manifests(old_index, new_index, suppressed_kinds, context, to):
     for key, old_content in old_index.items():
@@ -53,69 +56,198 @@ def diff_manifests(old_index, new_index, suppressed_kinds, context, to):
 
 
 def print_diff(suppressed_kinds, kind, context, before, after, to):
-    d = Differ()
-    diffs = "".join(d.compare(before.decode("utf8").splitlines(True), after.decode("utf8").splitlines(True)))
-    diffs = diffs.splitlines(True)
-    logger.debug("".join(diffs))
-
     if kind in suppressed_kinds:
         string = "+ Changes suppressed on sensitive content of type %s\n" % kind
         to.write(string)
         return
 
-    if context >= 0:
-        distances = calculate_distances(diffs)
-        omitting = False
-        for i, diff in enumerate(diffs):
-            if distances[i] > context:
-                if not omitting:
-                    to.write("...")
-                    omitting = True
-            else:
-                omitting = False
-                print_diff_record(diff, to)
-        return
+    a_lines = before.decode("utf8").splitlines(True)
+    b_lines = after.decode("utf8").splitlines(True)
+    opcodes = diff_lines(a_lines, b_lines)
+
+    last = len(opcodes) - 1
+    for index, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+        if tag == "delete":
+            write_lines(to, "- ", a_lines, i1, i2)
+        elif tag == "insert":
+            write_lines(to, "+ ", b_lines, j1, j2)
+        elif context < 0:
+            write_lines(to, "  ", a_lines, i1, i2)
+        else:
+            # 仅输出距离变更行不超过 context 的相同行，其余折叠为 ...
+            head = context if index > 0 else 0
+            tail = context if index < last else 0
+            if head + tail >= i2 - i1:
+                write_lines(to, "  ", a_lines, i1, i2)
+                continue
+            write_lines(to, "  ", a_lines, i1, i1 + head)
+            to.write("...")
+            write_lines(to, "  ", a_lines, i2 - tail, i2)
+
+
+def write_lines(to, prefix, lines, start, end):
+    for i in range(start, end):
+        to.write(prefix)
+        to.write(lines[i])
+
+
+def diff_lines(a_lines, b_lines):
+    """按行比较，返回 (tag, i1, i2, j1, j2) 列表，tag 为 equal、delete、insert
+
+    行先映射为整数以加速比较；以两侧都只出现一次的行作为锚点切分(patience diff)，
+    锚点之间使用 Myers 线性空间算法
+    """
+    interned = {}
+    a = [interned.setdefault(line, len(interned)) for line in a_lines]
+    b = [interned.setdefault(line, len(interned)) for line in b_lines]
+
+    opcodes = []
+    alo, blo = 0, 0
+    for i, j in _unique_anchors(a, b):
+        _diff_range(a, alo, i, b, blo, j, opcodes)
+        opcodes.append(("equal", i, i + 1, j, j + 1))
+        alo, blo = i + 1, j + 1
+    _diff_range(a, alo, len(a), b, blo, len(b), opcodes)
+    return _merge_opcodes(opcodes)
+
 
-    for diff in diffs:
-        print_diff_record(diff, to)
+def _unique_anchors(a, b):
+    """返回两侧各只出现一次的行中，顺序一致的最长序列 [(i, j), ...]"""
+    count_a = Counter(a)
+    count_b = Counter(b)
+    index_b = {line: j for j, line in enumerate(b) if count_b[line] == 1}
+    pairs = [(i, index_b[line]) for i, line in enumerate(a) if count_a[line] == 1 and line in index_b]
 
+    # 按 j 求最长递增子序列
+    tails, tail_index, prev = [], [], [None] * len(pairs)
+    for n, (_, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_index.append(n)
+        else:
+            tails[pos] = j
+            tail_index[pos] = n
+        prev[n] = tail_index[pos - 1] if pos else None
+
+    anchors = []
+    n = tail_index[-1] if tail_index else None
+    while n is not None:
+        anchors.append(pairs[n])
+        n = prev[n]
+    anchors.reverse()
+    return anchors
+
+
+def _diff_range(a, alo, ahi, b, blo, bhi, opcodes):
+    # 1. 剥离公共前缀
+    start_a, start_b = alo, blo
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        alo += 1
+        blo += 1
+    if alo > start_a:
+        opcodes.append(("equal", start_a, alo, start_b, blo))
+
+    # 2. 剥离公共后缀
+    end_a, end_b = ahi, bhi
+    while ahi > alo and bhi > blo and a[ahi - 1] == b[bhi - 1]:
+        ahi -= 1
+        bhi -= 1
+
+    # 3. 比较中间部分
+    if alo == ahi:
+        if blo < bhi:
+            opcodes.append(("insert", alo, alo, blo, bhi))
+    elif blo == bhi:
+        opcodes.append(("delete", alo, ahi, blo, blo))
+    else:
+        snake = _middle_snake(a, alo, ahi, b, blo, bhi)
+        if snake is None:
+            opcodes.append(("delete", alo, ahi, blo, blo))
+            opcodes.append(("insert", ahi, ahi, blo, bhi))
+        else:
+            x, y, u, v = snake
+            _diff_range(a, alo, x, b, blo, y, opcodes)
+            if u > x:
+                opcodes.append(("equal", x, u, y, v))
+            _diff_range(a, u, ahi, b, v, bhi, opcodes)
 
-def print_diff_record(diff, to):
-    if isinstance(diff, bytes):
-        diff = diff.decode("utf8")
-    to.write(diff)
+    if ahi < end_a:
+        opcodes.append(("equal", ahi, end_a, bhi, end_b))
 
 
-def calculate_distances(diffs):
-    """ Calculate distance of every diff-line to the closest change """
-    distances = dict()
+def _middle_snake(a, alo, ahi, b, blo, bhi):
+    """查找最短编辑路径的中间蛇，返回其起止坐标 (x, y, u, v)；编辑距离超过 MAX_EDIT_COST 时返回 None"""
+    n, m = ahi - alo, bhi - blo
+    delta = n - m
+    odd = delta & 1
+    max_d = min((n + m + 1) // 2, MAX_EDIT_COST)
+    offset = max_d + 1
+    # vf 记录正向每条对角线能到达的最远 x；vb 记录反向(从末尾开始)的最远距离
+    vf = [0] * (2 * max_d + 3)
+    vb = [0] * (2 * max_d + 3)
 
-    # Iterate forwards through diffs, set 'distance' based on closest 'change' before this line
-    change = -1
-    for i, diff in enumerate(diffs):
-        if diff and diff[0] != " ":
-            change = i
-        distance = sys.maxsize
-        if change != -1:
-            distance = i - change
-        distances[i] = distance
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[offset + k - 1] < vf[offset + k + 1]):
+                x = vf[offset + k + 1]
+            else:
+                x = vf[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            vf[offset + k] = x
+            kb = delta - k
+            if odd and -(d - 1) <= kb <= d - 1 and x + vb[offset + kb] >= n:
+                return alo + x0, blo + y0, alo + x, blo + y
 
-    # Iterate backwards through diffs, reduce 'distance' based on closest 'change' after this line
-    change = -1
-    for i in range(len(diffs) - 1, 0, -1):
-        diff = diffs[i]
-        if diff and diff[0] != " ":
-            change = i
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vb[offset + k - 1] < vb[offset + k + 1]):
+                x = vb[offset + k + 1]
+            else:
+                x = vb[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            vb[offset + k] = x
+            kf = delta - k
+            if not odd and -d <= kf <= d and x + vf[offset + kf] >= n:
+                return ahi - x, bhi - y, ahi - x0, bhi - y0
 
-        if change != -1:
-            distance = change - i
-            if distance < distances[i]:
-                distances[i] = distance
+    return None
 
-    return distances
+
+def _merge_opcodes(opcodes):
+    """合并相邻的同类操作，并保证替换时删除在前、新增在后"""
+    merged = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if i1 == i2 and j1 == j2:
+            continue
+        if merged and merged[-1][0] == tag:
+            _, pi1, _, pj1, _ = merged[-1]
+            merged[-1] = (tag, pi1, i2, pj1, j2)
+        elif tag == "delete" and len(merged) >= 1 and merged[-1][0] == "insert":
+            # insert 后紧跟 delete 时交换顺序，便于与之前的 delete 合并
+            prev = merged.pop()
+            if merged and merged[-1][0] == "delete":
+                _, pi1, _, pj1, _ = merged[-1]
+                merged[-1] = ("delete", pi1, i2, pj1, pj1)
+            else:
+                merged.append(("delete", i1, i2, prev[3], prev[3]))
+            merged.append(("insert", i2, i2, prev[3], prev[4]))
+        else:
+            merged.append((tag, i1, i2, j1, j2))
+    return merged
 
 
 def simple_diff(content_old, content_new, namespace):
+    if content_old == content_new:
+        return ""
+
     output = io.StringIO()
     diff_manifests(
         old_index=parser.parse(content_old, namespace),
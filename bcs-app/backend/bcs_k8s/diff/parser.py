@@ -11,10 +11,13 @@
 # an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 #
+import hashlib
 import logging
 import re
 import yaml
 
+from backend.utils.cache import LocalTTLCache
+
 
 """
 a resource parser which extract resource from raw text,
@@ -24,6 +27,9 @@ reference <https://github.com/databus23/helm-diff/blob/master/manifest/parse.go>
 logger = logging.getLogger(__name__)
 yaml_seperator = b"\n---\n"
 
+# 预览、diff 时同一份渲染结果会被多次解析，按内容摘要缓存解析出的索引
+parsed_index_cache = LocalTTLCache(ttl=600, maxsize=128)
+
 
 class MappingResult(object):
     def __init__(self, name, kind, content):
@@ -112,6 +118,12 @@ def parse(manifest, default_namespace):
             logger.warning("unexpect type of %s, with value: %s" % (type(manifest), manifest))
             manifest = bytes(manifest, "utf-8")
 
+    key = (hashlib.sha1(manifest).hexdigest(), default_namespace)
+    # 返回浅拷贝，MappingResult 视为只读
+    return dict(parsed_index_cache.get_or_set(key, lambda: _parse(manifest, default_namespace)))
+
+
+def _parse(manifest, default_namespace):
     contents = split_manifest(manifest)
     result = dict()
     for content in contents:
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""
+对比 manifest diff 新旧实现的耗时，构造多个大 ConfigMap 组成的 release，并按比例修改其中的行
+"""
+import io
+import random
+import time
+from difflib import Differ
+
+from django.core.management.base import BaseCommand
+
+from backend.bcs_k8s.diff import diff, parser
+
+
+def legacy_print_diff(suppressed_kinds, kind, context, before, after, to):
+    """基于 difflib.Differ 的原实现，仅用于对比"""
+    diffs = "".join(Differ().compare(before.decode("utf8").splitlines(True), after.decode("utf8").splitlines(True)))
+    diffs = diffs.splitlines(True)
+    if kind in suppressed_kinds:
+        to.write("+ Changes suppressed on sensitive content of type %s\n" % kind)
+        return
+    for line in diffs:
+        to.write(line)
+
+
+def make_manifest(configmaps, lines, seed, change_ratio=0, block_size=0):
+    """change_ratio 为随机修改行的比例；block_size 为每个 ConfigMap 中连续修改(仅追加后缀)的行数"""
+    rand = random.Random(seed)
+    docs = []
+    for i in range(configmaps):
+        data = []
+        for j in range(lines):
+            value = f"value-{i}-{j}"
+            if change_ratio and rand.random() < change_ratio:
+                value = f"changed-{rand.random()}"
+            elif lines // 2 <= j < lines // 2 + block_size:
+                value += "-v2"
+            data.append(f"  key-{j}: {value}\n")
+        docs.append(f"apiVersion: v1\nkind: ConfigMap\nmetadata:\n  name: cm-{i}\ndata:\n{''.join(data)}")
+    return "---\n".join(docs).encode()
+
+
+class Command(BaseCommand):
+    help = "benchmark manifest diff"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--configmaps", type=int, default=10)
+        parser.add_argument("--lines", type=int, default=10000, help="lines per configmap")
+        parser.add_argument("--change-ratio", type=float, default=0.01)
+        parser.add_argument("--block-size", type=int, default=0, help="contiguous similar lines changed per configmap")
+        parser.add_argument("--context", type=int, default=-1)
+
+    def run(self, print_diff, old_index, new_index, context):
+        origin = diff.print_diff
+        diff.print_diff = print_diff
+        try:
+            output = io.StringIO()
+            start = time.perf_counter()
+            diff.diff_manifests(old_index, new_index, [], context, output)
+            return time.perf_counter() - start, len(output.getvalue())
+        finally:
+            diff.print_diff = origin
+
+    def handle(self, *args, **options):
+        old = make_manifest(options["configmaps"], options["lines"], seed=0)
+        new = make_manifest(
+            options["configmaps"],
+            options["lines"],
+            seed=1,
+            change_ratio=options["change_ratio"],
+            block_size=options["block_size"],
+        )
+        self.stdout.write(f"manifest size: {len(old) / 1024 / 1024:.2f}MB")
+
+        old_index = parser.parse(old, "default")
+        new_index = parser.parse(new, "default")
+        for name, print_diff in [("legacy", legacy_print_diff), ("current", diff.print_diff)]:
+            cost, size = self.run(print_diff, old_index, new_index, options["context"])
+            self.stdout.write(f"{name}: {cost:.3f}s, output {size} chars")
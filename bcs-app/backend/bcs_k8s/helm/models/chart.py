@@ -193,6 +193,15 @@ class ChartVersion(BaseChartVersion):
         - read from index.yaml
         -> entries -> chart -> versions -> version
         """
+        chart_version_changed = self.apply_import_version(chart, version, force)
+        self.save()
+        return chart_version_changed
+
+    def apply_import_version(self, chart, version, force=False, downloader=None):
+        """根据 index.yaml 中的版本信息更新字段(必要时下载 chart 包)，不保存，便于批量写入
+
+        downloader 为 ChartDownloader，批量导入时由调用方传入，复用预先并发下载的结果
+        """
         self.chart = chart
         self.version = version.get("version")
         self.name = version.get("name")
@@ -230,12 +239,13 @@ class ChartVersion(BaseChartVersion):
             # donwload the tar.gz and update files and questions
             url = self.urls[0] if self.urls else None
             if not url:
-                self.save()
                 return chart_version_changed
 
-            ok, files, questions = download_template_data(chart.name, url, auths=self.chart.repository.plain_auths)
+            if downloader is not None:
+                ok, files, questions = downloader.download(chart.name, url)
+            else:
+                ok, files, questions = download_template_data(chart.name, url, auths=self.chart.repository.plain_auths)
             if not ok:
-                self.save()
                 return chart_version_changed
 
             if self.files != files:
@@ -245,7 +255,6 @@ class ChartVersion(BaseChartVersion):
                 self.questions = questions
                 chart_version_changed = True
 
-        self.save()
         return chart_version_changed
 
     @classmethod
@@ -14,37 +14,51 @@
 
 import datetime
 import logging
+import random
+import time
+from collections import defaultdict
 
 from celery import shared_task
 from natsort import natsorted
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
 from django.utils import timezone
 
 from .models.repo import Repository
 from .models.chart import Chart, ChartVersion
-from .utils.repo import (prepareRepoCharts, InProcessSign)
+from .utils.repo import ChartDownloader, InProcessSign, RepoSyncState, prepare_repo_charts_if_modified
+from .utils.util import fix_chart_url
 from backend.apps.whitelist_bk import enable_incremental_sync_chart_repo
 from backend.bcs_k8s.helm.utils.repo_bk import get_incremental_charts_and_hash_value
 from backend.utils.basic import normalize_time
 
 logger = logging.getLogger(__name__)
 
+# 同步仓库时每批写入的chart版本数
+SYNC_BATCH_SIZE = getattr(settings, "HELM_REPO_SYNC_BATCH_SIZE", 100)
+# 周期同步时各仓库任务的最大随机延迟(秒)
+REPO_SYNC_JITTER = getattr(settings, "HELM_REPO_SYNC_JITTER", 300)
+
 
 @shared_task
 def sync_all_repo():
-    for repo in Repository.objects.all():
-        try:
-            sync_helm_repo(repo.id, False)
-        except Exception as e:
-            logger.exception("sync_helm_repo %s failed %s" % (repo.id, e))
+    _dispatch_sync_repo_tasks(force=False)
 
 
 @shared_task
 def force_sync_all_repo():
-    for repo in Repository.objects.all():
-        try:
-            sync_helm_repo(repo.id, True)
-        except Exception as e:
-            logger.exception("force sync_helm_repo %s failed %s" % (repo.id, e))
+    _dispatch_sync_repo_tasks(force=True)
+
+
+def _dispatch_sync_repo_tasks(force):
+    """每个仓库单独下发一个同步任务，并随机延迟执行，避免同一时刻集中请求；
+    非强制同步时跳过处于失败退避期的仓库
+    """
+    for repo_id in Repository.objects.values_list("id", flat=True):
+        if not force and RepoSyncState(repo_id).in_backoff():
+            logger.info("helm repo %s is in backoff after sync failures, skip it", repo_id)
+            continue
+        sync_helm_repo.apply_async((repo_id, force), countdown=random.uniform(0, REPO_SYNC_JITTER))
 
 
 def enable_increment(force, project_id):
@@ -61,16 +75,42 @@ def enable_increment(force, project_id):
 def sync_helm_repo(repo_id, force=False):
     # if in processing, then do nothing
     sign = InProcessSign(repo_id)
-    # TODO: FIXME: uncomment
     if sign.exists():
         logger.error("the helm repo %s if in processing, this task will not be started", repo_id)
         return
+    sign.create()
+
+    sync_state = RepoSyncState(repo_id)
+    start = time.perf_counter()
+    try:
+        ok = _sync_helm_repo(repo_id, sign, sync_state, force)
+    except Exception as e:
+        logger.exception("sync_helm_repo %s failed, error: %s", repo_id, e)
+        ok = False
+    finally:
+        sign.delete()
 
+    # 记录同步结果及耗时，失败时进入退避期
+    duration = time.perf_counter() - start
+    if ok:
+        sync_state.record_success(duration)
+        logger.info("sync helm repo %s succeeded, force: %s, duration: %.3fs", repo_id, force, duration)
+    else:
+        failures, backoff = sync_state.record_failure(duration)
+        logger.error(
+            "sync helm repo %s failed %s times in a row, force: %s, duration: %.3fs, next sync after %ss",
+            repo_id, failures, force, duration, backoff,
+        )
+
+
+def _sync_helm_repo(repo_id, sign, sync_state, force):
+    """同步仓库的chart信息，返回是否同步成功(index 未变动也认为成功)"""
     repo = Repository.objects.get(id=repo_id)
     repo_name = repo.name
     repo_url = repo.url
     plain_auths = repo.plain_auths
 
+    validators = None
     try:
         # NOTE: 针对白名单中的项目先开启增量同步
         if enable_increment(force, repo.project_id):
@@ -82,71 +122,237 @@ def sync_helm_repo(repo_id, force=False):
             start_time = normalize_time(repo.refreshed_at)
             charts_info, charts_info_hash = get_incremental_charts_and_hash_value(repo_url, username, password, start_time)
         else:
-            charts_info, charts_info_hash = prepareRepoCharts(repo_url, repo_name, plain_auths)
+            # 非强制同步时使用条件请求，index.yaml 未变动时不再下载和计算MD5
+            modified, charts_info, charts_info_hash, validators = prepare_repo_charts_if_modified(
+                repo_url, plain_auths, sync_state=None if force else sync_state
+            )
+            if not modified:
+                logger.info("the chart index of repo %s not been modified since last refresh: %s",
+                            repo_id, repo.refreshed_at)
+                return True
     except Exception as e:
         logger.exception("prepareRepoCharts fail: repo_url=%s, repo_name=%s, error: %s", repo_url, repo_name, e)
-        return
+        return False
 
     logger.debug("prepareRepoCharts repo_url=%s, charts_info=%s", repo_url, charts_info)
 
     # 如果不存在或者为空，认为同步失败
     if not charts_info:
         logger.error("load chart info from repo fail![name=%s, url=%s]", repo_name, repo_url)
-        sign.delete()
-        return
+        return False
 
     # if the index_hash is the same as the commit in db
     # 现阶段兼容先前逻辑，仍然比对MD5，判断是否需要更新
     if not force and charts_info_hash == repo.commit:
         logger.info("the chart index commit [%s] of repo %s not been update since last refresh: %s",
                     repo.commit, repo_id, repo.refreshed_at)
-        return
-
-    try:
+    else:
         # 增量获取的数据，直接添加到本地记录
         if enable_increment(force, repo.project_id):
             _add_charts(repo, sign, charts_info, charts_info_hash, force)
         else:
             _do_helm_repo_charts_update(repo, sign, charts_info, charts_info_hash, force)
-    except Exception as e:
-        logger.exception("_do_helm_repo_charts_update fail, error: %s", e)
-        sign.delete()
+
+    # 本次同步成功后才保存 ETag/Last-Modified
+    if validators:
+        sync_state.save_validators(validators)
+    return True
 
 
 def _add_charts(repo, sign, charts, index_hash, force=False):
     """添加charts
     """
-    for chart_name, versions in charts.items():
-        chart, _created = Chart.objects.get_or_create(name=chart_name, repository=repo)
-        # 开始添加版本
-        full_chart_versions = {}
-        for version in versions:
-            # update sign every time
-            sign.update()
-            chart_version = ChartVersion()
-            try:
-                chart_version.update_from_import_version(chart, version, force)
-            except Exception as e:
-                logger.exception(
-                    "save_chart_version fail: chart=%s, version=%s, error: %s", chart, version, e)
-                continue
-            # 更新chart icon
-            icon_url = version.get("icon")
-            if not chart.icon and icon_url:
-                chart.update_icon(icon_url)
-            # 记录版本，便于更新chart默认版本
-            full_chart_versions[chart_version.id] = chart_version
-        # 更新chart的变更时间
-        chart.changed_at = timezone.now()
-        chart.save(update_fields=["changed_at"])
+    chart_objs = _get_or_create_charts(repo, charts.keys())
+    # 开始添加版本
+    full_chart_versions_map, _ = _import_chart_versions(
+        repo, chart_objs, charts, _get_old_chart_versions(repo), force, sign
+    )
+
+    for chart_name in charts:
+        chart = chart_objs[chart_name]
         # 更新chart默认版本为最新推送的chart版本
-        _update_default_chart_version(chart, full_chart_versions)
+        _update_default_chart_version(chart, full_chart_versions_map[chart.id])
+
+    # 更新chart的变更时间
+    Chart.objects.filter(id__in=[chart_objs[name].id for name in charts]).update(changed_at=timezone.now())
     # 更新hash
     repo.refreshed(index_hash)
     # delete sign
     sign.delete()
 
 
+def _get_old_charts(repo):
+    return {c.name: c for c in Chart.objects.filter(repository=repo)}
+
+
+def _get_or_create_charts(repo, chart_names, old_charts=None):
+    """批量获取仓库下的chart，不存在时批量创建，返回 {name: chart}
+    """
+    charts = dict(_get_old_charts(repo) if old_charts is None else old_charts)
+    to_create_names = [name for name in chart_names if name not in charts]
+    if to_create_names:
+        Chart.objects.bulk_create(
+            [Chart(name=name, repository=repo) for name in to_create_names], batch_size=SYNC_BATCH_SIZE
+        )
+        # MySQL 下 bulk_create 不会回填主键，需要重新查询
+        charts.update({c.name: c for c in Chart.objects.filter(repository=repo, name__in=to_create_names)})
+    # 避免后续访问 chart.repository 时逐个查询
+    for chart in charts.values():
+        chart.repository = repo
+    return charts
+
+
+def _get_old_chart_versions(repo):
+    """一次查询仓库下所有的chart版本，返回 {chart_id: {key: chart_version}}
+    NOTE: 不加载 files、questions 等大字段，强制同步比对时才按需加载
+    """
+    old_chart_versions = defaultdict(dict)
+    for v in ChartVersion.objects.filter(chart__repository=repo).defer("files", "questions"):
+        old_chart_versions[v.chart_id][ChartVersion.gen_key(v.name, v.version, v.digest)] = v
+    return old_chart_versions
+
+
+def _import_chart_versions(repo, chart_objs, charts, old_chart_versions, force, sign):
+    """和数据库中已有的版本比对后，分批并发下载 chart 包并写入新增和变动的版本
+
+    :param chart_objs: {chart_name: chart}
+    :param charts: index.yaml 中的 {chart_name: [version, ...]}
+    :param old_chart_versions: 数据库中已有的版本，参见 _get_old_chart_versions
+    :return: ({chart_id: index 中当前存在的版本 {id: chart_version}}, 有变动的 chart id 集合)
+    """
+    full_chart_versions_map = {}
+    changed_chart_ids = set()
+    icon_urls = defaultdict(list)
+    pending = []
+
+    for chart_name, versions in charts.items():
+        chart = chart_objs[chart_name]
+        chart_old_versions = old_chart_versions.get(chart.id, {})
+        full_chart_versions = full_chart_versions_map[chart.id] = {}
+        imported_keys = set()
+        for version in versions:
+            key = ChartVersion.gen_key(
+                name=version.get("name"), version=version.get("version"), digest=version.get("digest")
+            )
+            if key in imported_keys:
+                continue
+            imported_keys.add(key)
+
+            # 如果数据库中已经存在记录，并且不是强制同步，则不进行其它信息的变动
+            chart_version = chart_old_versions.get(key)
+            if chart_version:
+                full_chart_versions[chart_version.id] = chart_version
+                if not force:
+                    continue
+            else:
+                chart_version = ChartVersion()
+            pending.append((chart, chart_version, version))
+
+            icon_url = version.get("icon")
+            if icon_url and icon_url not in icon_urls[chart.id]:
+                icon_urls[chart.id].append(icon_url)
+
+    downloader = ChartDownloader(repo.plain_auths)
+    try:
+        for i in range(0, len(pending), SYNC_BATCH_SIZE):
+            batch = pending[i:i + SYNC_BATCH_SIZE]
+            # 并发下载本批次的 chart 包
+            downloader.prefetch([(chart.name, _get_chart_url(chart, version)) for chart, _, version in batch])
+
+            imported = []
+            for chart, chart_version, version in batch:
+                try:
+                    version_changed = chart_version.apply_import_version(chart, version, force, downloader=downloader)
+                except Exception as e:
+                    logger.exception("import chart version fail: chart=%s, version=%s, error: %s", chart, version, e)
+                    continue
+                if version_changed:
+                    changed_chart_ids.add(chart.id)
+                imported.append(chart_version)
+
+            for chart_version in _save_chart_versions(imported, sign):
+                full_chart_versions_map[chart_version.chart_id][chart_version.id] = chart_version
+    finally:
+        downloader.close()
+
+    # NOTE: icon just add at the first time
+    # 验证 版本号不变动时，icon，desc不会更新
+    for chart_name in charts:
+        chart = chart_objs[chart_name]
+        for icon_url in icon_urls[chart.id]:
+            if chart.icon or chart.update_icon(icon_url):
+                break
+
+    return full_chart_versions_map, changed_chart_ids
+
+
+def _get_chart_url(chart, version):
+    urls = version.get("urls")
+    if not urls:
+        return None
+    return fix_chart_url(urls[0], chart.repository.url)
+
+
+def _save_chart_versions(chart_versions, sign):
+    """在一个事务中写入一批chart版本，每批更新一次同步标识
+
+    :return: 写入成功的版本
+    """
+    to_create = [v for v in chart_versions if not v.id]
+    try:
+        with transaction.atomic():
+            ChartVersion.objects.bulk_create(to_create)
+            for chart_version in chart_versions:
+                if chart_version.id:
+                    chart_version.save()
+    except (IntegrityError, DataError) as e:
+        logger.warning("save chart versions in batch fail, fallback to save one by one, error: %s", e)
+        # 批量写入已回滚，清除可能回填的主键
+        for chart_version in to_create:
+            chart_version.id = None
+        saved = _save_chart_versions_one_by_one(chart_versions)
+        sign.update()
+        return saved
+    sign.update()
+
+    if to_create:
+        # MySQL 下 bulk_create 不会回填主键，按唯一键(chart, version, digest)查回
+        ids = {
+            (chart_id, version, digest): id
+            for id, chart_id, version, digest in ChartVersion.objects.filter(
+                chart_id__in={v.chart_id for v in to_create}, version__in={v.version for v in to_create}
+            ).values_list("id", "chart_id", "version", "digest")
+        }
+        for chart_version in to_create:
+            chart_version.id = ids.get((chart_version.chart_id, chart_version.version, chart_version.digest))
+            chart_version._state.adding = False
+
+    return [v for v in chart_versions if v.id]
+
+
+def _save_chart_versions_one_by_one(chart_versions):
+    """逐条写入chart版本，跳过写入失败的版本，避免一条异常数据导致整批版本丢失
+    """
+    saved = []
+    for chart_version in chart_versions:
+        created = not chart_version.id
+        try:
+            with transaction.atomic():
+                chart_version.save()
+        except (IntegrityError, DataError) as e:
+            logger.exception(
+                "save chart version fail: chart_id=%s, version=%s, error: %s",
+                chart_version.chart_id,
+                chart_version.version,
+                e,
+            )
+            if created:
+                chart_version.id = None
+            continue
+        saved.append(chart_version)
+    return saved
+
+
 def _update_default_chart_version(chart, full_chart_versions):
     """更新chart对应的默认版本信息
     """
@@ -158,127 +364,67 @@ def _update_default_chart_version(chart, full_chart_versions):
 
     # 如果latest_chart_version和先前的版本一致，则无需更新
     latest_chart_version = all_versions[0]
-    # 处理异常: backend.bcs_k8s.helm.models.chart.DoesNotExist: ChartVersion matching query does not exist.
-    try:
-        if chart.defaultChartVersion and (chart.defaultChartVersion.version == latest_chart_version.version):
-            return
-    except Exception as err:
-        logger.error("match chart verson failed, err: %s", err)
+    default_chart_version = full_chart_versions.get(chart.defaultChartVersion_id)
+    if default_chart_version and default_chart_version.version == latest_chart_version.version:
+        return
 
     chart.defaultChartVersion = latest_chart_version
     chart.description = latest_chart_version.description
-    chart.save()
+    chart.save(update_fields=["defaultChartVersion", "description", "updated_at"])
 
 
-def _sync_delete_chart_versions(chart, old_chart_versions, full_chart_versions, to_delete_ids):
+def _sync_delete_chart_versions(to_delete_ids):
     # 1. delete chart version
-    for vid in to_delete_ids:
+    to_delete_ids = list(to_delete_ids)
+    for i in range(0, len(to_delete_ids), SYNC_BATCH_SIZE):
         try:
-            old_chart_versions.get(vid).delete()
-            # del old_chart_versions[vid]
+            ChartVersion.objects.filter(id__in=to_delete_ids[i:i + SYNC_BATCH_SIZE]).delete()
         except Exception as e:
-            logger.exception("sync_helm_repo: delete old chartVersion fail![ChartVersionID=%s], error: %s", vid, e)
+            logger.exception("sync_helm_repo: delete old chartVersion fail![ChartVersionIDs=%s], error: %s",
+                             to_delete_ids[i:i + SYNC_BATCH_SIZE], e)
 
 
 def _sync_delete_charts(charts, old_charts):
     current_chart_names = charts.keys()
     to_delete_chart_names = set(old_charts.keys()) - set(current_chart_names)
 
-    for chart_name in to_delete_chart_names:
-        c = old_charts[chart_name]
-        c.do_delete()
-
-
-def _get_old_charts(repo):
-    charts = Chart.objects.filter(repository=repo).all()
-    old_charts_dict = {c.name: c for c in charts}
-
-    return old_charts_dict
-
-
-def _get_old_chart_version_data(chart, created):
-    # if created, no old chart versions
-    if created:
-        return {}, {}
-
-    versions = ChartVersion.objects.filter(chart=chart).all()
-
-    # {key => id}
-    old_chart_version_key_ids = {
-        ChartVersion.gen_key(v.name, v.version, v.digest): v.id
-        for v in versions
-    }
-    # {id => object}
-    old_chart_versions = {v.id: v for v in versions}
-
-    return old_chart_version_key_ids, old_chart_versions
+    to_delete_ids = [old_charts[name].id for name in to_delete_chart_names]
+    # queryset.update 不会触发 auto_now，需要显式更新 updated_at
+    Chart.objects.filter(id__in=to_delete_ids).update(
+        deleted=True, deleted_at=datetime.datetime.now(), updated_at=timezone.now()
+    )
 
 
 def _do_helm_repo_charts_update(repo, sign, charts, index_hash, force=False):
     # for sync chart, some chart maybe delete
     old_charts = _get_old_charts(repo)
-
-    for chart_name, versions in charts.items():
-        chart, chart_created = Chart.objects.get_or_create(name=chart_name, repository=repo)
-        chart.clean_deleted_status()
-
-        # 1. prepare data
-        old_chart_version_key_ids, old_chart_versions = _get_old_chart_version_data(chart, chart_created)
-
-        # 2. add or update
-        full_chart_versions = {}
-        current_chart_version_ids = []
-        chart_changed = False
-        for version in versions:
-            # 2.1 update sign every time
-            sign.update()
-
-            # 2.2 create chart version
-            key = ChartVersion.gen_key(name=version.get("name"),
-                                       version=version.get("version"),
-                                       digest=version.get("digest"))
-            # 如果数据库中已经存在记录，并且不是强制同步，则不进行其它信息的变动
-            chart_version_id = old_chart_version_key_ids.get(key)
-            if chart_version_id:
-                # 记录相关数据供删除使用
-                chart_version = old_chart_versions.get(chart_version_id)
-                current_chart_version_ids.append(chart_version.id)
-                full_chart_versions[chart_version.id] = chart_version
-                if not force:
-                    continue
-            else:
-                chart_version = ChartVersion()
-
-            # 2.3 do update
-            try:
-                version_changed = chart_version.update_from_import_version(chart, version, force)
-            except Exception as e:
-                logger.exception(
-                    "_save_or_update_chart_version fail: chart=%s, version=%s, error: %s", chart, version, e)
-                continue
-            else:
-                chart_changed = chart_changed or version_changed
-
-            # 2.4 update icon  NOTE: icon just add at the first time
-            # 验证 版本号不变动时，icon，desc不会更新
-            icon_url = version.get("icon")
-            if not chart.icon and icon_url:
-                chart.update_icon(icon_url)
-            # 针对新创建的chart version，记录chart全量版本，便于后续针对版本的处理
-            if not chart_version_id:
-                current_chart_version_ids.append(chart_version.id)
-                full_chart_versions[chart_version.id] = chart_version
-
-        if chart_changed:
-            chart.changed_at = timezone.now()
-            chart.save(update_fields=["changed_at"])
-
-        # 3. chartVersion sync delete
-        to_delete_ids = set(old_chart_versions.keys()) - set(current_chart_version_ids)
-        _sync_delete_chart_versions(chart, old_chart_versions, full_chart_versions, to_delete_ids)
-
-        # 更新chart默认版本为最新推送的chart版本
-        _update_default_chart_version(chart, full_chart_versions)
+    chart_objs = _get_or_create_charts(repo, charts.keys(), old_charts)
+    # 一次性恢复被标记为删除、但又重新出现在 index 中的chart
+    Chart.objects.filter(repository=repo, name__in=list(charts.keys()), deleted=True).update(
+        deleted=False, deleted_at=None, updated_at=timezone.now()
+    )
+
+    # 1. prepare data
+    old_chart_versions = _get_old_chart_versions(repo)
+
+    # 2. add or update
+    full_chart_versions_map, changed_chart_ids = _import_chart_versions(
+        repo, chart_objs, charts, old_chart_versions, force, sign
+    )
+
+    # 3. chartVersion sync delete
+    to_delete_ids = []
+    for chart_id, full_chart_versions in full_chart_versions_map.items():
+        old_ids = {v.id for v in old_chart_versions.get(chart_id, {}).values()}
+        to_delete_ids.extend(old_ids - set(full_chart_versions.keys()))
+
+    _sync_delete_chart_versions(to_delete_ids)
+    Chart.objects.filter(id__in=list(changed_chart_ids)).update(changed_at=timezone.now())
+
+    # 更新chart默认版本为最新推送的chart版本
+    for chart_name in charts:
+        chart = chart_objs[chart_name]
+        _update_default_chart_version(chart, full_chart_versions_map[chart.id])
 
     # sync chart
     _sync_delete_charts(charts, old_charts)
@@ -15,7 +15,7 @@
 this is the functions for fetch content from repo
 """
 
-import io
+import time
 
 import requests
 import yaml
@@ -24,9 +24,17 @@ import hashlib
 import base64
 import tarfile
 
+from django.conf import settings
+
 from backend.utils.cache import rd_client
+from backend.utils.concurrency import fan_out
 from backend.components.utils import http_get
-from backend.bcs_k8s.helm.utils.repo_bk import make_requests_auth, get_charts_info
+from backend.bcs_k8s.helm.utils.repo_bk import (
+    make_requests_auth,
+    get_charts_info,
+    request_charts_index,
+    load_charts_info,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +56,28 @@ def _prepareHelmRepoPath(url, name, auths):
     return charts_info, charts_info_hash
 
 
+def prepare_repo_charts_if_modified(url, auths, sync_state=None):
+    """带条件请求(ETag/Last-Modified)地获取仓库 chart 信息
+
+    NOTE: 返回的 validators 需要在本次同步成功后再保存，否则同步失败时后续请求会一直命中 304
+
+    :return: (是否有变动, charts_info, charts_info_hash, validators)；获取失败时 charts_info 为 None
+    """
+    headers = sync_state.conditional_headers() if sync_state else None
+    try:
+        resp = request_charts_index(url, auths, headers=headers)
+        if resp.status_code == 304:
+            return False, None, None, None
+        resp.raise_for_status()
+        charts_info, charts_info_hash = load_charts_info(resp.text)
+    except Exception as e:
+        logger.error("get charts info fail: [url=%s], error: %s", url, e)
+        return True, None, None, None
+
+    validators = {"ETag": resp.headers.get("ETag", ""), "Last-Modified": resp.headers.get("Last-Modified", "")}
+    return True, charts_info, charts_info_hash, validators
+
+
 def download_icon_data(url, auths):
     """
     download icon
@@ -84,28 +114,68 @@ def is_binary_string(bytes):
     return bool(bytes.translate(None, textchars))
 
 
-def download_template_data(chart_name, url, auths):
+def download_template_data(chart_name, url, auths, session=None):
     # https://kubernetes-charts-incubator.storage.googleapis.com/kafka-0.4.6.tgz
     if not url:
         return False, None, None
 
+    session = session or requests
     if not auths:
-        resp = requests.get(url, stream=True, verify=False)
+        resp = session.get(url, stream=True, verify=False)
     else:
         for auth in auths:
-            resp = requests.get(url, stream=True, auth=make_requests_auth(auth), verify=False)
+            resp = session.get(url, stream=True, auth=make_requests_auth(auth), verify=False)
             if resp.status_code != 401:
                 break
 
     if resp.status_code != 200:
         # just retry once
-        resp = requests.get(url, stream=True)
+        resp.close()
+        resp = session.get(url, stream=True)
         if resp.status_code != 200:
             logger.error("Download template data fail: [url=%s]", url)
+            resp.close()
+            return False, None, None
+
+    with resp:
+        # 流式解压，不把整个包读入内存
+        resp.raw.decode_content = True
+        try:
+            with tarfile.open(mode="r|*", fileobj=resp.raw) as tar:
+                files, questions = extract_template_files(chart_name, tar)
+        except ChartTooLarge as e:
+            logger.error("Download template data fail: [url=%s], %s", url, e)
             return False, None, None
+        except UnicodeDecodeError as e:
+            logger.exception("download_template_data failed %s, url=%s", e, url)
+            return False, None, None
+
+    if not questions:
+        return True, files, questions
+
+    questions = yaml.load(questions)
+    return True, files, questions
+
+
+class ChartTooLarge(Exception):
+    """chart 包中单个文本文件或文本文件的总大小超出限制"""
+
+
+# chart 包中单个文本文件和全部文本文件的大小上限(字节)，超出时认为下载失败
+CHART_MAX_FILE_SIZE = getattr(settings, "HELM_CHART_MAX_FILE_SIZE", 1024 * 1024)
+CHART_MAX_TOTAL_SIZE = getattr(settings, "HELM_CHART_MAX_TOTAL_SIZE", 20 * 1024 * 1024)
+# 同步仓库时并发下载 chart 包的数量
+CHART_DOWNLOAD_MAX_WORKERS = getattr(settings, "HELM_CHART_DOWNLOAD_MAX_WORKERS", 8)
+
 
-    tar = tarfile.open(mode="r:*", fileobj=io.BytesIO(resp.content))
+def extract_template_files(chart_name, tar, max_file_size=None, max_total_size=None):
+    """按顺序读取流式打开的 tar 包，返回 (files, questions 原始内容)
 
+    只读取每个文件的前 1024 字节判断是否为二进制文件，二进制文件不会读入内存；
+    文本文件超出大小限制时抛出 ChartTooLarge
+    """
+    max_file_size = CHART_MAX_FILE_SIZE if max_file_size is None else max_file_size
+    max_total_size = CHART_MAX_TOTAL_SIZE if max_total_size is None else max_total_size
     support_file_list = {
         "{chart}/{file}".format(chart=chart_name, file=f): 1
         for f in SUPPORT_FILES
@@ -113,34 +183,65 @@ def download_template_data(chart_name, url, auths):
 
     files = {}
     questions = {}
-
-    # for file_path in tar.getnames():
-    tar.getnames()
-    for member in tar.members:
-        if member.isdir():
+    total_size = 0
+    for member in tar:
+        if not member.isfile():
             continue
         file_path = member.path
-        file_content = tar.extractfile(file_path).read()
-
-        if is_binary_string(file_content[:1024]):
-            logger.warning("file %s seems to be a binary file, skipped it. content: %s",
-                           file_path, file_content[:1024])
+        fileobj = tar.extractfile(member)
+        head = fileobj.read(1024)
+        if is_binary_string(head):
+            logger.warning("file %s seems to be a binary file, skipped it. content: %s", file_path, head)
             continue
 
+        # 跳过文本文件会导致渲染出的 manifest 不完整，因此整个版本按失败处理
+        if member.size > max_file_size:
+            raise ChartTooLarge(f"file {file_path} of chart {chart_name} exceed {max_file_size} bytes")
+
+        total_size += member.size
+        if total_size > max_total_size:
+            raise ChartTooLarge(f"text files of chart {chart_name} exceed {max_total_size} bytes")
+
+        file_content = (head + fileobj.read()).decode()
         if file_path in support_file_list:
-            questions = file_content.decode()
-        try:
-            files[file_path] = file_content.decode()
-        except Exception as e:
-            logger.exception("download_template_data failed %s, file_path=%s, file_content: %s",
-                             e, file_path, file_content)
-            return False, None, None
+            questions = file_content
+        files[file_path] = file_content
 
-    if not questions:
-        return True, files, questions
+    return files, questions
 
-    questions = yaml.load(questions)
-    return True, files, questions
+
+class ChartDownloader:
+    """并发下载多个 chart 包，复用同一个 HTTP 会话
+
+    先调用 prefetch 批量下载，再通过 download 获取结果；未预先下载的 url 直接同步下载
+    """
+
+    def __init__(self, auths, max_workers=None):
+        self.auths = auths
+        self.max_workers = max_workers or CHART_DOWNLOAD_MAX_WORKERS
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._results = {}
+
+    def prefetch(self, charts):
+        """:param charts: [(chart_name, url), ...]"""
+        calls = {url: (chart_name, url, self.auths, self.session) for chart_name, url in charts if url}
+        results = fan_out(download_template_data, calls, max_workers=self.max_workers, timeout=None)
+        self._results.update(results)
+
+    def download(self, chart_name, url):
+        result = self._results.pop(url, None)
+        if result is None:
+            return download_template_data(chart_name, url, self.auths, session=self.session)
+        if not result.ok:
+            raise result.exc
+        return result.data
+
+    def close(self):
+        self._results.clear()
+        self.session.close()
 
 
 class InProcessSign(object):
@@ -164,6 +265,61 @@ class InProcessSign(object):
         rd_client.delete(self.key)
 
 
+# 同步失败后的退避时间(秒)，按连续失败次数指数增长
+REPO_SYNC_BACKOFF_BASE = getattr(settings, "HELM_REPO_SYNC_BACKOFF_BASE", 300)
+REPO_SYNC_BACKOFF_MAX = getattr(settings, "HELM_REPO_SYNC_BACKOFF_MAX", 6 * 3600)
+
+
+class RepoSyncState(object):
+    """记录仓库的同步状态：index.yaml 的 ETag/Last-Modified、连续失败次数、退避截止时间和最近一次同步耗时"""
+
+    expires = 7 * 24 * 3600
+
+    def __init__(self, repo_id):
+        self.repo_id = repo_id
+        self.key = "bcs_k8s:helm:repo_sync:{repo_id}".format(repo_id=repo_id)
+
+    def get(self):
+        return {k.decode(): v.decode() for k, v in rd_client.hgetall(self.key).items()}
+
+    def _save(self, mapping):
+        rd_client.hmset(self.key, mapping)
+        rd_client.expire(self.key, self.expires)
+
+    def conditional_headers(self):
+        state = self.get()
+        headers = {}
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+        return headers
+
+    def save_validators(self, headers):
+        self._save({"etag": headers.get("ETag", ""), "last_modified": headers.get("Last-Modified", "")})
+
+    def in_backoff(self):
+        retry_at = self.get().get("retry_at")
+        return bool(retry_at) and float(retry_at) > time.time()
+
+    def record_success(self, duration):
+        self._save({"status": "success", "failures": 0, "retry_at": "", "duration": duration, "synced_at": time.time()})
+
+    def record_failure(self, duration):
+        failures = int(self.get().get("failures") or 0) + 1
+        backoff = min(REPO_SYNC_BACKOFF_BASE * 2 ** (failures - 1), REPO_SYNC_BACKOFF_MAX)
+        self._save(
+            {
+                "status": "failure",
+                "failures": failures,
+                "retry_at": time.time() + backoff,
+                "duration": duration,
+                "synced_at": time.time(),
+            }
+        )
+        return failures, backoff
+
+
 if __name__ == '__main__':
     # git
     # url = "https://git.rancher.io/charts"
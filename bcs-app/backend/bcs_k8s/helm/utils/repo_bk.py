@@ -40,25 +40,33 @@ def _md5(content):
     return h.hexdigest()
 
 
-def get_charts_info(url, auths):
+def request_charts_index(url, auths, headers=None):
+    """请求仓库的 index.yaml，headers 可用于携带 If-None-Match 等条件请求头"""
     url = url.rstrip("/")
     req_charts_url = "{url}/index.yaml".format(url=url)
-    try:
-        if not auths:
-            resp = requests.get(req_charts_url, verify=False)
-        else:
-            for auth in auths:
-                resp = requests.get(req_charts_url, auth=make_requests_auth(auth), verify=False)
-                if resp.status_code != 401:
-                    break
+    if not auths:
+        return requests.get(req_charts_url, headers=headers, verify=False)
 
-        content = resp.text
-        charts_info = yaml.load(content)["entries"]
+    for auth in auths:
+        resp = requests.get(req_charts_url, headers=headers, auth=make_requests_auth(auth), verify=False)
+        if resp.status_code != 401:
+            break
+    return resp
 
-    except Exception as e:
-        logger.error("get charts info fail: [url=%s], error: %s", req_charts_url, str(e))
-        return (False, None, None)
 
+def load_charts_info(content):
+    charts_info = yaml.load(content)["entries"]
     # 生成MD5，主要是便于后续校验是否变动
     charts_info_hash = _md5(str(charts_info))
+    return charts_info, charts_info_hash
+
+
+def get_charts_info(url, auths):
+    try:
+        resp = request_charts_index(url, auths)
+        charts_info, charts_info_hash = load_charts_info(resp.text)
+    except Exception as e:
+        logger.error("get charts info fail: [url=%s], error: %s", url, str(e))
+        return (False, None, None)
+
     return (True, charts_info, charts_info_hash)
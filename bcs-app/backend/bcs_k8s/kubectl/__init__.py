@@ -16,4 +16,4 @@
 see: backend/tests/bcs_k8s/test_kubectl.py for more usage
 """
 from .kubectl import KubectlClusterClient
-from .kubeconfig import KubeConfig, Cluster, User, Context
+from .kubeconfig import KubeConfig, Cluster, User, Context, KubeConfigFileCache, kubeconfig_cache
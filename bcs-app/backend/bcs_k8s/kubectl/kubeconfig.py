@@ -12,11 +12,14 @@
 # specific language governing permissions and limitations under the License.
 #
 """Module for generating kubeconfig file"""
+import os
+import time
 import logging
 import tempfile
+import threading
 import contextlib
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Tuple
 
 import yaml
 from django.conf import settings
@@ -131,3 +134,145 @@ class KubeConfig:
             fp.write(self.dumps().encode())
             fp.flush()
             yield fp.name
+
+
+def get_default_cache_dir() -> str:
+    """Prefer tmpfs so that credentials never hit the disk"""
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm/bcs_kubeconfig"
+    return os.path.join(tempfile.gettempdir(), "bcs_kubeconfig")
+
+
+@dataclass
+class KubeConfigFile:
+    """A rendered kubeconfig file shared by concurrent kubectl/helm invocations
+
+    :param extra: data rendered along with the file, such as kubectl options
+    """
+    path: str
+    expires_at: float
+    extra: Any = None
+    refs: int = 0
+    stale: bool = False
+
+    def is_valid(self) -> bool:
+        return not self.stale and time.monotonic() < self.expires_at and os.path.exists(self.path)
+
+
+@dataclass
+class KubeConfigFileCache:
+    """Cache of kubeconfig files, keyed by cluster
+
+    - A file is shared until its ttl expires, then a new file is rendered and swapped in atomically
+    - Files are reference counted, an expired file is removed only after all its users released it
+    - Only one render is in flight for a key, concurrent callers wait for it
+
+    :param ttl: seconds a rendered file can be reused
+    :param cache_dir: where to put the files
+    """
+    ttl: float = 300
+    cache_dir: str = field(default_factory=get_default_cache_dir)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._files: Dict[Hashable, KubeConfigFile] = {}
+
+    @contextlib.contextmanager
+    def use(self, key: Hashable, render: Callable[[], Tuple[str, Any]]):
+        """A context manager which yields path and extra data of the cached kubeconfig file
+
+        :param render: returns kubeconfig content and extra data, called only when there is no valid file
+        """
+        kubeconfig_file = self._acquire(key, render)
+        try:
+            yield kubeconfig_file.path, kubeconfig_file.extra
+        finally:
+            self._release(kubeconfig_file)
+
+    def invalidate(self, key: Hashable):
+        """Mark the file of key as stale, e.g. when the credentials were rejected"""
+        with self._lock:
+            kubeconfig_file = self._files.pop(key, None)
+            if kubeconfig_file:
+                self._retire(kubeconfig_file)
+
+    def clear(self):
+        with self._lock:
+            for kubeconfig_file in self._files.values():
+                self._retire(kubeconfig_file)
+            self._files.clear()
+
+    def _acquire(self, key, render) -> KubeConfigFile:
+        with self._lock:
+            self._purge_expired()
+            kubeconfig_file = self._get_valid(key)
+            if kubeconfig_file:
+                return kubeconfig_file
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # another caller may have rendered the file while we were waiting
+            with self._lock:
+                kubeconfig_file = self._get_valid(key)
+                if kubeconfig_file:
+                    return kubeconfig_file
+
+            content, extra = render()
+            kubeconfig_file = KubeConfigFile(
+                path=self._write(content), expires_at=time.monotonic() + self.ttl, extra=extra, refs=1
+            )
+            with self._lock:
+                old_file = self._files.get(key)
+                self._files[key] = kubeconfig_file
+                if old_file:
+                    self._retire(old_file)
+            return kubeconfig_file
+
+    def _release(self, kubeconfig_file: KubeConfigFile):
+        with self._lock:
+            kubeconfig_file.refs -= 1
+            if kubeconfig_file.stale and kubeconfig_file.refs <= 0:
+                self._remove(kubeconfig_file.path)
+
+    def _get_valid(self, key):
+        kubeconfig_file = self._files.get(key)
+        if kubeconfig_file and kubeconfig_file.is_valid():
+            kubeconfig_file.refs += 1
+            return kubeconfig_file
+        return None
+
+    def _purge_expired(self):
+        for key, kubeconfig_file in list(self._files.items()):
+            if not kubeconfig_file.is_valid():
+                del self._files[key]
+                self._key_locks.pop(key, None)
+                self._retire(kubeconfig_file)
+
+    def _retire(self, kubeconfig_file: KubeConfigFile):
+        kubeconfig_file.stale = True
+        if kubeconfig_file.refs <= 0:
+            self._remove(kubeconfig_file.path)
+
+    def _write(self, content: str) -> str:
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        # mkstemp creates the file with 0600 permission
+        fd, path = tempfile.mkstemp(dir=self.cache_dir, suffix=".kubeconfig")
+        with os.fdopen(fd, "w") as fp:
+            fp.write(content)
+        return path
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("remove kubeconfig file %s failed, %s", path, e)
+
+
+kubeconfig_cache = KubeConfigFileCache(
+    ttl=getattr(settings, "KUBECONFIG_CACHE_TTL", 300),
+    cache_dir=getattr(settings, "KUBECONFIG_CACHE_DIR", "") or get_default_cache_dir(),
+)
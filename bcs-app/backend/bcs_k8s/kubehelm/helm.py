@@ -23,7 +23,6 @@ import time
 import subprocess
 import logging
 import tempfile
-import shutil
 import json
 import contextlib
 from dataclasses import asdict
@@ -32,6 +31,8 @@ from django.conf import settings
 from django.template.loader import render_to_string
 
 from .exceptions import HelmError, HelmExecutionError
+from .render_cache import get_render_key, render_cache
+from .workspace import chart_workspace_cache, write_files
 from backend.apps.whitelist_bk import enable_helm_v3
 
 logger = logging.getLogger(__name__)
@@ -39,24 +40,6 @@ logger = logging.getLogger(__name__)
 YTT_RENDERER_NAME = "ytt_renderer"
 
 
-def write_files(temp_dir, files):
-    for name, content in files.items():
-        path = os.path.join(temp_dir, name)
-        base_path = os.path.dirname(path)
-        if not os.path.exists(base_path):
-            os.makedirs(base_path)
-
-        with open(path, "w") as f:
-            f.write(content)
-
-    for name, _ in files.items():
-        parts = name.split("/")
-        if len(parts) > 0:
-            return os.path.join(temp_dir, parts[0])
-
-    return temp_dir
-
-
 class KubeHelmClient:
     """
     render the templates with values.yaml / answers.yaml
@@ -96,39 +79,50 @@ class KubeHelmClient:
         """
         helm template {dir} --name {name} --namespace {namespace} --set k1=v1,k2=v2,k3=v3 --values filename
         """
+        key = get_render_key(
+            files,
+            helm_bin=[self.helm_bin, settings.HELM3_BIN],
+            name=name,
+            namespace=namespace,
+            parameters=parameters,
+            valuefile=valuefile,
+            cluster_id=cluster_id,
+        )
+        return render_cache.get_or_render(
+            key, lambda: self._template(files, name, namespace, parameters, valuefile, cluster_id)
+        )
+
+    def _template(self, files, name, namespace, parameters, valuefile, cluster_id=None):
         app_name = name or "default"
 
-        temp_dir = tempfile.mkdtemp()
-        valuefile_name = None
         try:
-            # 1. write template files into fp
-            root_dir = write_files(temp_dir, files)
-
-            # 2. parse answers.yaml to values
-            values = self._make_answers_to_args(parameters)
+            # 1. chart 文件使用缓存的工作目录，values 文件写到本次调用的临时目录
+            with chart_workspace_cache.use(files) as root_dir, tempfile.TemporaryDirectory() as temp_dir:
+                # 2. parse answers.yaml to values
+                values = self._make_answers_to_args(parameters)
 
-            # 3. construct cmd and run
-            base_cmd_args = self._get_cmd_args_for_template(root_dir, app_name, namespace, cluster_id)
+                # 3. construct cmd and run
+                base_cmd_args = self._get_cmd_args_for_template(root_dir, app_name, namespace, cluster_id)
 
-            # 4.1 helm template
-            template_cmd_args = base_cmd_args
-            if values:
-                template_cmd_args += values
+                # 4.1 helm template
+                template_cmd_args = base_cmd_args
+                if values:
+                    template_cmd_args += values
 
-            if valuefile:
-                FILENAME = "__valuefile__.yaml"
-                valuefile_x = {FILENAME: valuefile}
-                write_files(temp_dir, valuefile_x)
-                valuefile_name = os.path.join(temp_dir, FILENAME)
-                template_cmd_args += ["--values", valuefile_name]
+                if valuefile:
+                    FILENAME = "__valuefile__.yaml"
+                    valuefile_x = {FILENAME: valuefile}
+                    write_files(temp_dir, valuefile_x)
+                    valuefile_name = os.path.join(temp_dir, FILENAME)
+                    template_cmd_args += ["--values", valuefile_name]
 
-            template_out, _ = self._run_command_with_retry(max_retries=0, cmd_args=template_cmd_args)
+                template_out, _ = self._run_command_with_retry(max_retries=0, cmd_args=template_cmd_args)
 
-            # 4.2 helm template --notes
-            notes_out = ""
-            # not be used currently, comment it for accelerate
-            # notes_cmd_args = base_cmd_args + ["--notes"]
-            # notes_out, _ = self._run_command_with_retry(max_retries=0, cmd_args=notes_cmd_args)
+                # 4.2 helm template --notes
+                notes_out = ""
+                # not be used currently, comment it for accelerate
+                # notes_cmd_args = base_cmd_args + ["--notes"]
+                # notes_out, _ = self._run_command_with_retry(max_retries=0, cmd_args=notes_cmd_args)
 
         except Exception as e:
             logger.exception(
@@ -140,8 +134,6 @@ class KubeHelmClient:
                 )
             )
             raise e
-        finally:
-            shutil.rmtree(temp_dir)
 
         return template_out, notes_out
 
@@ -151,13 +143,34 @@ class KubeHelmClient:
         """支持post renderer的helm template，并使用ytt(YAML Templating Tool)注入平台信息
         命令: helm template release_name chart -n namespace --post-renderer ytt-renderer
         """
+        key = get_render_key(
+            files,
+            helm_bin=settings.HELM3_BIN,
+            name=name,
+            namespace=namespace,
+            parameters=parameters,
+            valuefile=valuefile,
+            cluster_id=cluster_id,
+            bcs_inject_data=bcs_inject_data,
+            cmd_flags=kwargs.get("cmd_flags"),
+        )
+        return render_cache.get_or_render(
+            key,
+            lambda: self._template_with_ytt_renderer(
+                files, name, namespace, parameters, valuefile, cluster_id, bcs_inject_data, **kwargs
+            ),
+        )
+
+    def _template_with_ytt_renderer(
+        self, files, name, namespace, parameters, valuefile, cluster_id, bcs_inject_data, **kwargs
+    ):
         try:
-            with write_chart_with_ytt(files, bcs_inject_data) as (temp_dir, ytt_config_dir):
+            with write_chart_with_ytt(files, bcs_inject_data) as (chart_dir, ytt_config_dir):
                 # 1. parse answers.yaml to values
                 values = self._make_answers_to_args(parameters)
 
                 # 2. construct cmd and run
-                base_cmd_args = [settings.HELM3_BIN, "template", name, temp_dir, "--namespace", namespace]
+                base_cmd_args = [settings.HELM3_BIN, "template", name, chart_dir, "--namespace", namespace]
 
                 # 3. helm template command params
                 template_cmd_args = base_cmd_args
@@ -168,8 +181,10 @@ class KubeHelmClient:
                 if valuefile:
                     FILENAME = "__valuefile__.yaml"
                     valuefile_x = {FILENAME: valuefile}
-                    write_files(temp_dir, valuefile_x)
-                    valuefile_name = os.path.join(temp_dir, FILENAME)
+                    # chart 目录只读共享，values 文件写到本次调用的目录
+                    work_dir = os.path.dirname(ytt_config_dir)
+                    write_files(work_dir, valuefile_x)
+                    valuefile_name = os.path.join(work_dir, FILENAME)
                     template_cmd_args += ["--values", valuefile_name]
 
                 # 4. add post render params
@@ -199,14 +214,15 @@ class KubeHelmClient:
 
     def _install_or_upgrade(self, cmd_args, files, chart_values, bcs_inject_data, **kwargs):
         try:
-            with write_chart_with_ytt(files, bcs_inject_data) as (temp_dir, ytt_config_dir):
+            with write_chart_with_ytt(files, bcs_inject_data) as (chart_dir, ytt_config_dir):
                 # NOTE: 设置用户渲染的value文件名为bcs-values.yaml；写入用户渲染的内容
-                values_path = os.path.join(temp_dir, "bcs-values.yaml")
+                # chart 目录只读共享，values 文件写到本次调用的目录
+                values_path = os.path.join(os.path.dirname(ytt_config_dir), "bcs-values.yaml")
                 with open(values_path, "w") as f:
                     f.write(chart_values)
                 # post renderer添加平台注入信息
                 cmd_args += [
-                    temp_dir,
+                    chart_dir,
                     "--values",
                     values_path,
                     "--post-renderer",
@@ -340,27 +356,10 @@ class KubeHelmClient:
 def write_chart_with_ytt(files, bcs_inject_data):
     """组装helm template功能需要的文件，并且使用ytt注入平台需要的信息
     主要包含以下两部分
-    - chart部分
-    - ytt配置部分
+    - chart部分: 使用缓存的工作目录，只读
+    - ytt配置部分: 写到本次调用的临时目录
     """
-    with tempfile.TemporaryDirectory() as temp_dir:
-        for name, content in files.items():
-            path = os.path.join(temp_dir, name)
-            base_path = os.path.dirname(path)
-            if not os.path.exists(base_path):
-                os.makedirs(base_path)
-
-            with open(path, "w") as f:
-                f.write(content)
-
-        # 获取chart配置的目录
-        chart_dir = temp_dir
-        for name, _ in files.items():
-            parts = name.split("/")
-            if len(parts) > 0:
-                chart_dir = os.path.join(temp_dir, parts[0])
-                break
-
+    with chart_workspace_cache.use(files) as chart_dir, tempfile.TemporaryDirectory() as temp_dir:
         # 获取ytt配置的目录
         ytt_config_dir = os.path.join(temp_dir, "ytt_config")
         if not os.path.exists(ytt_config_dir):
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""helm template 渲染结果缓存
+
+预览、diff 与最终部署在参数一致时会重复执行 helm template，这里按渲染输入的摘要缓存渲染结果；
+结果存放在 Redis 中，以便 web 进程与 celery worker 共享
+"""
+import hashlib
+import json
+import logging
+import zlib
+from dataclasses import asdict, is_dataclass
+
+from django.conf import settings
+
+from backend.utils.cache import rd_client
+
+from .workspace import get_files_digest
+
+logger = logging.getLogger(__name__)
+
+# 渲染结果缓存时间，单位秒；设置为 0 时关闭缓存
+HELM_RENDER_CACHE_TTL = getattr(settings, "HELM_RENDER_CACHE_TTL", 600)
+# 渲染结果过大时不缓存，避免占用过多 Redis 内存
+HELM_RENDER_CACHE_MAX_SIZE = getattr(settings, "HELM_RENDER_CACHE_MAX_SIZE", 4 * 1024 * 1024)
+
+
+def get_render_key(files, **inputs):
+    """根据 chart 文件摘要及其它渲染输入(values、namespace、注入数据等)生成缓存 key"""
+    if is_dataclass(inputs.get("bcs_inject_data")):
+        inputs["bcs_inject_data"] = asdict(inputs["bcs_inject_data"])
+    inputs["files"] = get_files_digest(files)
+    raw = json.dumps(inputs, sort_keys=True, default=str)
+    return "bcs:helm:render:" + hashlib.sha256(raw.encode()).hexdigest()
+
+
+class RenderCache:
+    """helm template 输出缓存，Redis 不可用时退化为直接渲染"""
+
+    def __init__(self, client, ttl, max_size):
+        self.client = client
+        self.ttl = ttl
+        self.max_size = max_size
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key):
+        try:
+            data = self.client.get(key)
+        except Exception as e:
+            logger.warning("get helm render cache failed, %s", e)
+            return None
+        if not data:
+            return None
+        try:
+            return self._loads(data)
+        except (zlib.error, ValueError, KeyError) as e:
+            logger.warning("load helm render cache failed, key: %s, %s", key, e)
+            return None
+
+    def set(self, key, template_out, notes_out):
+        try:
+            data = self._dumps(template_out, notes_out)
+        except UnicodeDecodeError:
+            return
+        if len(data) > self.max_size:
+            return
+        try:
+            self.client.set(key, data, ex=self.ttl)
+        except Exception as e:
+            logger.warning("set helm render cache failed, %s", e)
+
+    @staticmethod
+    def _dumps(template_out, notes_out):
+        # helm 命令输出为 bytes，以 utf-8 字符串存入 JSON，并记录原类型以便读取时还原
+        outputs = {"template_out": template_out, "notes_out": notes_out}
+        payload = {
+            "outputs": {name: out.decode() if isinstance(out, bytes) else out for name, out in outputs.items()},
+            "bytes_fields": [name for name, out in outputs.items() if isinstance(out, bytes)],
+        }
+        return zlib.compress(json.dumps(payload).encode())
+
+    @staticmethod
+    def _loads(data):
+        payload = json.loads(zlib.decompress(data).decode())
+        outputs = payload["outputs"]
+        for name in payload["bytes_fields"]:
+            outputs[name] = outputs[name].encode()
+        return outputs["template_out"], outputs["notes_out"]
+
+    def get_or_render(self, key, render):
+        """命中时直接返回缓存的 (template_out, notes_out)；渲染失败时异常直接抛出，不缓存"""
+        if not self.enabled:
+            return render()
+
+        result = self.get(key)
+        if result is not None:
+            logger.info("helm render cache hit, key: %s", key)
+            return result
+
+        template_out, notes_out = render()
+        self.set(key, template_out, notes_out)
+        return template_out, notes_out
+
+
+render_cache = RenderCache(rd_client, ttl=HELM_RENDER_CACHE_TTL, max_size=HELM_RENDER_CACHE_MAX_SIZE)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""
+Chart 工作目录缓存
+
+相同内容的 chart 只写一次磁盘，多次 helm template/install/upgrade 只读复用；
+values 文件、ytt 配置等每次调用不同的文件需要写到调用自己的临时目录中
+"""
+import os
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import contextlib
+from collections import Counter
+from typing import Dict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# chart 文件所在的子目录，和记录目录大小的文件放在同一级，避免影响 chart 内容
+CHART_DIR_NAME = "chart"
+SIZE_FILE_NAME = "size"
+
+
+def get_files_digest(files: Dict[str, str]) -> str:
+    """按文件内容计算摘要；repo 允许覆盖版本时，相同 digest 的 chart 内容也可能不同
+    """
+    sha = hashlib.sha256()
+    for name in sorted(files):
+        sha.update(name.encode())
+        sha.update(b"\0")
+        sha.update(files[name].encode())
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+def write_files(temp_dir, files):
+    for name, content in files.items():
+        path = os.path.join(temp_dir, name)
+        base_path = os.path.dirname(path)
+        if not os.path.exists(base_path):
+            os.makedirs(base_path)
+
+        with open(path, "w") as f:
+            f.write(content)
+
+    for name, _ in files.items():
+        parts = name.split("/")
+        if len(parts) > 0:
+            return os.path.join(temp_dir, parts[0])
+
+    return temp_dir
+
+
+class ChartWorkspaceCache:
+    """按 chart 内容寻址的工作目录缓存
+
+    :param root_dir: 缓存目录
+    :param max_size: 缓存的最大字节数，超出时按最近使用时间淘汰
+    :param min_idle: 只淘汰空闲超过该时间(秒)的目录，避免删除其它进程正在使用的目录
+    """
+
+    def __init__(self, root_dir: str, max_size: int, min_idle: float = 600):
+        self.root_dir = root_dir
+        self.max_size = max_size
+        self.min_idle = min_idle
+        self._lock = threading.Lock()
+        # 当前进程中正在使用的目录
+        self._in_use = Counter()
+
+    @contextlib.contextmanager
+    def use(self, files: Dict[str, str]):
+        """返回 chart 的根目录，调用方不能修改目录中的内容
+        """
+        digest = get_files_digest(files)
+        with self._lock:
+            self._in_use[digest] += 1
+        try:
+            yield self._ensure(digest, files)
+        finally:
+            with self._lock:
+                self._in_use[digest] -= 1
+                if self._in_use[digest] <= 0:
+                    del self._in_use[digest]
+
+    def _ensure(self, digest, files) -> str:
+        workspace = os.path.join(self.root_dir, digest)
+        chart_root = os.path.join(workspace, CHART_DIR_NAME)
+        size_path = os.path.join(workspace, SIZE_FILE_NAME)
+        if os.path.exists(size_path):
+            # 更新最近使用时间，用于淘汰
+            os.utime(size_path)
+            return self._get_chart_dir(chart_root, files)
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        temp_workspace = tempfile.mkdtemp(dir=self.root_dir, prefix=f".{digest}-")
+        try:
+            write_files(os.path.join(temp_workspace, CHART_DIR_NAME), files)
+            size = sum(len(content.encode()) for content in files.values())
+            with open(os.path.join(temp_workspace, SIZE_FILE_NAME), "w") as f:
+                f.write(str(size))
+            # 写完后整体重命名，其它进程不会看到写了一半的目录
+            os.rename(temp_workspace, workspace)
+        except OSError:
+            # 其它进程已经创建了相同的目录
+            shutil.rmtree(temp_workspace, ignore_errors=True)
+            if not os.path.exists(size_path):
+                raise
+        else:
+            self.evict()
+        return self._get_chart_dir(chart_root, files)
+
+    def _get_chart_dir(self, chart_root, files):
+        # 与 write_files 的返回值保持一致
+        for name in files:
+            return os.path.join(chart_root, name.split("/")[0])
+        return chart_root
+
+    def evict(self):
+        """缓存超出大小时，淘汰最久未使用的目录
+        """
+        entries = []
+        total_size = 0
+        for digest in os.listdir(self.root_dir):
+            if digest.startswith("."):
+                continue
+            size_path = os.path.join(self.root_dir, digest, SIZE_FILE_NAME)
+            try:
+                with open(size_path) as f:
+                    size = int(f.read())
+                last_used = os.path.getmtime(size_path)
+            except (OSError, ValueError):
+                continue
+            total_size += size
+            entries.append((last_used, digest, size))
+
+        now = time.time()
+        for last_used, digest, size in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            with self._lock:
+                if self._in_use[digest] > 0 or now - last_used < self.min_idle:
+                    continue
+            shutil.rmtree(os.path.join(self.root_dir, digest), ignore_errors=True)
+            total_size -= size
+
+
+chart_workspace_cache = ChartWorkspaceCache(
+    root_dir=getattr(settings, "HELM_CHART_WORKSPACE_DIR", "")
+    or os.path.join(tempfile.gettempdir(), "bcs_chart_workspace"),
+    max_size=getattr(settings, "HELM_CHART_WORKSPACE_MAX_SIZE", 1024 * 1024 * 1024),
+)
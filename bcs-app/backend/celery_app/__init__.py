@@ -31,7 +31,12 @@ app.conf.beat_schedule = {
     'helm_force_sync_repo_tasks': {
         'task': 'backend.bcs_k8s.helm.tasks.force_sync_all_repo',
         'schedule': crontab(hour=3),
-    }
+    },
+    # 每分钟将执行超时的 helm release 标记为失败
+    'helm_reconcile_timeout_apps': {
+        'task': 'backend.bcs_k8s.app.tasks.reconcile_timeout_apps',
+        'schedule': crontab(),
+    },
 }
 
 
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""集群 API group/version 发现结果缓存
+
+各资源类型需要先查询 apiserver 获得首选的 group version，才能确定使用 kubernetes-python 中的哪个 Api 类，
+这里按集群缓存发现结果，避免每次资源操作都额外请求一次 apiserver
+"""
+from django.conf import settings
+
+from backend.utils.cache import LocalTTLCache
+
+# key 为集群 apiserver 地址，value 为 {group: 发现结果}
+api_discovery_cache = LocalTTLCache(
+    ttl=getattr(settings, "BCS_API_DISCOVERY_CACHE_TTL", 3600),
+    maxsize=getattr(settings, "BCS_API_DISCOVERY_CACHE_MAXSIZE", 512),
+)
+
+
+def _get_cluster_key(api_client):
+    return api_client.configuration.host
+
+
+def get_discovery_result(api_client, group, discover_func):
+    """获取集群中 group 的发现结果，不存在时调用 discover_func(api_client) 查询并缓存
+
+    :param api_client: 集群的 ApiClient
+    :param group: 发现结果的分类，如 apps、core
+    :param discover_func: 实际查询 apiserver 的函数
+    """
+    groups = api_discovery_cache.get_or_set(_get_cluster_key(api_client), dict)
+    if group not in groups:
+        groups[group] = discover_func(api_client)
+    return groups[group]
+
+
+def invalidate_api_discovery(api_client):
+    """使集群的发现结果缓存失效，如集群升级后 group version 变更
+    """
+    api_discovery_cache.delete(_get_cluster_key(api_client))
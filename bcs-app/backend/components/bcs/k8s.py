@@ -158,6 +158,11 @@ class K8SClient(BCSClientBase):
     def get_configmap(self, params):
         return self.proxy_client.get_configmap(params)
 
+    def get_configmap_page(self, params):
+        """分页获取configmap，返回当前页数据和下一页的continue token
+        """
+        return self.proxy_client.get_configmap_page(params)
+
     def create_secret(self, namespace, data):
         """创建secrets
         """
@@ -176,6 +181,11 @@ class K8SClient(BCSClientBase):
     def get_secret(self, params):
         return self.proxy_client.get_secret(params)
 
+    def get_secret_page(self, params):
+        """分页获取secret，返回当前页数据和下一页的continue token
+        """
+        return self.proxy_client.get_secret_page(params)
+
     def create_ingress(self, namespace, data):
         """创建 ingress
         """
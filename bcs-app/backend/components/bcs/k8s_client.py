@@ -11,12 +11,66 @@
 # an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 #
+import hashlib
+
 from django.utils.functional import cached_property
 from kubernetes import client
+from kubernetes.client.rest import ApiException
 from django.conf import settings
 
 from backend.components.bcs import BCSClientBase, resources
+from backend.components.bcs.discovery import invalidate_api_discovery
 from backend.components.utils import http_get
+from backend.utils.cache import LocalTTLCache
+
+# 进程级 ApiClient 缓存，key 为 (project_id, cluster_id, access_token 摘要)
+# 避免每次请求都要查询集群信息和凭证(2 次 BCS API 调用)
+# 凭证通过用户的 access_token 获取，按用户隔离，避免绕过权限校验
+api_client_cache = LocalTTLCache(
+    ttl=getattr(settings, "BCS_API_CLIENT_CACHE_TTL", 600),
+    maxsize=getattr(settings, "BCS_API_CLIENT_CACHE_MAXSIZE", 512),
+)
+
+
+def get_api_client_cache_key(project_id, cluster_id, access_token):
+    token_digest = hashlib.sha1((access_token or "").encode()).hexdigest()
+    return (project_id, cluster_id, token_digest)
+
+
+def invalidate_api_client(project_id, cluster_id):
+    """使集群所有用户的 ApiClient 缓存失效，下次访问时重新拉取凭证
+    """
+    api_client_cache.delete_by(lambda key: key[:2] == (project_id, cluster_id))
+
+
+class BcsApiClient(client.ApiClient):
+    """可在进程内共享的 ApiClient
+
+    - apiserver 返回 401 时使 ApiClient 缓存失效
+    - 请求的 group version 不存在(404 且响应不是 Status 对象)时，使 API 发现结果缓存失效
+    """
+
+    def __init__(self, configuration, project_id, cluster_id):
+        super().__init__(configuration)
+        self.project_id = project_id
+        self.cluster_id = cluster_id
+
+    def call_api(self, *args, **kwargs):
+        try:
+            return super().call_api(*args, **kwargs)
+        except ApiException as e:
+            if e.status == 401:
+                invalidate_api_client(self.project_id, self.cluster_id)
+            elif e.status == 404 and not self._is_status_body(e.body):
+                invalidate_api_discovery(self)
+            raise
+
+    def _is_status_body(self, body):
+        """资源不存在时 apiserver 返回 Status 对象，group version 不存在时返回纯文本
+        """
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", errors="ignore")
+        return '"kind":"Status"' in (body or "").replace(" ", "")
 
 
 class K8SAPIClient(BCSClientBase):
@@ -44,6 +98,10 @@ class K8SAPIClient(BCSClientBase):
 
     @cached_property
     def api_client(self):
+        key = get_api_client_cache_key(self.project_id, self.cluster_id, self.access_token)
+        return api_client_cache.get_or_set(key, self.make_api_client)
+
+    def make_api_client(self):
         context = {}
         cluster_info = self.query_cluster()
         context.update(cluster_info)
@@ -55,7 +113,7 @@ class K8SAPIClient(BCSClientBase):
         configure.verify_ssl = False
         configure.host = f"{self._bcs_server_host}{context['server_address_path']}".rstrip("/")
         configure.api_key = {"authorization": f"Bearer {context['user_token']}"}
-        api_client = client.ApiClient(configure)
+        api_client = BcsApiClient(configure, self.project_id, self.cluster_id)
         return api_client
 
 
@@ -122,6 +180,10 @@ class K8SProxyClient(K8SAPIClient):
         configmap = resources.ConfigMap(self.api_client)
         return configmap.get_configmap(params)
 
+    def get_configmap_page(self, params):
+        configmap = resources.ConfigMap(self.api_client)
+        return configmap.get_configmap_page(params)
+
     def create_secret(self, namespace, data):
         secret = resources.Secret(self.api_client)
         return secret.create_secret(namespace, data)
@@ -138,6 +200,10 @@ class K8SProxyClient(K8SAPIClient):
         secret = resources.Secret(self.api_client)
         return secret.get_secret(params)
 
+    def get_secret_page(self, params):
+        secret = resources.Secret(self.api_client)
+        return secret.get_secret_page(params)
+
     def create_ingress(self, namespace, data):
         ingress = resources.Ingress(self.api_client)
         return ingress.create_ingress(namespace, data)
@@ -38,29 +38,35 @@ class ConfigMap(Resource, CoreAPIClassMixins):
     def update_configmap(self, namespace, name, data):
         return self.api_instance.replace_namespaced_config_map(name, namespace, data)
 
+    def render_configmap(self, info):
+        return self.render_resource_for_preload_content(
+            self.resource_kind, info, info.metadata.name, info.metadata.namespace)
+
     def get_configmap_by_namespace(self, params):
-        resp = self.api_instance.list_namespaced_config_map(params['namespace'])
-        configmap_list = []
-        for info in resp.items:
-            item = self.render_resource_for_preload_content(
-                self.resource_kind, info, info.metadata.name, info.metadata.namespace)
-            params_name = params.get('name')
-            if params_name:
-                if info.metadata.name == params_name:
-                    configmap_list.append(item)
-                    break
-            else:
-                configmap_list.append(item)
-        return configmap_list
+        kwargs = {}
+        if params.get('name'):
+            kwargs['field_selector'] = f"metadata.name={params['name']}"
+        items = self.iter_list_items(
+            self.api_instance.list_namespaced_config_map, params['namespace'], preload_content=True, **kwargs)
+        return [self.render_configmap(info) for info in items]
 
     def get_all_configmap(self):
-        configmap_list = []
-        resp = self.api_instance.list_config_map_for_all_namespaces()
-        for info in resp.items:
-            item = self.render_resource_for_preload_content(
-                self.resource_kind, info, info.metadata.name, info.metadata.namespace)
-            configmap_list.append(item)
-        return configmap_list
+        items = self.iter_list_items(self.api_instance.list_config_map_for_all_namespaces, preload_content=True)
+        return [self.render_configmap(info) for info in items]
+
+    @response(format_data=False)
+    def get_configmap_page(self, params):
+        """分页查询configmap，params中的limit为每页数量，continue为上一页返回的continue token
+        """
+        kwargs = {'limit': params.get('limit'), 'continue_token': params.get('continue'), 'preload_content': True}
+        if params.get('name'):
+            kwargs['field_selector'] = f"metadata.name={params['name']}"
+        if params.get('namespace'):
+            items, continue_token = self.list_page(
+                self.api_instance.list_namespaced_config_map, params['namespace'], **kwargs)
+        else:
+            items, continue_token = self.list_page(self.api_instance.list_config_map_for_all_namespaces, **kwargs)
+        return {'items': [self.render_configmap(info) for info in items], 'continue': continue_token}
 
     @response(format_data=False)
     def get_configmap(self, params):
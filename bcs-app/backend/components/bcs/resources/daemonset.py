@@ -11,7 +11,6 @@
 # an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 #
-import json
 import logging
 
 from kubernetes import client
@@ -28,8 +27,9 @@ updated_preferred_version = "apps/v1beta2"
 
 class DaemonSet(Resource, FilterResourceData, BaseMixins):
     resource_kind = K8sResourceKinds.DaemonSet.value
+    api_group = "apps_daemonset"
 
-    def get_api_class(self, api_client):
+    def discover_api_class(self, api_client):
         resp = client.AppsApi(api_client).get_api_group()
         group_version = resp.preferred_version.group_version
         # NOTE: 针对1.8对应的preferred_version: apps/v1beta1调整为apps/v1beta2
@@ -50,9 +50,8 @@ class DaemonSet(Resource, FilterResourceData, BaseMixins):
     @response(format_data=False)
     def get_daemonset(self, params):
         # 因为view层向下传递时是多个namespace+name, 需要增加过滤
-        resp = self.api_instance.list_daemon_set_for_all_namespaces(_preload_content=False)
-        data = json.loads(resp.data)
-        return self.filter_data(self.resource_kind, data, params)
+        items = self.iter_list_items(self.api_instance.list_daemon_set_for_all_namespaces)
+        return list(self.iter_filter_data(self.resource_kind, items, params))
 
     @response()
     def update_daemonset(self, namespace, name, data):
@@ -30,62 +30,51 @@ class Pod(Resource, CoreAPIClassMixins):
         extra_info = json.loads(base64.b64decode(extra))
         return extra_info['data.metadata.ownerReferences.name']
 
-    def filter_pods_by_reference_name(self, pod_name, pod_item, filter_reference_name, pods_map, render_pod_info):
-        reference_name = self.get_reference_name(filter_reference_name)
+    def match_reference_name(self, pod_item, reference_name):
         reference_name_list = [item['name'] for item in getitems(pod_item, ['metadata', 'ownerReferences'], [])]
-        if (reference_name in reference_name_list) or (set(reference_name) & set(reference_name_list)):
-            pods_map[pod_name] = render_pod_info
+        return (reference_name in reference_name_list) or bool(set(reference_name) & set(reference_name_list))
 
-        return pods_map
+    def match_host_ips(self, pod_item, host_ips):
+        return getitems(pod_item, ['status', 'hostIP'], '') in host_ips
 
-    def filter_pods_by_ips(self, pod_name, pod_item, host_ips, pods_map, render_pod_info):
-        pod_host_ip = getitems(pod_item, ['status', 'hostIP'], '')
-        if pod_host_ip in host_ips:
-            pods_map[pod_name] = render_pod_info
-
-        return pods_map
+    def render_pod(self, pod_item):
+        pod_name = getitems(pod_item, ['metadata', 'name'], '')
+        pod_namespace = getitems(pod_item, ['metadata', 'namespace'], '')
+        return self.render_resource(self.resource_kind, pod_item, pod_name, pod_namespace)
 
     def filter_pods(self, namespace, filter_reference_name, filter_pod_name, host_ips):
-        resp = self.api_instance.list_namespaced_pod(namespace, _preload_content=False)
-        data = json.loads(resp.data)
+        """查询命名空间下的pod，过滤条件之间为"或"的关系
+
+        NOTE: 只有按pod名称过滤时，才能下推为apiserver的field_selector；ownerReferences和hostIP不支持field_selector
+        """
+        kwargs = {}
+        if filter_pod_name and not (filter_reference_name or host_ips):
+            kwargs['field_selector'] = f'metadata.name={filter_pod_name}'
+        reference_name = self.get_reference_name(filter_reference_name) if filter_reference_name else None
+
         pods_map = {}
-        for info in data.get('items') or []:
-            pod_name = getitems(info, ['metadata', 'name'], '')
-            pod_namespace = getitems(info, ['metadata', 'namespace'], '')
-            item = self.render_resource(self.resource_kind, info, pod_name, pod_namespace)
+        for info in self.iter_list_items(self.api_instance.list_namespaced_pod, namespace, **kwargs):
             # 如果过滤参数都不存在时，返回所有
-            if not (filter_reference_name or filter_pod_name or host_ips):
-                pods_map[pod_name] = item
-
-            # TODO: 是否有必要把下面几个拆分到方法中
-            # 过滤reference
-            if filter_reference_name:
-                pods_map = self.filter_pods_by_reference_name(pod_name, info, filter_reference_name, pods_map, item)
-            # 过滤pod name
-            if filter_pod_name and pod_name == filter_pod_name:
-                pods_map[pod_name] = item
-            # 过滤host ip
-            if host_ips:
-                pods_map = self.filter_pods_by_ips(pod_name, info, host_ips, pods_map, item)
+            matched = not (filter_reference_name or filter_pod_name or host_ips)
+            if not matched and reference_name is not None:
+                matched = self.match_reference_name(info, reference_name)
+            if not matched and filter_pod_name:
+                matched = getitems(info, ['metadata', 'name'], '') == filter_pod_name
+            if not matched and host_ips:
+                matched = self.match_host_ips(info, host_ips)
+            # 仅渲染过滤后的pod
+            if matched:
+                item = self.render_pod(info)
+                pods_map[item['resourceName']] = item
         # 转换为list，防止view层出现错误`TypeError: 'dict_values' object does not support indexing`
         return list(pods_map.values())
 
     def get_all_pod(self, host_ips):
-        resp = self.api_instance.list_pod_for_all_namespaces(_preload_content=False)
-        data = json.loads(resp.data)
-        pod_list = []
-        for info in data.get('items') or []:
-            pod_name = getitems(info, ['metadata', 'name'], '')
-            pod_namespace = getitems(info, ['metadata', 'namespace'], '')
-            item = self.render_resource(self.resource_kind, info, pod_name, pod_namespace)
-            if host_ips:
-                pod_host_ip = getitems(info, ['status', 'hostIP'], '')
-                if pod_host_ip in host_ips:
-                    pod_list.append(item)
-            else:
-                pod_list.append(item)
-
-        return pod_list
+        return [
+            self.render_pod(info)
+            for info in self.iter_list_items(self.api_instance.list_pod_for_all_namespaces)
+            if not host_ips or self.match_host_ips(info, host_ips)
+        ]
 
     @response(format_data=False)
     def get_pod(self, host_ips=None, field=None, extra=None, params=None):
@@ -20,6 +20,7 @@ from kubernetes import client
 from kubernetes.client.rest import ApiException
 from django.utils.translation import ugettext_lazy as _
 
+from backend.components.bcs.discovery import get_discovery_result
 from backend.utils.basic import getitems
 from backend.utils.error_codes import error_codes
 
@@ -33,7 +34,10 @@ class ReplicaSet(Resource):
 
     @property
     def api_versions(self):
-        resp = client.AppsApi(self.api_client).get_api_group()
+        return get_discovery_result(self.api_client, "apps_versions", self._discover_api_versions)
+
+    def _discover_api_versions(self, api_client):
+        resp = client.AppsApi(api_client).get_api_group()
         return [
             f"{''.join([i.capitalize() for i in ver.group_version.split('/')])}Api"
             for ver in resp.versions
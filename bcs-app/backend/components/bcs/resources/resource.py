@@ -12,19 +12,52 @@
 # specific language governing permissions and limitations under the License.
 #
 import re
+import json
 
 import arrow
 from kubernetes import client
 from django.utils import timezone
 
+from backend.components.bcs.discovery import get_discovery_result
 from backend.utils.basic import normalize_datetime, getitems
 
 
 class Resource:
+    # 分页查询资源列表时，每页的数量
+    list_page_limit = 500
+
     def __init__(self, api_client, version=None):
         self.version = version
         self.api_client = api_client
 
+    def list_page(self, list_func, *args, limit=None, continue_token=None, preload_content=False, **kwargs):
+        """通过 limit/continue 查询一页资源
+
+        :param list_func: api_instance 中的 list 方法，如 list_namespaced_pod
+        :param continue_token: 上一页返回的 continue token，为空时查询第一页
+        :param preload_content: 为 True 时返回 kubernetes model 对象，否则返回 dict
+        :return: (资源列表, 下一页的 continue token，没有下一页时为空字符串)
+        """
+        if continue_token:
+            kwargs["_continue"] = continue_token
+        resp = list_func(*args, limit=int(limit or self.list_page_limit), _preload_content=preload_content, **kwargs)
+        if preload_content:
+            return resp.items, resp.metadata._continue or ""
+        data = json.loads(resp.data)
+        return data.get("items") or [], getitems(data, ["metadata", "continue"], "")
+
+    def iter_list_items(self, list_func, *args, preload_content=False, **kwargs):
+        """分页查询资源列表，逐个返回资源，避免一次性加载整个集群的数据
+        """
+        continue_token = None
+        while True:
+            items, continue_token = self.list_page(
+                list_func, *args, continue_token=continue_token, preload_content=preload_content, **kwargs
+            )
+            yield from items
+            if not continue_token:
+                return
+
     @property
     def api_class(self):
         return self.get_api_class(self.api_client)
@@ -93,35 +126,41 @@ class FilterResourceData:
             namespace = re.findall(r"[^,;]+", namespace)
         return name, namespace
 
-    def _get_resource(self, params, name, namespace, resource, resource_type):
-        name_list, namespace_list = self.format_name_and_ns_list(params)
-        resource = self.render_resource(resource_type, resource, name, namespace)
+    def match_name_and_ns(self, name, namespace, name_list, namespace_list):
         # 过滤参数包含name和namespace
         if name_list and namespace_list:
-            if name in name_list and namespace in namespace_list:
-                return resource
-            return
+            return name in name_list and namespace in namespace_list
         # 过滤参数只包含name或namespace
         if name_list or namespace_list:
-            if name in name_list or namespace in namespace_list:
-                return resource
-            return
-        return resource
+            return name in name_list or namespace in namespace_list
+        return True
 
-    def filter_data(self, resource_type, resp_data, params):
-        data_list = []
-        for resource in resp_data.get("items") or []:
+    def iter_filter_data(self, resource_type, items, params):
+        """按 name/namespace 过滤资源，仅渲染过滤后的资源
+        """
+        name_list, namespace_list = self.format_name_and_ns_list(params)
+        for resource in items:
             name = getitems(resource, ["metadata", "name"], "")
             namespace = getitems(resource, ["metadata", "namespace"], "")
-            # filter data
-            resource = self._get_resource(params, name, namespace, resource, resource_type)
-            if resource:
-                data_list.append(resource)
+            if self.match_name_and_ns(name, namespace, name_list, namespace_list):
+                yield self.render_resource(resource_type, resource, name, namespace)
 
-        return data_list
+    def filter_data(self, resource_type, resp_data, params):
+        return list(self.iter_filter_data(resource_type, resp_data.get("items") or [], params))
 
 
 class BaseMixins:
+    # 发现结果缓存的分类，同一分类的资源共享发现结果
+    api_group = None
+
+    def get_api_class(self, api_client):
+        """获取集群中资源对应的 Api 类名，按集群缓存
+        """
+        return get_discovery_result(api_client, self.api_group, self.discover_api_class)
+
+    def discover_api_class(self, api_client):
+        raise NotImplementedError
+
     def compose_api_class(self, group_version):
         """通过group version 组装对应分组的api class
         """
@@ -133,7 +172,9 @@ class APPAPIClassMixins(BaseMixins):
     支持资源类型: Deployment/DaemonSet/StatefulSet/ResplicaSet
     """
 
-    def get_api_class(self, api_client):
+    api_group = "apps"
+
+    def discover_api_class(self, api_client):
         resp = client.AppsApi(api_client).get_api_group()
         group_version = resp.preferred_version.group_version
         return self.compose_api_class(group_version)
@@ -144,7 +185,9 @@ class CoreAPIClassMixins(BaseMixins):
     支持资源类型: ConfigMap/Endpoints/Event/Namespace/Node/Pod/PersistentVolume/secret等
     """
 
-    def get_api_class(self, api_client):
+    api_group = "core"
+
+    def discover_api_class(self, api_client):
         resp = client.CoreApi(api_client).get_api_versions()
         version = resp.versions[0]
         return f"Core{version.capitalize()}Api"
@@ -155,7 +198,9 @@ class ExtensionsAPIClassMixins(BaseMixins):
     支持资源类型: Ingress
     """
 
-    def get_api_class(self, api_client):
+    api_group = "extensions"
+
+    def discover_api_class(self, api_client):
         resp = client.ExtensionsApi(api_client).get_api_group()
         group_version = resp.preferred_version.group_version
         return self.compose_api_class(group_version)
@@ -166,7 +211,9 @@ class BatchAPIClassMixins(BaseMixins):
     支持资源类型: Job
     """
 
-    def get_api_class(self, api_client):
+    api_group = "batch"
+
+    def discover_api_class(self, api_client):
         resp = client.BatchApi(api_client).get_api_group()
         group_version = resp.preferred_version.group_version
         return self.compose_api_class(group_version)
@@ -177,7 +224,9 @@ class StorageAPIClassMixins(BaseMixins):
     支持资源类型: StorageClass
     """
 
-    def get_api_class(self, api_client):
+    api_group = "storage"
+
+    def discover_api_class(self, api_client):
         resp = client.StorageApi(api_client).get_api_group()
         version = resp.preferred_version.version
         return self.compose_api_class(f"Storage/{version}")
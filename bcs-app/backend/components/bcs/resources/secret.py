@@ -25,29 +25,35 @@ logger = logging.getLogger(__name__)
 class Secret(Resource, CoreAPIClassMixins):
     resource_kind = K8sResourceKinds.Secret.value
 
+    def render_secret(self, info):
+        return self.render_resource_for_preload_content(
+            self.resource_kind, info, info.metadata.name, info.metadata.namespace)
+
     def get_secret_by_namespace(self, params):
-        resp = self.api_instance.list_namespaced_secret(params['namespace'])
-        secret_list = []
-        for info in resp.items:
-            item = self.render_resource_for_preload_content(
-                self.resource_kind, info, info.metadata.name, info.metadata.namespace)
-            params_name = params.get('name')
-            if params_name:
-                if info.metadata.name == params_name:
-                    secret_list.append(item)
-                    break
-            else:
-                secret_list.append(item)
-        return secret_list
+        kwargs = {}
+        if params.get('name'):
+            kwargs['field_selector'] = f"metadata.name={params['name']}"
+        items = self.iter_list_items(
+            self.api_instance.list_namespaced_secret, params['namespace'], preload_content=True, **kwargs)
+        return [self.render_secret(info) for info in items]
 
     def get_all_secret(self):
-        secret_list = []
-        resp = self.api_instance.list_secret_for_all_namespaces()
-        for info in resp.items:
-            item = self.render_resource_for_preload_content(
-                'Secret', info, info.metadata.name, info.metadata.namespace)
-            secret_list.append(item)
-        return secret_list
+        items = self.iter_list_items(self.api_instance.list_secret_for_all_namespaces, preload_content=True)
+        return [self.render_secret(info) for info in items]
+
+    @response(format_data=False)
+    def get_secret_page(self, params):
+        """分页查询secret，params中的limit为每页数量，continue为上一页返回的continue token
+        """
+        kwargs = {'limit': params.get('limit'), 'continue_token': params.get('continue'), 'preload_content': True}
+        if params.get('name'):
+            kwargs['field_selector'] = f"metadata.name={params['name']}"
+        if params.get('namespace'):
+            items, continue_token = self.list_page(
+                self.api_instance.list_namespaced_secret, params['namespace'], **kwargs)
+        else:
+            items, continue_token = self.list_page(self.api_instance.list_secret_for_all_namespaces, **kwargs)
+        return {'items': [self.render_secret(info) for info in items], 'continue': continue_token}
 
     @response(format_data=False)
     def get_secret(self, params):
@@ -11,7 +11,6 @@
 # an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 #
-import json
 import logging
 
 from kubernetes import client
@@ -37,9 +36,8 @@ class StatefulSet(Resource, FilterResourceData, APPAPIClassMixins):
 
     @response(format_data=False)
     def get_statefulset(self, params):
-        resp = self.api_instance.list_stateful_set_for_all_namespaces(_preload_content=False)
-        data = json.loads(resp.data)
-        return self.filter_data(self.resource_kind, data, params)
+        items = self.iter_list_items(self.api_instance.list_stateful_set_for_all_namespaces)
+        return list(self.iter_filter_data(self.resource_kind, items, params))
 
     @response()
     def update_statefulset(self, namespace, name, data):
@@ -13,6 +13,8 @@
 #
 """普罗米修斯接口封装
 """
+import hashlib
+import json
 import logging
 import time
 
@@ -21,6 +23,8 @@ from django.conf import settings
 
 from backend.components.utils import http_get, http_post
 from backend.utils.basic import normalize_metric
+from backend.utils.cache import rd_client
+from backend.utils.concurrency import FanOutExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -32,9 +36,28 @@ DISK_FSTYPE = "ext[234]|btrfs|xfs|zfs"
 # 磁盘统计 允许的挂载目录
 DISK_MOUNTPOINT = "/|/data"
 
+# 批量查询时的最大并发数, 和 requests 连接池默认大小保持一致
+QUERY_BATCH_MAX_WORKERS = getattr(settings, "PROMETHEUS_QUERY_BATCH_MAX_WORKERS", 10)
+
+# 范围查询结果缓存
+RANGE_CACHE_ENABLED = getattr(settings, "PROMETHEUS_RANGE_CACHE_ENABLED", True)
+# 缓存结果在该时间(秒)内可直接返回，不请求thanos
+RANGE_CACHE_MAX_STALENESS = getattr(settings, "PROMETHEUS_RANGE_CACHE_MAX_STALENESS", 30)
+# 最近该时间(秒)内的数据可能还未采集完整，增量查询时重新获取
+RANGE_CACHE_RESETTLE_WINDOW = getattr(settings, "PROMETHEUS_RANGE_CACHE_RESETTLE_WINDOW", 300)
+RANGE_CACHE_KEY_PREFIX = "bcs:prometheus:query_range"
+
 
 def query_range(query, start, end, step, project_id=None):
-    """范围请求API
+    """范围请求API, 开启缓存时按step对齐时间并增量查询
+    """
+    if RANGE_CACHE_ENABLED and step and int(step) > 0:
+        return RangeQueryCache(query, int(step), project_id).query(start, end)
+    return _query_range(query, start, end, step, project_id)
+
+
+def _query_range(query, start, end, step, project_id=None):
+    """范围请求API, 直接请求thanos
     """
     url = f"{settings.THANOS_HOST}/api/v1/query_range"
     data = {"query": query, "start": start, "end": end, "step": step}
@@ -44,6 +67,89 @@ def query_range(query, start, end, step, project_id=None):
     return resp
 
 
+class RangeQueryCache:
+    """范围查询结果缓存
+
+    - start/end 按 step 对齐，保证相同面板在不同时间刷新时，采样点的时间戳一致，可以复用
+    - 缓存按 series 保存采样点，刷新时只查询缓存之后的时间段(并重新获取最近可能未采集完整的数据)
+    - 缓存在 RANGE_CACHE_MAX_STALENESS 秒内且覆盖查询时间段时，直接返回缓存
+    """
+
+    def __init__(self, query, step, project_id=None):
+        self.query_str = query.strip()
+        self.step = step
+        self.project_id = project_id
+
+    @property
+    def cache_key(self):
+        digest = hashlib.md5(f"{self.project_id}:{self.step}:{self.query_str}".encode()).hexdigest()
+        return f"{RANGE_CACHE_KEY_PREFIX}:{digest}"
+
+    def align(self, timestamp):
+        return int(float(timestamp)) // self.step * self.step
+
+    def query(self, start, end):
+        start, end = self.align(start), self.align(end)
+        now = time.time()
+        cached = self.get_cache()
+
+        # 缓存不存在或者和查询时间段不重叠，需要全量查询
+        if not cached or cached["start"] > start or cached["end"] < start:
+            return self.fetch_and_cache(start, end, start, series={}, now=now)
+
+        if cached["end"] >= end or now - cached["fetched_at"] <= RANGE_CACHE_MAX_STALENESS:
+            return self.make_resp(cached["series"], start, end)
+
+        fetch_start = max(start, self.align(cached["end"] - RANGE_CACHE_RESETTLE_WINDOW))
+        return self.fetch_and_cache(start, end, fetch_start, series=cached["series"], now=now)
+
+    def fetch_and_cache(self, start, end, fetch_start, series, now):
+        resp = _query_range(self.query_str, fetch_start, end, self.step, self.project_id)
+        if resp.get("status") != "success":
+            return resp
+
+        series = self.merge_series(series, resp["data"].get("result") or [], start, fetch_start)
+        self.set_cache({"start": start, "end": end, "fetched_at": now, "series": series}, ttl=end - start)
+        return self.make_resp(series, start, end)
+
+    def merge_series(self, series, result, start, fetch_start):
+        """合并缓存和增量查询的数据，丢弃查询时间段之前的采样点
+        """
+        merged = {}
+        for key, item in series.items():
+            values = [v for v in item["values"] if start <= v[0] < fetch_start]
+            merged[key] = {"metric": item["metric"], "values": values}
+
+        for item in result:
+            key = json.dumps(item["metric"], sort_keys=True)
+            if key not in merged:
+                merged[key] = {"metric": item["metric"], "values": []}
+            merged[key]["values"].extend(item.get("values") or [])
+        return {key: item for key, item in merged.items() if item["values"]}
+
+    def make_resp(self, series, start, end):
+        result = []
+        for item in series.values():
+            values = [v for v in item["values"] if start <= v[0] <= end]
+            if values:
+                result.append({"metric": item["metric"], "values": values})
+        return {"status": "success", "data": {"resultType": "matrix", "result": result}}
+
+    def get_cache(self):
+        try:
+            cached = rd_client.get(self.cache_key)
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            logger.warning("get prometheus range query cache error, %s", e)
+            return None
+
+    def set_cache(self, data, ttl):
+        try:
+            rd_client.setex(self.cache_key, json.dumps(data), max(int(ttl), self.step))
+        except Exception as e:
+            logger.warning("set prometheus range query cache error, %s", e)
+
+
 def query(_query, time=None, project_id=None):
     """查询API
     """
@@ -77,6 +183,48 @@ def get_targets(project_id, cluster_id, dedup=True):
     return resp
 
 
+class QueryBatch:
+    """批量查询
+
+    收集一次请求中的 instant/range 查询，相同的查询语句只请求一次，并发执行后按名称返回结果
+    """
+
+    def __init__(self, project_id=None, max_workers=QUERY_BATCH_MAX_WORKERS):
+        self.project_id = project_id
+        self.max_workers = max_workers
+        # name -> 查询参数, 查询参数相同的请求会合并
+        self._queries = {}
+
+    def add_query(self, name, _query, time=None):
+        self._queries[name] = ("query", _query.strip(), time)
+
+    def add_query_range(self, name, _query, start, end, step):
+        self._queries[name] = ("query_range", _query.strip(), start, end, step)
+
+    def add_queries(self, queries, prefix=""):
+        """批量添加 instant 查询, queries 格式 {name: query}"""
+        for name, _query in queries.items():
+            self.add_query(f"{prefix}{name}", _query)
+
+    def _request(self, kind, *args):
+        if kind == "query":
+            return query(*args, project_id=self.project_id)
+        return query_range(*args, project_id=self.project_id)
+
+    def execute(self):
+        """并发执行所有查询, 返回 {name: 接口响应}, 单个查询失败时响应为空字典
+        """
+        calls = {params: params for params in set(self._queries.values())}
+        results = FanOutExecutor(max_workers=self.max_workers).run(self._request, calls)
+        data = {}
+        for name, params in self._queries.items():
+            result = results[params]
+            if not result.ok:
+                logger.error("prometheus batch query error, %s: %s", params, result.exc)
+            data[name] = result.data if result.ok else {}
+        return data
+
+
 def get_first_value(prom_resp, fill_zero=True):
     """获取返回的第一个值
     """
@@ -97,9 +245,21 @@ def get_first_value(prom_resp, fill_zero=True):
     return value[1]
 
 
+def _query_first_values(queries):
+    """并发执行 instant 查询, 返回每个查询的第一个值
+    """
+    batch = QueryBatch()
+    batch.add_queries(queries)
+    return {name: get_first_value(resp) for name, resp in batch.execute().items()}
+
+
 def get_cluster_cpu_usage(cluster_id, node_ip_list):
     """获取集群nodeCPU使用率
     """
+    return _query_first_values(_get_cluster_cpu_usage_queries(cluster_id, node_ip_list))
+
+
+def _get_cluster_cpu_usage_queries(cluster_id, node_ip_list):
     node_ip_list = "|".join(f"{ip}:9100" for ip in node_ip_list)
     cpu_used_prom_query = f"""
         sum(irate(node_cpu_seconds_total{{cluster_id="{cluster_id}", job="node-exporter", mode!="idle", instance=~"{node_ip_list}"}}[2m]))
@@ -109,8 +269,7 @@ def get_cluster_cpu_usage(cluster_id, node_ip_list):
        sum(count without(cpu, mode) (node_cpu_seconds_total{{cluster_id="{cluster_id}", job="node-exporter", mode="idle", instance=~"{node_ip_list}"}}))
     """  # noqa
 
-    data = {"used": get_first_value(query(cpu_used_prom_query)), "total": get_first_value(query(cpu_count_prom_query))}
-    return data
+    return {"used": cpu_used_prom_query, "total": cpu_count_prom_query}
 
 
 def get_cluster_cpu_usage_range(cluster_id, node_ip_list):
@@ -133,6 +292,10 @@ def get_cluster_cpu_usage_range(cluster_id, node_ip_list):
 def get_cluster_memory_usage(cluster_id, node_ip_list):
     """获取集群nodeCPU使用率
     """
+    return _query_first_values(_get_cluster_memory_usage_queries(cluster_id, node_ip_list))
+
+
+def _get_cluster_memory_usage_queries(cluster_id, node_ip_list):
     node_ip_list = "|".join(f"{ip}:9100" for ip in node_ip_list)
     memory_total_prom_query = f"""
         sum(node_memory_MemTotal_bytes{{cluster_id="{cluster_id}", job="node-exporter", instance=~"{ node_ip_list }"}})
@@ -146,11 +309,7 @@ def get_cluster_memory_usage(cluster_id, node_ip_list):
         sum(node_memory_Shmem_bytes{{cluster_id="{cluster_id}", job="node-exporter", instance=~"{ node_ip_list }"}}))
     """  # noqa
 
-    data = {
-        "used_bytes": get_first_value(query(memory_used_prom_query)),
-        "total_bytes": get_first_value(query(memory_total_prom_query)),
-    }
-    return data
+    return {"used_bytes": memory_used_prom_query, "total_bytes": memory_total_prom_query}
 
 
 def get_cluster_memory_usage_range(cluster_id, node_ip_list):
@@ -178,6 +337,10 @@ def get_cluster_memory_usage_range(cluster_id, node_ip_list):
 def get_cluster_disk_usage(cluster_id, node_ip_list):
     """获取集群nodeCPU使用率
     """
+    return _query_first_values(_get_cluster_disk_usage_queries(cluster_id, node_ip_list))
+
+
+def _get_cluster_disk_usage_queries(cluster_id, node_ip_list):
     node_ip_list = "|".join(f"{ip}:9100" for ip in node_ip_list)
 
     disk_total_prom_query = f"""
@@ -189,11 +352,7 @@ def get_cluster_disk_usage(cluster_id, node_ip_list):
         sum(node_filesystem_free_bytes{{cluster_id="{cluster_id}", job="node-exporter", instance=~"{node_ip_list}", fstype=~"{ DISK_FSTYPE }", mountpoint=~"{ DISK_MOUNTPOINT }"}})
     """  # noqa
 
-    data = {
-        "used_bytes": get_first_value(query(disk_used_prom_query)),
-        "total_bytes": get_first_value(query(disk_total_prom_query)),
-    }
-    return data
+    return {"used_bytes": disk_used_prom_query, "total_bytes": disk_total_prom_query}
 
 
 def get_cluster_disk_usage_range(cluster_id, node_ip_list):
@@ -566,35 +725,37 @@ def mesos_agent_ip_remain_count(cluster_id, ip):
 def mesos_cluster_cpu_usage(cluster_id, node_list):
     """mesos集群CPU使用率
     """
-    data = {"total": "0", "remain": "0"}
-    prom_query = f"""
-        label_replace(max by (InnerIP) (bkbcs_scheduler_cluster_cpu_resource_remain{{cluster_id="{cluster_id}"}}), "metric_name", "remain", "InnerIP", ".*") or
-        label_replace(max by (InnerIP) (bkbcs_scheduler_cluster_cpu_resource_total{{cluster_id="{cluster_id}"}}), "metric_name", "total", "InnerIP", ".*")
-    """  # noqa
+    return _parse_mesos_cluster_usage(query(_get_mesos_cluster_cpu_usage_query(cluster_id)))
 
-    resp = query(prom_query)
 
+def _parse_mesos_cluster_usage(resp):
+    data = {"total": "0", "remain": "0"}
     for metric in resp.get("data", {}).get("result", []):
         name = metric["metric"].get("metric_name")
         data[name] = metric["value"][1]
     return data
 
 
+def _get_mesos_cluster_cpu_usage_query(cluster_id):
+    prom_query = f"""
+        label_replace(max by (InnerIP) (bkbcs_scheduler_cluster_cpu_resource_remain{{cluster_id="{cluster_id}"}}), "metric_name", "remain", "InnerIP", ".*") or
+        label_replace(max by (InnerIP) (bkbcs_scheduler_cluster_cpu_resource_total{{cluster_id="{cluster_id}"}}), "metric_name", "total", "InnerIP", ".*")
+    """  # noqa
+    return prom_query
+
+
 def mesos_cluster_memory_usage(cluster_id, node_list):
     """mesos集群mem使用率
     """
-    data = {"total": "0", "remain": "0"}
+    return _parse_mesos_cluster_usage(query(_get_mesos_cluster_memory_usage_query(cluster_id)))
+
+
+def _get_mesos_cluster_memory_usage_query(cluster_id):
     prom_query = f"""
         label_replace(max by (InnerIP) (bkbcs_scheduler_cluster_memory_resource_remain{{cluster_id="{cluster_id}"}}), "metric_name", "remain", "InnerIP", ".*") or
         label_replace(max by (InnerIP) (bkbcs_scheduler_cluster_memory_resource_total{{cluster_id="{cluster_id}"}}), "metric_name", "total", "InnerIP", ".*")
     """  # noqa
-
-    resp = query(prom_query)
-
-    for metric in resp.get("data", {}).get("result", []):
-        name = metric["metric"].get("metric_name")
-        data[name] = metric["value"][1]
-    return data
+    return prom_query
 
 
 def mesos_cluster_cpu_resource_remain_range(cluster_id, start, end):
@@ -667,3 +828,41 @@ def mesos_cluster_memory_resource_used_range(cluster_id, start, end):
 
     resp = query_range(prom_query, start, end, step)
     return resp.get("data") or {}
+
+
+def _parse_first_values(resps):
+    return {name: get_first_value(resp) for name, resp in resps.items()}
+
+
+# 集群概览支持的维度, 格式 {维度: (生成查询的函数, 解析查询结果的函数)}
+CLUSTER_OVERVIEW_DIMENSIONS = {
+    "cpu_usage": (_get_cluster_cpu_usage_queries, _parse_first_values),
+    "mem_usage": (_get_cluster_memory_usage_queries, _parse_first_values),
+    "disk_usage": (_get_cluster_disk_usage_queries, _parse_first_values),
+    "mesos_memory_usage": (
+        lambda cluster_id, node_list: {"usage": _get_mesos_cluster_memory_usage_query(cluster_id)},
+        lambda resps: _parse_mesos_cluster_usage(resps["usage"]),
+    ),
+    "mesos_cpu_usage": (
+        lambda cluster_id, node_list: {"usage": _get_mesos_cluster_cpu_usage_query(cluster_id)},
+        lambda resps: _parse_mesos_cluster_usage(resps["usage"]),
+    ),
+}
+
+
+def get_cluster_overview(cluster_id, node_ip_list, dimensions):
+    """获取集群概览数据, 所有维度的查询合并为一次并发请求
+    """
+    batch = QueryBatch()
+    for dimension in dimensions:
+        get_queries, _ = CLUSTER_OVERVIEW_DIMENSIONS[dimension]
+        batch.add_queries(get_queries(cluster_id, node_ip_list), prefix=f"{dimension}.")
+    results = batch.execute()
+
+    data = {}
+    for dimension in dimensions:
+        _, parse_resps = CLUSTER_OVERVIEW_DIMENSIONS[dimension]
+        prefix = f"{dimension}."
+        resps = {name[len(prefix):]: resp for name, resp in results.items() if name.startswith(prefix)}
+        data[dimension] = parse_resps(resps)
+    return data
@@ -12,7 +12,6 @@
 # specific language governing permissions and limitations under the License.
 #
 import logging
-from functools import lru_cache
 from typing import Dict, Any
 
 from django.utils.translation import ugettext_lazy as _
@@ -31,8 +30,9 @@ from backend.utils import exceptions
 logger = logging.getLogger(__name__)
 
 
-@lru_cache(maxsize=64)
 def create_api_client(access_token, project_id, cluster_id):
+    """获取集群的 ApiClient，由 k8s_client.api_client_cache 在进程内按集群和用户缓存
+    """
     client = k8s_client.K8SAPIClient(access_token, project_id, cluster_id, None)
     return client.api_client
 
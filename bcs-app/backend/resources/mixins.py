@@ -13,6 +13,8 @@
 #
 from kubernetes import client
 
+from backend.components.bcs.discovery import get_discovery_result
+
 
 class APIExtensionsAPIClassMixins:
     """
@@ -20,6 +22,9 @@ class APIExtensionsAPIClassMixins:
     """
 
     def get_api_cls_list(self, api_client):
+        return get_discovery_result(api_client, "apiextensions_cls_list", self._discover_api_cls_list)
+
+    def _discover_api_cls_list(self, api_client):
         resp = client.ApiextensionsApi(api_client).get_api_group()
         # 假定preferred_version.group_version在第一个
         group_versions = [v.group_version for v in resp.versions]
@@ -41,5 +46,8 @@ class CoreAPIClassMixins:
     支持资源类型: ConfigMap/Endpoints/Event/Namespace/Node/Pod/PersistentVolume/secret等
     """
     def get_api_cls_list(self, api_client):
+        return get_discovery_result(api_client, "core_cls_list", self._discover_api_cls_list)
+
+    def _discover_api_cls_list(self, api_client):
         versions = client.CoreApi(api_client).get_api_versions()
         return [f"Core{ver.capitalize()}Api" for ver in versions.versions]
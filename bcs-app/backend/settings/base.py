@@ -371,6 +371,8 @@ WEB_CONSOLE_MODE = "external"
 # web_console kubectld命令
 WEB_CONSOLE_KUBECTLD_IMAGE_PATH = ""
 WEB_CONSOLE_POD_SPEC = {}
+# 每个集群预先创建的空闲 kubectld pod 数量，为 0 时不启用
+WEB_CONSOLE_POD_POOL_SIZE = 0
 WEB_CONSOLE_PORT = int(os.environ.get("WEB_CONSOLE_PORT", 28800))
 
 # WEB_CONSOLE_MODE 为 external时, 指定的集群ID, token, api_host
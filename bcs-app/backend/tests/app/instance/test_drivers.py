@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+import threading
+from unittest import mock
+
+import pytest
+
+from backend.apps.instance.drivers import base
+from backend.utils.exceptions import Rollback
+
+
+class FakeScheduler(base.SchedulerBase):
+    def __init__(self, configuration):
+        super().__init__("token", "project_id", configuration, "Kubernetes", False)
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def cluster_ready(self, cluster_id):
+        pass
+
+    def handler_k8sconfigmap(self, ns, cluster_id, spec):
+        with self.lock:
+            self.calls.append((ns, "K8sConfigMap"))
+
+    def handler_k8sdeployment(self, ns, cluster_id, spec):
+        if spec.get("fail"):
+            raise Rollback({"message": "create deployment failed"})
+        with self.lock:
+            self.calls.append((ns, "K8sDeployment"))
+
+
+def make_spec(ns_name, config=None):
+    context = {"SYS_CLUSTER_ID": "BCS-K8S-00001", "SYS_NAMESPACE": ns_name, "SYS_INSTANCE_ID": 1}
+    return {"context": context, "config": config or {}, "instance_config_id": 1}
+
+
+@pytest.fixture(autouse=True)
+def patch_models():
+    with mock.patch.object(base, "InstanceConfig"), mock.patch.object(base, "VersionInstance"), mock.patch.object(
+        base, "InstanceEvent"
+    ):
+        yield
+
+
+@pytest.mark.parametrize("concurrent", [True, False])
+def test_instantiation(concurrent):
+    configuration = {
+        ns_id: {
+            "K8sDeployment": [make_spec(f"ns{ns_id}", {"fail": ns_id == 2})],
+            "K8sConfigMap": [make_spec(f"ns{ns_id}")],
+        }
+        for ns_id in range(1, 5)
+    }
+    scheduler = FakeScheduler(configuration)
+    result = scheduler.instantiation(concurrent=concurrent)
+
+    assert [ns["ns_id"] for ns in result["success"]] == [1, 3, 4]
+    assert [ns["ns_id"] for ns in result["failed"]] == [2]
+    assert result["failed"][0]["res_type"] == "K8sDeployment"
+    # 同一命名空间内按 INIT_ORDERING 顺序下发
+    for ns_name in ["ns1", "ns3", "ns4"]:
+        assert [res for ns, res in scheduler.calls if ns == ns_name] == ["K8sConfigMap", "K8sDeployment"]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+from unittest import mock
+
+from backend.apps.instance import funutils
+
+
+def test_render_mako_context():
+    content = '{"name": "{{ app_name }}", "replicas": {{ replicas }}}'
+    context = {"app_name": "<nginx>", "replicas": 2}
+    assert funutils.render_mako_context(content, context) == '{"name": "<nginx>", "replicas": 2}'
+
+    # 相同内容的模板只编译一次
+    with mock.patch.object(funutils, "Template") as template_cls:
+        funutils.render_mako_context(content, context)
+        template_cls.assert_not_called()
+
+
+def test_render_without_placeholder():
+    with mock.patch.object(funutils, "get_compiled_template") as get_compiled_template:
+        assert funutils.render_mako_context('{"name": "nginx"}', {}) == '{"name": "nginx"}'
+        get_compiled_template.assert_not_called()
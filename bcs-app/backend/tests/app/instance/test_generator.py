@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+from unittest import mock
+
+import pytest
+
+from backend.apps.instance import generator
+
+fake_project_id = "project_id"
+fake_namespaces = {
+    1: {"cluster_id": "BCS-K8S-00001", "name": "ns1", "has_image_secret": True},
+    2: {"cluster_id": "BCS-K8S-00001", "name": "ns2", "has_image_secret": False},
+}
+
+
+@pytest.fixture
+def paas_cc():
+    with mock.patch.object(generator, "paas_cc") as paas_cc, mock.patch.object(
+        generator, "get_cluster_version", return_value="v1.12.3"
+    ), mock.patch.object(generator, "get_bcs_context", return_value={"SYS_CC_APP_ID": 1}):
+        paas_cc.get_namespace.side_effect = lambda token, project_id, ns_id: {"code": 0, "data": fake_namespaces[ns_id]}
+        paas_cc.get_jfrog_domain.return_value = "docker.example.com"
+        paas_cc.get_image_registry_list.return_value = ["docker.example.com"]
+        yield paas_cc
+
+
+def test_instantiation_context(paas_cc):
+    inst_context = generator.InstantiationContext("token", fake_project_id)
+    inst_context.prefetch([1, 2])
+
+    has_image_secret, cluster_version, context = inst_context.get_ns_variable(2)
+    assert not has_image_secret
+    assert cluster_version == "v1.12.3"
+    assert context["SYS_NAMESPACE"] == "ns2"
+    assert context["SYS_JFROG_DOMAIN"] == "docker.example.com"
+    assert context["SYS_CC_APP_ID"] == 1
+
+    # 同一集群下的命名空间只查询一次集群信息
+    inst_context.get_ns_variable(1)
+    assert paas_cc.get_namespace.call_count == 2
+    assert paas_cc.get_jfrog_domain.call_count == 1
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+import json
+import re
+
+import pytest
+
+from backend.apps.configuration.constants import TemplateEditMode
+from backend.apps.configuration.models import K8sConfigMap, ShowVersion, Template, VersionedEntity
+from backend.apps.configuration.utils import get_all_template_config
+from backend.apps.variable.models import VariableQuote
+from backend.apps.variable.utils import get_variable_quote_num, parse_config_quotes, rebuild_variable_quotes
+
+PROJECT_ID = 'b37778ec757544868a01e1f01f07037f'
+
+CONFIGMAP_CONFIG = {
+    'metadata': {'name': 'nginx-conf', 'labels': {'app': '{{tag}}-{{tag}}'}},
+    'data': {'image': '{{SYS_JFROG_DOMAIN}}/nginx:{{tag}}', 'port': '{{port}}'},
+}
+
+
+def test_parse_config_quotes():
+    config = '{"image": "{{SYS_JFROG_DOMAIN}}/nginx:{{tag}}", "name": "nginx", "labels": {"app": "{{tag}}-{{tag}}"}}'
+    quotes = sorted(parse_config_quotes(config), key=lambda q: (q['quote_key'], q['key']))
+    assert quotes == [
+        {'key': 'tag', 'quote_key': 'app', 'context': '{{tag}}-{{tag}}'},
+        {'key': 'SYS_JFROG_DOMAIN', 'quote_key': 'image', 'context': '{{SYS_JFROG_DOMAIN}}/nginx:{{tag}}'},
+        {'key': 'tag', 'quote_key': 'image', 'context': '{{SYS_JFROG_DOMAIN}}/nginx:{{tag}}'},
+    ]
+
+
+def legacy_quote_num(variable_key, project_id):
+    """索引前按正则扫描模板集配置的引用计数
+    """
+    quote_num = 0
+    key_pattern = re.compile(r'"([^"]+)":\s*"([^"]*{{%s}}[^"]*)"' % variable_key)
+    for c in get_all_template_config(project_id):
+        quote_num += len(key_pattern.findall(c.get('config')))
+    return quote_num
+
+
+def create_show_version(template, name, config=None):
+    configmap = K8sConfigMap.objects.create(config=json.dumps(config or CONFIGMAP_CONFIG))
+    ventity = VersionedEntity.objects.create(
+        template_id=template.id, version=name, entity=json.dumps({'K8sConfigMap': str(configmap.id)})
+    )
+    return ShowVersion.objects.create(template_id=template.id, name=name, real_version_id=ventity.id)
+
+
+@pytest.fixture
+def template():
+    return Template.objects.create(project_id=PROJECT_ID, name='nginx', edit_mode=TemplateEditMode.PageForm.value)
+
+
+@pytest.mark.django_db
+class TestVariableQuoteIndex:
+    def test_save_show_version(self, template):
+        show_version = create_show_version(template, 'v1')
+        assert get_variable_quote_num('tag', PROJECT_ID) == 2
+        assert get_variable_quote_num('port', PROJECT_ID) == 1
+
+        # 可见版本指向新的版本后重建索引
+        configmap = K8sConfigMap.objects.create(config=json.dumps({'metadata': {'name': 'nginx-conf'}}))
+        ventity = VersionedEntity.objects.create(
+            template_id=template.id, version='v2', entity=json.dumps({'K8sConfigMap': str(configmap.id)})
+        )
+        show_version.update_real_version_id(ventity.id)
+        assert not VariableQuote.objects.filter(show_version_id=show_version.id).exists()
+
+    def test_delete_show_version(self, template):
+        create_show_version(template, 'v1')
+        show_version = create_show_version(template, 'v2')
+        assert get_variable_quote_num('tag', PROJECT_ID) == 4
+
+        show_version.delete()
+        assert get_variable_quote_num('tag', PROJECT_ID) == 2
+
+    def test_delete_template(self, template):
+        create_show_version(template, 'v1')
+        template.delete()
+        assert not VariableQuote.objects.filter(template_id=template.id).exists()
+
+    def test_rebuild_matches_legacy_count(self, template):
+        create_show_version(template, 'v1')
+        create_show_version(template, 'v2', config={'metadata': {'name': 'demo', 'namespace': '{{ns}}'}})
+        deleted_version = create_show_version(template, 'v3')
+        deleted_version.delete()
+        yaml_template = Template.objects.create(
+            project_id=PROJECT_ID, name='nginx-yaml', edit_mode=TemplateEditMode.YAML.value
+        )
+        create_show_version(yaml_template, 'v1')
+
+        VariableQuote.objects.all().delete()
+        assert rebuild_variable_quotes(PROJECT_ID) == 2
+        for key in ['tag', 'SYS_JFROG_DOMAIN', 'port', 'ns', 'not_exist']:
+            assert get_variable_quote_num(key, PROJECT_ID) == legacy_quote_num(key, PROJECT_ID)
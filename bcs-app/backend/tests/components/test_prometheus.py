@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+import zlib
+from unittest import mock
+
+import pytest
+
+from backend.components import prometheus
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, value, ttl):
+        self.data[key] = value
+
+
+def make_resp(start, end, step):
+    values = [[ts, str(ts)] for ts in range(start, end + 1, step)]
+    return {"status": "success", "data": {"resultType": "matrix", "result": [{"metric": {"a": "1"}, "values": values}]}}
+
+
+@pytest.fixture
+def fake_redis():
+    with mock.patch.object(prometheus, "rd_client", FakeRedis()) as client:
+        yield client
+
+
+class TestRangeQueryCache:
+    def test_incremental_fetch(self, fake_redis):
+        fake_query_range = mock.Mock(side_effect=lambda q, s, e, step, p: make_resp(s, e, step))
+        with mock.patch.object(prometheus, "_query_range", fake_query_range) as m:
+            # 时间按step对齐
+            resp = prometheus.query_range("up", 1005, 4599, 60)
+            assert m.call_args[0][1:4] == (960, 4560, 60)
+            assert resp["data"]["result"][0]["values"][-1][0] == 4560
+
+            # 超过最大过期时间后，只查询缓存之后的时间段
+            with mock.patch.object(prometheus.time, "time", return_value=10 ** 10):
+                resp = prometheus.query_range("up", 1605, 5199, 60)
+            fetch_start = 4560 - prometheus.RANGE_CACHE_RESETTLE_WINDOW
+            assert m.call_args[0][1:4] == (fetch_start, 5160, 60)
+
+            values = resp["data"]["result"][0]["values"]
+            assert [v[0] for v in values] == list(range(1560, 5161, 60))
+
+    def test_error_not_cached(self, fake_redis):
+        with mock.patch.object(prometheus, "_query_range", return_value={"message": "error"}):
+            assert prometheus.query_range("up", 0, 3600, 60) == {"message": "error"}
+        assert fake_redis.data == {}
+
+
+def make_vector_resp(value):
+    return {"status": "success", "data": {"resultType": "vector", "result": [{"metric": {}, "value": [0, value]}]}}
+
+
+
+def fake_query(_query, time=None, project_id=None):
+    """不同的查询语句返回不同的值"""
+    if "bkbcs_scheduler_cluster" in _query:
+        return {
+            "data": {
+                "result": [
+                    {"metric": {"metric_name": "remain"}, "value": [0, "2"]},
+                    {"metric": {"metric_name": "total"}, "value": [0, "10"]},
+                ]
+            }
+        }
+    return make_vector_resp(str(zlib.crc32(_query.strip().encode())))
+
+
+def legacy_first_values(queries):
+    """原实现逐个串行查询"""
+    return {name: prometheus.get_first_value(fake_query(q)) for name, q in queries.items()}
+
+
+class TestQueryBatch:
+    def test_dedup(self):
+        batch = prometheus.QueryBatch()
+        batch.add_query("a", "up")
+        batch.add_query("b", "\n    up\n")
+        batch.add_query("c", "down")
+        with mock.patch.object(prometheus, "query", return_value=make_vector_resp("1")) as m:
+            data = batch.execute()
+        assert m.call_count == 2
+        assert sorted(call[0][0] for call in m.call_args_list) == ["down", "up"]
+        assert data == {"a": make_vector_resp("1"), "b": make_vector_resp("1"), "c": make_vector_resp("1")}
+
+    def test_query_error(self):
+        batch = prometheus.QueryBatch()
+        batch.add_query("a", "up")
+        with mock.patch.object(prometheus, "query", side_effect=ValueError("error")):
+            assert batch.execute() == {"a": {}}
+
+    def test_cluster_overview(self):
+        cluster_id, node_ip_list = "BCS-K8S-40000", ["127.0.0.1", "127.0.0.2"]
+        dimensions = list(prometheus.CLUSTER_OVERVIEW_DIMENSIONS)
+        with mock.patch.object(prometheus, "query", side_effect=fake_query) as m:
+            data = prometheus.get_cluster_overview(cluster_id, node_ip_list, dimensions)
+            # mesos 两个维度各一条查询, 其它维度各两条
+            assert m.call_count == 8
+            assert data["cpu_usage"] == prometheus.get_cluster_cpu_usage(cluster_id, node_ip_list)
+            assert data["mem_usage"] == prometheus.get_cluster_memory_usage(cluster_id, node_ip_list)
+            assert data["disk_usage"] == prometheus.get_cluster_disk_usage(cluster_id, node_ip_list)
+            assert data["mesos_cpu_usage"] == prometheus.mesos_cluster_cpu_usage(cluster_id, node_ip_list)
+            assert data["mesos_memory_usage"] == prometheus.mesos_cluster_memory_usage(cluster_id, node_ip_list)
+
+        # 和原实现逐个查询的结果一致
+        for dimension, get_queries in [
+            ("cpu_usage", prometheus._get_cluster_cpu_usage_queries),
+            ("mem_usage", prometheus._get_cluster_memory_usage_queries),
+            ("disk_usage", prometheus._get_cluster_disk_usage_queries),
+        ]:
+            assert data[dimension] == legacy_first_values(get_queries(cluster_id, node_ip_list))
+        assert data["mesos_cpu_usage"] == {"remain": "2", "total": "10"}
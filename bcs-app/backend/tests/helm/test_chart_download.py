@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+import io
+import tarfile
+
+import pytest
+
+from backend.bcs_k8s.helm.utils.repo import ChartTooLarge, extract_template_files
+
+
+def make_tar_stream(files):
+    buf = io.BytesIO()
+    with tarfile.open(mode="w:gz", fileobj=buf) as tar:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    buf.seek(0)
+    return tarfile.open(mode="r|*", fileobj=buf)
+
+
+def test_extract_template_files():
+    tar = make_tar_stream(
+        {
+            "nginx/Chart.yaml": b"name: nginx",
+            "nginx/questions.yaml": b"questions: []",
+            "nginx/logo.png": b"\x89PNG\r\n\x1a\n\x00\x00",
+            "nginx/files/big.png": b"\x89PNG\r\n\x1a\n\x00\x00" * 10,
+        }
+    )
+    files, questions = extract_template_files("nginx", tar, max_file_size=50)
+    assert files == {"nginx/Chart.yaml": "name: nginx", "nginx/questions.yaml": "questions: []"}
+    assert questions == "questions: []"
+
+
+def test_extract_template_files_too_large():
+    tar = make_tar_stream({"nginx/a.yaml": b"a" * 40, "nginx/b.yaml": b"b" * 40})
+    with pytest.raises(ChartTooLarge):
+        extract_template_files("nginx", tar, max_total_size=50)
+
+
+def test_extract_template_files_file_too_large():
+    tar = make_tar_stream({"nginx/Chart.yaml": b"name: nginx", "nginx/templates/big.yaml": b"a" * 100})
+    with pytest.raises(ChartTooLarge):
+        extract_template_files("nginx", tar, max_file_size=50)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+import os
+
+from backend.bcs_k8s.kubehelm.workspace import ChartWorkspaceCache
+
+files = {"nginx/Chart.yaml": "name: nginx\nversion: 0.1.0", "nginx/templates/deploy.yaml": "kind: Deployment"}
+
+
+def test_reuse_workspace(tmpdir):
+    cache = ChartWorkspaceCache(str(tmpdir), max_size=1024)
+    with cache.use(files) as chart_dir:
+        assert os.path.basename(chart_dir) == "nginx"
+        with open(os.path.join(chart_dir, "templates", "deploy.yaml")) as f:
+            assert f.read() == "kind: Deployment"
+    with cache.use(dict(files)) as same_chart_dir:
+        assert same_chart_dir == chart_dir
+
+    # 内容变化时使用新的目录
+    with cache.use({**files, "nginx/values.yaml": "replicas: 1"}) as new_chart_dir:
+        assert new_chart_dir != chart_dir
+
+
+def test_evict_by_size(tmpdir):
+    cache = ChartWorkspaceCache(str(tmpdir), max_size=50, min_idle=0)
+    with cache.use(files):
+        pass
+    with cache.use({"redis/Chart.yaml": "name: redis\nversion: 0.1.0"}):
+        pass
+    # 超出大小后，最久未使用的目录被淘汰
+    assert len(os.listdir(str(tmpdir))) == 1
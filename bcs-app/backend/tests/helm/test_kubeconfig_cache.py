@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+import os
+import subprocess
+from unittest import mock
+
+import pytest
+
+from backend.bcs_k8s import kubectl
+from backend.bcs_k8s.bke_client.client import BCSClusterClient
+from backend.bcs_k8s.kubectl.exceptions import KubectlExecutionError
+from backend.bcs_k8s.kubectl.kubeconfig import KubeConfigFileCache
+
+
+def test_kubeconfig_file_cache(tmpdir):
+    cache = KubeConfigFileCache(ttl=60, cache_dir=str(tmpdir))
+    render = mock.Mock(return_value=("apiVersion: v1", {"token": "x"}))
+
+    with cache.use("cluster", render) as (path, extra):
+        with cache.use("cluster", render) as (shared_path, _):
+            assert shared_path == path
+        with open(path) as f:
+            assert f.read() == "apiVersion: v1"
+        assert extra == {"token": "x"}
+    assert render.call_count == 1
+
+    # 失效后，正在使用的文件在释放时才删除
+    with cache.use("cluster", render) as (path, _):
+        cache.invalidate("cluster")
+        assert os.path.exists(path)
+        with cache.use("cluster", render) as (new_path, _):
+            assert new_path != path
+    assert not os.path.exists(path)
+    assert render.call_count == 2
+
+
+def test_kubeconfig_file_expired(tmpdir):
+    cache = KubeConfigFileCache(ttl=0, cache_dir=str(tmpdir))
+    render = mock.Mock(return_value=("apiVersion: v1", None))
+    with cache.use("cluster", render) as (path, _):
+        pass
+    with cache.use("cluster", render) as (new_path, _):
+        assert new_path != path
+        assert not os.path.exists(path)
+
+
+def test_invalidate_kubeconfig_on_unauthorized(tmpdir):
+    cache = KubeConfigFileCache(ttl=60, cache_dir=str(tmpdir))
+    client = BCSClusterClient(host="", access_token="token", project_id="project", cluster_id="BCS-K8S-40000")
+    error = subprocess.CalledProcessError(1, "kubectl", b"error: You must be logged in to the server (Unauthorized)")
+
+    with mock.patch.object(kubectl, "kubeconfig_cache", cache), mock.patch.object(
+        client, "render_kubeconfig", return_value=("apiVersion: v1", {})
+    ) as render, mock.patch(
+        "backend.bcs_k8s.bke_client.client.get_cluster_proper_kubectl", return_value=("kubectl", "1.12.3")
+    ):
+        with client.make_kubectl_client() as kubectl_client:
+            with mock.patch("subprocess.check_output", side_effect=error):
+                with pytest.raises(KubectlExecutionError):
+                    kubectl_client._run_command(["kubectl", "get", "pods"])
+
+        with client.make_kubectl_client():
+            pass
+        assert render.call_count == 2
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+import io
+
+import pytest
+
+from backend.bcs_k8s.diff import diff
+
+
+def apply_opcodes(a_lines, b_lines, opcodes):
+    old, new = [], []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            assert a_lines[i1:i2] == b_lines[j1:j2]
+            old.extend(a_lines[i1:i2])
+            new.extend(a_lines[i1:i2])
+        elif tag == "delete":
+            old.extend(a_lines[i1:i2])
+        else:
+            new.extend(b_lines[j1:j2])
+    return old, new
+
+
+@pytest.mark.parametrize(
+    "a_lines, b_lines",
+    [
+        ([], ["a"]),
+        (["a"], []),
+        (list("abcabba"), list("cbabac")),
+        (list("abcdefg"), list("axcyefz")),
+        (["x"] * 10, ["x"] * 7 + ["y"]),
+    ],
+)
+def test_diff_lines(a_lines, b_lines):
+    old, new = apply_opcodes(a_lines, b_lines, diff.diff_lines(a_lines, b_lines))
+    assert old == a_lines
+    assert new == b_lines
+
+
+def test_diff_lines_over_max_cost(monkeypatch):
+    monkeypatch.setattr(diff, "MAX_EDIT_COST", 1)
+    a_lines, b_lines = list("abcabba"), list("cbabac")
+    old, new = apply_opcodes(a_lines, b_lines, diff.diff_lines(a_lines, b_lines))
+    assert old == a_lines
+    assert new == b_lines
+
+
+def test_print_diff_with_context():
+    before = "".join(f"line{i}\n" for i in range(10))
+    after = before.replace("line5\n", "changed\n")
+    output = io.StringIO()
+    diff.print_diff([], "ConfigMap", 1, before.encode(), after.encode(), output)
+    assert output.getvalue() == "...  line4\n- line5\n+ changed\n  line6\n..."
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+from backend.bcs_k8s.app.status import ReleaseStatusCollector, match_selector
+
+
+def make_pod(name, phase, ready):
+    return {
+        "metadata": {"name": name, "labels": {"app": "nginx"}},
+        "status": {"phase": phase, "conditions": [{"type": "Ready", "status": "True" if ready else "False"}]},
+    }
+
+
+class FakeCollector(ReleaseStatusCollector):
+    resources = {
+        "deployment": [{"metadata": {"name": "nginx"}, "spec": {"replicas": 2, "selector": {"matchLabels": {"app": "nginx"}}}}],
+        "service": [{"metadata": {"name": "nginx"}}],
+    }
+
+    def list_resources(self, kind):
+        return self.resources.get(kind, [])
+
+    def list_pods(self):
+        return [make_pod("nginx-1", "Running", True), make_pod("nginx-2", "Pending", False)]
+
+    def list_warning_events(self):
+        return {"nginx-2": [{"message": "0/3 nodes are available", "type": "Warning"}]}
+
+
+def test_match_selector():
+    assert match_selector({"matchLabels": {"app": "nginx"}}, {"app": "nginx", "tier": "web"})
+    assert not match_selector({"matchLabels": {"app": "nginx"}}, {"app": "redis"})
+    assert match_selector({"matchExpressions": [{"key": "tier", "operator": "In", "values": ["web"]}]}, {"tier": "web"})
+    assert not match_selector({}, {"app": "nginx"})
+
+
+def test_collect_release_status():
+    structure = [
+        {"kind": "Deployment", "name": "nginx"},
+        {"kind": "Service", "name": "nginx"},
+        {"kind": "ConfigMap", "name": "nginx"},
+        {"kind": "CronJob", "name": "backup"},
+    ]
+    result = FakeCollector(None, "default").collect(structure)
+
+    pods = result[("Deployment", "nginx")]["pods"]
+    assert (pods["desired"], pods["running"], pods["pending"]) == (2, 1, 1)
+    assert [w["message"] for w in pods["warnings"]] == ["0/3 nodes are available"]
+    assert "pods" not in result[("Service", "nginx")]
+    assert result[("ConfigMap", "nginx")] == {}
+    assert result[("CronJob", "backup")]["typeMeta"] == {"kind": "CronJob"}
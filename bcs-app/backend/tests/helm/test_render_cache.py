@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+import json
+import zlib
+
+import pytest
+
+from backend.bcs_k8s.kubehelm.render_cache import RenderCache, get_render_key
+from backend.bcs_k8s.diff import parser
+
+files = {"nginx/Chart.yaml": "name: nginx\nversion: 0.1.0"}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+def test_render_key():
+    key = get_render_key(files, name="nginx", namespace="default", parameters={"a": 1, "b": 2})
+    assert key == get_render_key(dict(files), name="nginx", namespace="default", parameters={"b": 2, "a": 1})
+    assert key != get_render_key(files, name="nginx", namespace="test", parameters={"a": 1, "b": 2})
+
+
+def test_get_or_render():
+    cache = RenderCache(FakeRedis(), ttl=60, max_size=1024)
+    calls = []
+
+    def render():
+        calls.append(1)
+        return b"kind: Deployment", ""
+
+    assert cache.get_or_render("key", render) == (b"kind: Deployment", "")
+    assert cache.get_or_render("key", render) == (b"kind: Deployment", "")
+    assert len(calls) == 1
+
+
+def test_cache_stored_as_json():
+    client = FakeRedis()
+    cache = RenderCache(client, ttl=60, max_size=1024)
+    cache.set("key", b"kind: Deployment", "")
+    assert json.loads(zlib.decompress(client.data["key"]))["outputs"] == {
+        "template_out": "kind: Deployment",
+        "notes_out": "",
+    }
+    assert cache.get("key") == (b"kind: Deployment", "")
+
+    # 无法解析的缓存内容按未命中处理
+    client.data["key"] = b"invalid"
+    assert cache.get("key") is None
+
+
+def test_render_error_not_cached():
+    cache = RenderCache(FakeRedis(), ttl=60, max_size=1024)
+
+    def render():
+        raise ValueError("render failed")
+
+    with pytest.raises(ValueError):
+        cache.get_or_render("key", render)
+    assert cache.get("key") is None
+
+
+def test_parse_cached():
+    manifest = b"kind: Service\nmetadata:\n  name: nginx\n"
+    index = parser.parse(manifest, "default")
+    index.pop("Service/nginx")
+    # 修改返回结果不影响缓存
+    assert list(parser.parse(manifest, "default")) == ["Service/nginx"]
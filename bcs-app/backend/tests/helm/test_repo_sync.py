@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+import pytest
+
+from backend.bcs_k8s.kubehelm.helm import KubeHelmClient
+
+
+@pytest.fixture(scope="module", autouse=True)
+def mock_run_command_with_retry():
+    with patch.object(KubeHelmClient, "_run_command_with_retry", return_value=(None, None)) as mock_method:
+        yield mock_method
+
+from unittest import mock
+
+import pytest
+
+from backend.bcs_k8s.helm import tasks
+from backend.bcs_k8s.helm.models.chart import Chart, ChartVersion
+from backend.bcs_k8s.helm.models.repo import Repository
+from backend.bcs_k8s.helm.utils.repo import ChartDownloader
+
+files = {"nginx/Chart.yaml": "name: nginx\nversion: 0.1.0"}
+
+
+def make_version(version, digest, created):
+    return {
+        "name": "nginx",
+        "version": version,
+        "digest": digest,
+        "created": created,
+        "urls": [f"charts/nginx-{version}.tgz"],
+    }
+
+
+@pytest.fixture
+def repo():
+    return Repository.objects.create(
+        url="http://repo.example.com/charts/", name="demo", project_id="b37778ec757544868a01e1f01f07037f"
+    )
+
+
+def sync(repo, charts):
+    with mock.patch.object(ChartDownloader, "prefetch"), mock.patch.object(
+        ChartDownloader, "download", return_value=(True, files, {})
+    ):
+        tasks._do_helm_repo_charts_update(repo, mock.Mock(), charts, "index-hash")
+
+
+@pytest.mark.django_db
+def test_do_helm_repo_charts_update(repo):
+    Chart.objects.create(name="removed", repository=repo, icon="")
+    v1 = make_version("0.1.0", "digest-1", "2020-01-01T00:00:00Z")
+    v2 = make_version("0.2.0", "digest-2", "2020-02-01T00:00:00Z")
+    sync(repo, {"nginx": [v1, v2]})
+
+    chart = Chart.objects.get(repository=repo, name="nginx")
+    assert sorted(ChartVersion.objects.filter(chart=chart).values_list("version", flat=True)) == ["0.1.0", "0.2.0"]
+    assert chart.defaultChartVersion.version == "0.2.0"
+    assert ChartVersion.objects.get(chart=chart, version="0.1.0").files == files
+    assert Chart.objects.get(repository=repo, name="removed").deleted
+    repo.refresh_from_db()
+    assert repo.commit == "index-hash"
+
+    # index 中移除的版本同步删除
+    sync(repo, {"nginx": [make_version("0.2.0", "digest-2", "2020-02-01T00:00:00Z")]})
+    assert list(ChartVersion.objects.filter(chart=chart).values_list("version", flat=True)) == ["0.2.0"]
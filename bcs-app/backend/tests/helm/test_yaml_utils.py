@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+from backend.apps.configuration.yaml_mode.release import get_compiled_template
+from backend.bcs_k8s.app.utils import yaml_dump, yaml_load
+
+
+def test_yaml_dump_without_aliases():
+    labels = {"app": "nginx"}
+    content = yaml_dump({"metadata": {"labels": labels}, "selector": {"matchLabels": labels}, "value": None})
+
+    assert "&" not in content and "*" not in content
+    assert yaml_load(content) == {"metadata": {"labels": labels}, "selector": {"matchLabels": labels}, "value": None}
+
+
+def test_compiled_template_reused():
+    raw_content = "replicas: {{ replicas }}"
+
+    assert get_compiled_template(raw_content) is get_compiled_template(raw_content)
+    assert get_compiled_template(raw_content).render({"replicas": 2}) == "replicas: 2"
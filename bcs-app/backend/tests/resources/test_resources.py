@@ -13,7 +13,9 @@
 #
 from unittest import mock
 
+from backend.components.bcs.discovery import get_discovery_result, invalidate_api_discovery
 from backend.components.bcs.k8s import K8SClient
+from backend.components.bcs.k8s_client import K8SAPIClient, invalidate_api_client
 from backend.components.bcs.resources.namespace import Namespace
 
 from .conftest import TESTING_API_SERVER_URL
@@ -51,3 +53,42 @@ class TestK8SClient:
             access_token = 'foo'
             client = K8SClient(access_token, project_id, cluster_id, None)
             client.get_namespace()
+
+
+class TestK8SAPIClientCache:
+    def test_shared_api_client(self, cluster_id, project_id):
+        with mock.patch(
+            'backend.components.bcs.k8s_client.K8SAPIClient.query_cluster', return_value={'id': cluster_id}
+        ) as query_cluster, mock.patch(
+            'backend.components.bcs.k8s_client.K8SAPIClient.get_client_credentials',
+            return_value={'server_address_path': '', 'user_token': 'fake_user_token'},
+        ), mock.patch(
+            'backend.components.bcs.BCSClientBase._bcs_server_host',
+            new_callable=mock.PropertyMock,
+            return_value=TESTING_API_SERVER_URL,
+        ):
+            api_client = K8SAPIClient('foo', project_id, cluster_id, None).api_client
+            assert K8SAPIClient('foo', project_id, cluster_id, None).api_client is api_client
+            assert query_cluster.call_count == 1
+
+            # 不同用户的凭证分别获取
+            other_api_client = K8SAPIClient('bar', project_id, cluster_id, None).api_client
+            assert other_api_client is not api_client
+            assert query_cluster.call_count == 2
+
+            invalidate_api_client(project_id, cluster_id)
+            assert K8SAPIClient('foo', project_id, cluster_id, None).api_client is not api_client
+            assert K8SAPIClient('bar', project_id, cluster_id, None).api_client is not other_api_client
+            assert query_cluster.call_count == 4
+
+
+class TestAPIDiscoveryCache:
+    def test_cached_per_cluster(self, testing_kubernetes_apiclient):
+        discover_func = mock.Mock(return_value="AppsV1Api")
+        for _ in range(3):
+            assert get_discovery_result(testing_kubernetes_apiclient, "apps", discover_func) == "AppsV1Api"
+        assert discover_func.call_count == 1
+
+        invalidate_api_discovery(testing_kubernetes_apiclient)
+        get_discovery_result(testing_kubernetes_apiclient, "apps", discover_func)
+        assert discover_func.call_count == 2
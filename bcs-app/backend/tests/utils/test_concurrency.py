@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+import time
+
+import pytest
+
+from backend.utils.concurrency import FanOutExecutor, FanOutTimeout
+from backend.utils.local import local
+
+
+def double(value):
+    if value < 0:
+        raise ValueError("negative value")
+    return value * 2
+
+
+class TestFanOutExecutor:
+    def test_partial_failure(self):
+        results = FanOutExecutor(max_workers=2).run(double, {"a": (1,), "b": (-1,), "c": (3,)})
+        assert results.succeeded == {"a": 2, "c": 6}
+        assert isinstance(results.failed["b"], ValueError)
+        with pytest.raises(ValueError):
+            results.raise_for_error()
+
+    def test_timeout(self):
+        results = FanOutExecutor(timeout=0.1).run(time.sleep, {"slow": (1,), "fast": (0,)})
+        assert list(results.succeeded) == ["fast"]
+        assert isinstance(results.failed["slow"], FanOutTimeout)
+
+    def test_timeout_per_call(self):
+        # 排队等待的调用从开始执行时计时，不会因为前面的调用耗时而超时
+        results = FanOutExecutor(max_workers=1, timeout=0.3).run(time.sleep, {"a": (0.2,), "b": (0.2,), "c": (0.2,)})
+        assert set(results.succeeded) == {"a", "b", "c"}
+
+    def test_workers_hang(self):
+        # 线程全部被卡住时，排队的调用不会一直等待
+        start = time.monotonic()
+        results = FanOutExecutor(max_workers=1, timeout=0.2).run(time.sleep, {"hang": (1,), "a": (0,), "b": (0,)})
+        assert time.monotonic() - start < 0.8
+        assert not results.succeeded
+        assert all(isinstance(exc, FanOutTimeout) for exc in results.failed.values())
+
+    def test_request_propagation(self, rf):
+        request = rf.get("/")
+        request.request_id = "fake-request-id"
+        local.request = request
+        try:
+            results = FanOutExecutor().run(lambda: local.request_id, {"a": ()})
+        finally:
+            local.release()
+        assert results.succeeded == {"a": "fake-request-id"}
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+from unittest import mock
+
+import pytest
+from tornado.ioloop import IOLoop
+
+from backend.web_console import constants
+from backend.web_console.auditor import AuditWriter
+
+
+class FakeRedis:
+    def __init__(self):
+        self.records = []
+        self.fail = False
+
+    def pipeline(self, transaction=True):
+        pipe = mock.Mock()
+        pushed = []
+        pipe.rpush.side_effect = lambda queue_name, value: pushed.append(value)
+
+        def execute():
+            if self.fail:
+                raise ConnectionError("redis unavailable")
+            self.records.extend(pushed)
+
+        pipe.execute.side_effect = execute
+        return pipe
+
+
+@pytest.fixture
+def client():
+    return FakeRedis()
+
+
+@pytest.fixture
+def writer(client):
+    return AuditWriter(client, "bcs_web_console_record", mock.Mock(format=str), max_pending=3)
+
+
+def test_emit_back_pressure(writer):
+    for i in range(3):
+        assert writer.emit({"session_id": i})
+    assert writer.is_full()
+    assert not writer.emit({"session_id": 3})
+
+
+def test_requeue_on_write_failure(client, writer):
+    records = [{"session_id": i} for i in range(3)]
+    for record in records:
+        writer.emit(record)
+
+    client.fail = True
+    IOLoop.current().run_sync(writer.flush)
+    assert list(writer._pending) == records
+    assert client.records == []
+
+    client.fail = False
+    IOLoop.current().run_sync(writer.flush)
+    assert client.records == [str(record) for record in records]
+    assert not writer._pending
+
+
+def test_drain(client):
+    writer = AuditWriter(client, "bcs_web_console_record", mock.Mock(format=str))
+    record_num = constants.AUDIT_BATCH_SIZE * 2 + 1
+    for i in range(record_num):
+        writer.emit({"session_id": i})
+
+    IOLoop.current().run_sync(writer.drain)
+    assert len(client.records) == record_num
+    assert not writer._pending
+
+    # 写入一直失败时放弃，不会阻塞退出
+    writer.emit({"session_id": 0})
+    client.fail = True
+    IOLoop.current().run_sync(writer.drain)
+    assert len(writer._pending) == 1
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+import json
+import time
+from types import SimpleNamespace
+
+from backend.web_console import constants
+from backend.web_console.pod_life_cycle import PodLifeCycle, PodPool, UserPodCache
+
+
+def make_pod(name, phase="Running", labeled=True, create_timestamp=0, pool=None):
+    labels = {constants.LABEL_WEB_CONSOLE_CREATE_TIMESTAMP: str(create_timestamp)}
+    if labeled:
+        labels[constants.LABEL_WEB_CONSOLE_USER_POD] = name
+    if pool:
+        labels[constants.LABEL_WEB_CONSOLE_POOL] = pool
+        labels[constants.LABEL_WEB_CONSOLE_POOL_STATE] = constants.PodPoolState.IDLE.value
+    volume = SimpleNamespace(config_map=SimpleNamespace(name=f"cm-{name}"))
+    return SimpleNamespace(
+        metadata=SimpleNamespace(name=name, labels=labels, deletion_timestamp=None),
+        status=SimpleNamespace(phase=phase),
+        spec=SimpleNamespace(volumes=[volume]),
+    )
+
+
+class FakeCoreV1Api:
+    def __init__(self, pods):
+        self.pods = pods
+        self.calls = []
+
+    def list_namespaced_pod(self, namespace, **kwargs):
+        self.calls.append(("list", kwargs["label_selector"]))
+        return SimpleNamespace(metadata=SimpleNamespace(resource_version="10"), items=self.pods)
+
+    def delete_collection_namespaced_pod(self, namespace, label_selector):
+        self.calls.append(("delete_pods", label_selector))
+
+    def delete_collection_namespaced_config_map(self, namespace, label_selector):
+        self.calls.append(("delete_configmaps", label_selector))
+
+    def create_namespaced_pod(self, body, namespace):
+        self.calls.append(("create_pod", body["metadata"]["labels"][constants.LABEL_WEB_CONSOLE_POOL]))
+
+    def delete_namespaced_pod(self, name, namespace, body):
+        self.calls.append(("delete_pod", name))
+
+    def delete_namespaced_config_map(self, name, namespace, body):
+        self.calls.append(("delete_configmap", name))
+
+
+def test_clean_user_pod_by_cluster(monkeypatch):
+    monkeypatch.setattr("backend.web_console.pod_life_cycle.user_pod_cache", UserPodCache())
+    v1 = FakeCoreV1Api(
+        [
+            make_pod("alive"),
+            make_pod("pending", phase="Pending"),
+            make_pod("new", create_timestamp=int(time.time())),
+            make_pod("expired-1"),
+            make_pod("expired-2"),
+            make_pod("legacy", labeled=False),
+            make_pod("idle", labeled=False, pool="bcs-k8s-1"),
+        ]
+    )
+
+    deleted = PodLifeCycle()._clean_user_pod_by_cluster(v1, "bcs-k8s-1", {"alive"}, time.time() - 60)
+
+    selector = f"{constants.LABEL_WEB_CONSOLE_USER_POD} in (expired-1,expired-2)"
+    assert deleted == 3
+    assert v1.calls == [
+        ("list", constants.LABEL_WEB_CONSOLE_CREATE_TIMESTAMP),
+        # 未启用预热池时回收空闲 pod
+        ("delete_pod", "idle"),
+        ("delete_pod", "legacy"),
+        ("delete_configmap", "cm-legacy"),
+        ("delete_pods", selector),
+        ("delete_configmaps", selector),
+    ]
+
+
+class TestPodPool:
+    def test_replenish(self, monkeypatch):
+        pool = PodPool(size=2)
+        monkeypatch.setattr(pool, "get_template", lambda cluster_id: {"spec": {"containers": []}})
+        v1 = FakeCoreV1Api([])
+
+        pods = [make_pod("idle-1", labeled=False, pool="bcs-k8s-1"), make_pod("idle-2", labeled=False, pool="other")]
+        pool.replenish(v1, "bcs-k8s-1", pods)
+        assert v1.calls == [("create_pod", "bcs-k8s-1")]
+
+    def test_save_template(self, monkeypatch):
+        body = {
+            "metadata": {"name": "kubectld-bcs-k8s-1-u-admin"},
+            "spec": {
+                "containers": [
+                    {
+                        "name": "kubectld-bcs-k8s-1-u-admin",
+                        "volumeMounts": [
+                            {"name": "kube-config", "mountPath": "/root/.kube"},
+                            {"name": "certs", "mountPath": "/etc/certs"},
+                        ],
+                    }
+                ],
+                "volumes": [{"name": "kube-config", "configMap": {}}, {"name": "certs", "hostPath": {}}],
+            },
+        }
+        saved = {}
+        monkeypatch.setattr("backend.web_console.pod_life_cycle.render_pod_body", lambda ctx: body)
+        rd_client = SimpleNamespace(set=lambda key, value, ex: saved.update(template=value))
+        monkeypatch.setattr("backend.web_console.pod_life_cycle.rd_client", rd_client)
+
+        PodPool(size=2).save_template({"source_cluster_id": "BCS-K8S-1"})
+        template = json.loads(saved["template"])
+        assert template["metadata"] == {}
+        assert template["spec"]["containers"] == [
+            {"name": "kubectld", "volumeMounts": [{"name": "certs", "mountPath": "/etc/certs"}]}
+        ]
+        assert template["spec"]["volumes"] == [{"name": "certs", "hostPath": {}}]
+
+    def test_shrink_without_template(self, monkeypatch):
+        pool = PodPool(size=2)
+        monkeypatch.setattr(pool, "get_template", lambda cluster_id: None)
+        v1 = FakeCoreV1Api([])
+
+        pool.replenish(v1, "bcs-k8s-1", [make_pod("idle-1", labeled=False, pool="bcs-k8s-1")])
+        assert v1.calls == [("delete_pod", "idle-1")]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+from backend.web_console.recorder import OutputRecorder
+
+
+def contents(records):
+    return [i.split(": ", 1)[1] if ": " in i else i for i in records]
+
+
+class TestOutputRecorder:
+    def test_split_lines_across_messages(self):
+        recorder = OutputRecorder()
+        for msg in ["hel", "lo\r", "\nwor", "ld\r\n\x1b[31mred\x1b[0m\r\nlast"]:
+            recorder.feed(msg)
+
+        assert contents(recorder.flush()) == ["hello", "world", "red"]
+        assert recorder.flush() == []
+
+        recorder.feed("\r\n")
+        assert contents(recorder.flush()) == ["last"]
+
+    def test_drop_oldest_lines(self):
+        recorder = OutputRecorder(max_lines=3)
+        recorder.feed("".join(f"line-{i}\r\n" for i in range(10)))
+        recorder.feed("line-10\r\n")
+
+        assert recorder.dropped == 8
+        assert contents(recorder.flush()) == ["... 8 lines dropped ...", "line-8", "line-9", "line-10"]
+        assert recorder.dropped == 0
+
+    def test_max_line_length(self):
+        recorder = OutputRecorder(max_line_length=5)
+        for i in range(100):
+            recorder.feed(f"\r{i:03d}%")
+        recorder.feed("\r\n")
+
+        assert contents(recorder.flush()) == ["\r099%"]
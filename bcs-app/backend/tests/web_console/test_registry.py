@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+from unittest import mock
+
+from tornado.ioloop import IOLoop
+
+from backend.web_console import constants
+from backend.web_console.registry import SessionRegistry
+
+
+def test_register_ref_count():
+    registry = SessionRegistry()
+    registry.register("kubectld-pod-1")
+    registry.register("kubectld-pod-1")
+    registry.register("kubectld-pod-2")
+
+    registry.unregister("kubectld-pod-1")
+    assert sorted(registry.pods) == ["kubectld-pod-1", "kubectld-pod-2"]
+
+    registry.unregister("kubectld-pod-1")
+    registry.unregister("kubectld-pod-2")
+    assert registry.pods == []
+
+
+@mock.patch("backend.web_console.registry.rd_client")
+def test_heartbeat_single_zadd(rd_client):
+    registry = SessionRegistry()
+    IOLoop.current().run_sync(registry.heartbeat)
+    rd_client.zadd.assert_not_called()
+
+    for name in ["kubectld-pod-1", "kubectld-pod-1", "kubectld-pod-2"]:
+        registry.register(name)
+    IOLoop.current().run_sync(registry.heartbeat)
+
+    rd_client.zadd.assert_called_once()
+    args, kwargs = rd_client.zadd.call_args
+    assert args == (constants.WEB_CONSOLE_HEARTBEAT_KEY,)
+    assert sorted(kwargs) == ["kubectld-pod-1", "kubectld-pod-2"]
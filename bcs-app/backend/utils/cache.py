@@ -11,6 +11,10 @@
 # an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 #
+import threading
+import time
+from collections import OrderedDict
+
 from django.conf import settings
 from dogpile.cache import make_region
 import redis
@@ -31,3 +35,72 @@ region = make_region().configure(
         'redis_expiration_time': 7 * 24 * 3600  # 最长cache时间
     }
 )
+
+
+class LocalTTLCache:
+    """进程内带过期时间的 LRU 缓存
+
+    用于缓存无法序列化到 Redis 的对象(如 kubernetes ApiClient)，在同一进程的多个请求间共享
+
+    :param ttl: 缓存有效期，单位秒
+    :param maxsize: 最多缓存的条目数，超出后淘汰最久未使用的条目
+    """
+
+    def __init__(self, ttl, maxsize=256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expired_at = item
+            if expired_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expired_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expired_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_by(self, predicate):
+        """删除 key 满足 predicate 的所有条目"""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_set(self, key, factory, ttl=None):
+        """获取缓存，不存在时调用 factory 生成并缓存
+
+        factory 在锁外执行，避免慢请求阻塞其它 key 的读取；并发时可能重复生成，以后写入者为准
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = factory()
+        self.set(key, value, ttl=ttl)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -12,15 +12,15 @@
 # specific language governing permissions and limitations under the License.
 #
 import contextlib
+import hashlib
 import logging
-import tempfile
 
 from django.conf import settings
 from rest_framework.exceptions import APIException
 from kubernetes.client.rest import ApiException
 
 from backend.bcs_k8s.bke_client import BCSClusterClient
-from backend.bcs_k8s.kubectl import KubectlClusterClient
+from backend.bcs_k8s.kubectl import KubectlClusterClient, kubeconfig_cache
 from backend.bcs_k8s.dashboard import DashboardClient
 from backend.components import bcs
 from backend.utils.error_codes import error_codes
@@ -87,10 +87,10 @@ def get_bcs_client(project_id, cluster_id, access_token):
 
 @contextlib.contextmanager
 def make_kubectl_client_from_kubeconfig(kubeconfig_content, **options):
-    with tempfile.NamedTemporaryFile() as fp:
-        fp.write(kubeconfig_content.encode())
-        fp.flush()
-        kubectl_client = KubectlClusterClient(kubectl_bin=settings.KUBECTL_BIN, kubeconfig=fp.name, **options)
+    # 相同内容的 kubeconfig 共享同一个文件
+    key = ("content", hashlib.sha1(kubeconfig_content.encode()).hexdigest())
+    with kubeconfig_cache.use(key, lambda: (kubeconfig_content, None)) as (filename, _):
+        kubectl_client = KubectlClusterClient(kubectl_bin=settings.KUBECTL_BIN, kubeconfig=filename, **options)
         yield kubectl_client
 
 
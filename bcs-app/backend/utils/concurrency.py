@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""并发执行相关工具
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from dataclasses import dataclass
+from django.conf import settings
+from django.db import connections
+
+from backend.utils.local import local
+
+logger = logging.getLogger(__name__)
+
+# 默认的最大并发数和单个调用的超时时间(秒)
+DEFAULT_MAX_WORKERS = getattr(settings, "FAN_OUT_MAX_WORKERS", 10)
+DEFAULT_TIMEOUT = getattr(settings, "FAN_OUT_TIMEOUT", 30)
+
+
+class FanOutTimeout(Exception):
+    """调用在超时时间内未完成"""
+
+
+@dataclass
+class CallResult:
+    key: Hashable
+    data: Any = None
+    exc: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.exc is None
+
+
+class FanOutResults(dict):
+    """key 为调用的标识(如集群 ID)，value 为 CallResult"""
+
+    @property
+    def succeeded(self) -> Dict[Hashable, Any]:
+        return {key: result.data for key, result in self.items() if result.ok}
+
+    @property
+    def failed(self) -> Dict[Hashable, BaseException]:
+        return {key: result.exc for key, result in self.items() if not result.ok}
+
+    def raise_for_error(self):
+        """存在失败的调用时，抛出第一个异常"""
+        for exc in self.failed.values():
+            raise exc
+
+
+class _StartedEvent(threading.Event):
+    """记录调用开始执行的时间"""
+
+    started_at = None
+
+    def mark(self):
+        self.started_at = time.monotonic()
+        self.set()
+
+
+class FanOutExecutor:
+    """有并发上限的批量调用执行器，用于按集群等维度并发请求后端服务
+
+    - 单个调用异常或超时不影响其它调用，结果中记录对应的异常
+    - 子线程中透传当前请求对象，保证日志和下游请求使用相同的 request_id
+
+    :param max_workers: 最大并发数
+    :param timeout: 单个调用的超时时间(秒)，从调用开始执行时计算，排队等待空闲线程的时间不计入，
+        但等待开始执行的时间同样不超过 timeout；超时的调用仍会占用线程直到结束
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+    def run(self, func: Callable, calls: Dict[Hashable, Tuple]) -> FanOutResults:
+        """并发执行 func(*args)
+
+        :param calls: key 为调用标识，value 为调用参数
+        """
+        results = FanOutResults()
+        if not calls:
+            return results
+
+        request = local.request
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(calls)))
+        try:
+            futures = {}
+            for key, args in calls.items():
+                started = _StartedEvent()
+                futures[key] = (executor.submit(self._call, request, func, args, started), started)
+            # 等待调用开始执行的最长时间，线程全部被卡住时不再等待后续调用
+            start_timeout = self.timeout
+            for key, (future, started) in futures.items():
+                results[key] = self._get_result(key, future, started, start_timeout)
+                if not started.is_set():
+                    start_timeout = 0
+        finally:
+            # 不等待超时的调用结束，避免阻塞当前请求
+            executor.shutdown(wait=False)
+        return results
+
+    def _get_result(self, key, future, started, start_timeout) -> CallResult:
+        timeout = None
+        if self.timeout is not None:
+            # 等待调用开始执行后再计时，超时仍未开始时取消调用
+            if not started.wait(start_timeout):
+                future.cancel()
+                logger.error("fan out call not started, key: %s, timeout: %s", key, self.timeout)
+                return CallResult(key=key, exc=FanOutTimeout(f"call {key} not started after {self.timeout}s"))
+            timeout = max(self.timeout - (time.monotonic() - started.started_at), 0)
+        try:
+            return CallResult(key=key, data=future.result(timeout=timeout))
+        except FutureTimeoutError:
+            future.cancel()
+            logger.error("fan out call timeout, key: %s, timeout: %s", key, self.timeout)
+            return CallResult(key=key, exc=FanOutTimeout(f"call {key} timeout after {self.timeout}s"))
+        except Exception as e:
+            logger.exception("fan out call error, key: %s, error: %s", key, e)
+            return CallResult(key=key, exc=e)
+
+    def _call(self, request, func, args, started):
+        started.mark()
+        local.request = request
+        try:
+            return func(*args)
+        finally:
+            # 子线程中创建的数据库连接不会被 Django 请求结束信号关闭，需要主动释放
+            connections.close_all()
+            local.release()
+
+
+def fan_out(func: Callable, calls: Dict[Hashable, Tuple], **kwargs) -> FanOutResults:
+    """使用默认配置并发执行 func，参数见 FanOutExecutor"""
+    return FanOutExecutor(**kwargs).run(func, calls)
@@ -22,8 +22,10 @@ import tornado.httpserver
 import tornado.ioloop
 
 from backend.web_console import constants
+from backend.web_console.auditor import audit_writer
 from backend.web_console.handlers import WEBSOCKET_HANDLER_SET
 from backend.web_console.pod_life_cycle import PodLifeCycle
+from backend.web_console.registry import session_registry
 from backend.web_console.urls import handlers
 from backend.web_console.utils import _setup_logging
 
@@ -52,6 +54,11 @@ def exit_handler(server, sig, frame):
             handler.close()
         await tornado.gen.sleep(0.5)
 
+        logger.info("Flushing audit records")
+        session_registry.stop()
+        audit_writer.stop()
+        await audit_writer.drain()
+
         logger.info("Stopping io_loop")
         io_loop.stop()
 
@@ -74,6 +81,8 @@ def main():
 
     pod_life_cycle = PodLifeCycle()
     pod_life_cycle.start()
+    session_registry.start()
+    audit_writer.start()
     tornado.ioloop.IOLoop.instance().start()
 
 
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""操作审计记录，进程内共享一个写入器，批量写入 redis 队列
+"""
+import copy
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+from django.conf import settings
+from tornado import gen
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+from backend.web_console import constants
+from backend.web_console.utils import WebConsoleFormatter
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """异步的审计记录写入器
+
+    - emit 只把记录放入内存队列，由周期任务在单独线程中用 pipeline 批量 RPUSH
+    - 队列达到上限时 is_full 为 True，调用方应暂缓上报(记录保留在会话中)，以此形成背压
+    """
+
+    def __init__(self, client, queue_name, formatter, max_pending=constants.AUDIT_MAX_PENDING):
+        self.client = client
+        self.queue_name = queue_name
+        self.formatter = formatter
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._inflight = False
+        self._callback = None
+
+    def is_full(self):
+        return len(self._pending) >= self.max_pending
+
+    def emit(self, record):
+        """放入待写入队列，队列已满时丢弃并返回 False"""
+        if self.is_full():
+            logger.warning("audit queue is full, drop record of session %s", record.get("session_id"))
+            return False
+        self._pending.append(record)
+        return True
+
+    def start(self):
+        if self._callback is None:
+            self._callback = PeriodicCallback(self.flush, constants.AUDIT_FLUSH_INTERVAL * 1000)
+            self._callback.start()
+
+    def stop(self):
+        if self._callback is not None:
+            self._callback.stop()
+            self._callback = None
+
+    async def flush(self):
+        if self._inflight or not self._pending:
+            return
+
+        batch = [self._pending.popleft() for _ in range(min(len(self._pending), constants.AUDIT_BATCH_SIZE))]
+        self._inflight = True
+        try:
+            await IOLoop.current().run_in_executor(self._executor, self.write, batch)
+        except Exception as error:
+            logger.error("write audit records error: %s", error)
+            # 写入失败时放回队列头部，超出上限的部分丢弃
+            space = self.max_pending - len(self._pending)
+            self._pending.extendleft(reversed(batch[:max(space, 0)]))
+        finally:
+            self._inflight = False
+
+    async def drain(self):
+        """进程退出前写入全部待写记录：先等待进行中的写入完成，再逐批写入直到队列为空"""
+        while self._inflight:
+            await gen.sleep(0.05)
+
+        while self._pending:
+            pending_num = len(self._pending)
+            await self.flush()
+            # 写入失败时记录会放回队列，不再重试
+            if len(self._pending) >= pending_num:
+                logger.error("drain audit records failed, %s records dropped", len(self._pending))
+                return
+
+    def write(self, records):
+        if self.client is None:
+            for record in records:
+                logger.info("audit record: %s", record)
+            return
+
+        pipe = self.client.pipeline(transaction=False)
+        for record in records:
+            pipe.rpush(self.queue_name, self.formatter.format(record))
+        pipe.execute()
+
+
+def make_audit_writer():
+    """复用 RDS_HANDER_SETTINGS 的 redis 配置，未配置时退化为写日志"""
+    try:
+        auditor_handler = copy.deepcopy(settings.RDS_HANDER_SETTINGS)
+        auditor_handler['queue_name'] = 'bcs_web_console_record'
+        auditor_handler['tags'].append('bcs-web-console')
+
+        pool = redis.BlockingConnectionPool.from_url(auditor_handler['redis_url'], max_connections=2, timeout=1)
+        client = redis.Redis(connection_pool=pool)
+        formatter = WebConsoleFormatter(auditor_handler['message_type'], auditor_handler['tags'], fqdn=False)
+        return AuditWriter(client, auditor_handler['queue_name'], formatter)
+    except Exception as error:
+        logger.warning("init audit writer with redis failed, fallback to logger: %s", error)
+        return AuditWriter(None, None, None)
+
+
+audit_writer = make_audit_writer()
@@ -16,7 +16,6 @@ import logging
 import shlex
 from urllib.parse import urlencode
 
-import arrow
 from django.utils.encoding import smart_text
 from django.utils.translation import ugettext_lazy as _
 import tornado.gen
@@ -25,7 +24,8 @@ from tornado.ioloop import IOLoop
 from tornado.websocket import websocket_connect
 
 from backend.web_console import constants
-from backend.web_console.utils import clean_bash_escape, hello_message
+from backend.web_console.recorder import OutputRecorder
+from backend.web_console.utils import hello_message
 
 logger = logging.getLogger(__name__)
 
@@ -40,8 +40,7 @@ class BCSClientBase(abc.ABC):
         self.msg_handler = msg_handler
         self.ws = None
 
-        self.output_record = []
-        self.output_buffer = ""
+        self.output_recorder = OutputRecorder()
         self.last_output_ts = IOLoop.current().time()
 
     @tornado.gen.coroutine
@@ -66,9 +65,7 @@ class BCSClientBase(abc.ABC):
     def flush_output_record(self):
         """获取输出记录
         """
-        record = self.output_record[:]
-        self.output_record = []
-        return record
+        return self.output_recorder.flush()
 
     def close_transmission(self):
         """结束通讯, 发送CTRL-D
@@ -132,15 +129,7 @@ class BCSClientBase(abc.ABC):
                 except Exception:
                     msg = smart_text(msg, "latin1")
 
-                self.output_buffer += msg
-
-                if constants.OUTPUT_LINE_BREAKER in self.output_buffer:
-                    line_msg = self.output_buffer.split(constants.OUTPUT_LINE_BREAKER)
-                    for i in line_msg[:-1]:
-                        record = "%s: %s" % (arrow.now().strftime("%Y-%m-%d %H:%M:%S.%f"), clean_bash_escape(i))
-                        self.output_record.append(record)
-                    # 前面多行已经赋值到record, 最后一行可能剩余未换行的数据
-                    self.output_buffer = line_msg[-1]
+                self.output_recorder.feed(msg)
 
                 # 前端对\r不会换行处理，在后台替换，规则是前后没有\n的\r字符，都会添加\n
                 # msg = re.sub(r'(?<!\n)\r(?!\n)', '\r\n', msg)
@@ -25,6 +25,9 @@ from backend.web_console.constant_bk import *  # noqa
 INPUT_LINE_BREAKER = "\r"
 # 输出分行标识
 OUTPUT_LINE_BREAKER = "\r\n"
+# 每个上报周期最多记录的输出行数、单行最多记录的字符数
+OUTPUT_RECORD_MAX_LINES = 2000
+OUTPUT_RECORD_MAX_LINE_LENGTH = 4096
 
 STDIN_CHANNEL = 0
 STDOUT_CHANNEL = 1
@@ -43,6 +46,12 @@ HELLO_MESSAGE = "Welcome To BCS Console"
 WEBSOCKET_PING_INTERVAL = 10
 # pod清理时间间隔
 CLEAN_USER_POD_INTERVAL = 60
+# 心跳上报时间间隔
+HEARTBEAT_INTERVAL = 1
+# 操作审计记录写入间隔、每批写入条数、最多缓存的条数
+AUDIT_FLUSH_INTERVAL = 1
+AUDIT_BATCH_SIZE = 500
+AUDIT_MAX_PENDING = 10000
 # 锁偏差时间常量
 LOCK_SHIFT = -2
 
@@ -52,11 +61,32 @@ TICK_TIMEOUT = 60 * 30
 LOGIN_TIMEOUT = 60 * 60 * 24
 # 清理POD，4个小时
 USER_POD_EXPIRE_TIME = 3600 * 4
+# 清理POD时并发处理的集群数
+CLEAN_USER_POD_MAX_WORKERS = getattr(settings, "WEB_CONSOLE_CLEAN_POD_MAX_WORKERS", 10)
+# 增量同步 pod 时 watch 的时长(秒)
+CLEAN_USER_POD_WATCH_TIMEOUT = 1
+# 单次 delete_collection 最多删除的 pod 数量，避免 label_selector 过长
+CLEAN_USER_POD_BATCH_SIZE = 50
+# 最近一次清理的统计信息
+WEB_CONSOLE_CLEAN_STATS_KEY = "bcs::web_console::clean_user_pod"
 # Context 过期时间, 12个小时
 USER_CTX_EXPIRE_TIME = 3600 * 12
 
+# 每个集群预先创建的空闲 pod 数量
+POD_POOL_SIZE = getattr(settings, "WEB_CONSOLE_POD_POOL_SIZE", 0)
+# 空闲 pod 的模板，按集群保存，打开 web console 时刷新
+WEB_CONSOLE_POD_POOL_TEMPLATE_KEY = "bcs::web_console::pod_pool::{cluster_id}"
+# 领取空闲 pod 时写入 kubeconfig 的超时时间(秒)
+POD_POOL_EXEC_TIMEOUT = 5
+
 WEB_CONSOLE_HEARTBEAT_KEY = "bcs::web_console::heartbeat"
 LABEL_WEB_CONSOLE_CREATE_TIMESTAMP = "io.tencent.web_console.create_timestamp"
+# 用户 pod 及其 configmap 上标记所属的 pod 名称，用于按标签批量删除
+LABEL_WEB_CONSOLE_USER_POD = "io.tencent.web_console.user_pod"
+# 预热 pod 所属的集群及状态
+LABEL_WEB_CONSOLE_POOL = "io.tencent.web_console.pool"
+LABEL_WEB_CONSOLE_POOL_STATE = "io.tencent.web_console.pool_state"
+
 NAMESPACE = "web-console"
 
 # 1080p页面测试得来
@@ -64,6 +94,11 @@ DEFAULT_COLS = 211
 DEFAULT_ROWS = 25
 
 
+class PodPoolState(Enum):
+    IDLE = "idle"
+    ASSIGNED = "assigned"
+
+
 class WebConsoleMode(Enum):
     # 用户自己集群
     INTERNEL = "internel"
@@ -25,9 +25,10 @@ from tornado import locale
 from tornado.ioloop import IOLoop, PeriodicCallback
 
 from backend.web_console import bcs_client, constants, utils
+from backend.web_console.auditor import audit_writer
 from backend.web_console.auth import authenticated
-from backend.web_console.pod_life_cycle import PodLifeCycle
-from backend.web_console.utils import clean_bash_escape, get_auditor
+from backend.web_console.registry import session_registry
+from backend.web_console.utils import clean_bash_escape
 
 WEBSOCKET_HANDLER_SET = set()
 logger = logging.getLogger(__name__)
@@ -100,9 +101,7 @@ class BCSWebSocketHandler(LocaleHandlerMixin, tornado.websocket.WebSocketHandler
         self.record_callback = None
         self.tick_callback = None
         self.record_interval = 10
-        self.heartbeat_callback = None
-        self.auditor = get_auditor()
-        self.pod_life_cycle = PodLifeCycle()
+        self.registered = False
         self.exit_buffer = ""
         self.exit_command = "exit"
         self.user_pod_name = None
@@ -175,9 +174,9 @@ class BCSWebSocketHandler(LocaleHandlerMixin, tornado.websocket.WebSocketHandler
             logger.info("stop record_callback, %s", self.user_pod_name)
             self.record_callback.stop()
 
-        if self.heartbeat_callback:
-            logger.info("stop heartbeat_callback, %s", self.user_pod_name)
-            self.heartbeat_callback.stop()
+        if self.registered:
+            session_registry.unregister(self.user_pod_name)
+            self.registered = False
 
         self.bcs_client.close_transmission()
         WEBSOCKET_HANDLER_SET.remove(self)
@@ -218,10 +217,11 @@ class BCSWebSocketHandler(LocaleHandlerMixin, tornado.websocket.WebSocketHandler
         logger.info("tick active %s, login time, %.2f", self.user_pod_name, login_time)
 
     def heartbeat(self):
-        """每秒钟上报心跳
+        """登记到进程内的会话注册表，由注册表统一批量上报心跳
         """
-        self.heartbeat_callback = PeriodicCallback(lambda: self.pod_life_cycle.heartbeat(self.user_pod_name), 1000)
-        self.heartbeat_callback.start()
+        if not self.registered:
+            session_registry.register(self.user_pod_name)
+            self.registered = True
 
     def start_record(self):
         """操作审计"""
@@ -231,6 +231,11 @@ class BCSWebSocketHandler(LocaleHandlerMixin, tornado.websocket.WebSocketHandler
     def periodic_record(self):
         """周期上报操作记录
         """
+        # 写入队列已满时暂不上报，记录保留到下个周期
+        if audit_writer.is_full():
+            logger.warning("audit writer is busy, delay record of %s", self.user_pod_name)
+            return
+
         input_record = self.flush_input_record()
         output_record = self.bcs_client.flush_output_record()
 
@@ -248,8 +253,8 @@ class BCSWebSocketHandler(LocaleHandlerMixin, tornado.websocket.WebSocketHandler
             "user_pod_name": self.user_pod_name,
             "username": self.context["username"],
         }
-        self.auditor.emit(data)
-        logger.info(data)
+        audit_writer.emit(data)
+        logger.debug(data)
 
     def send_message(self, message):
         if not self.bcs_client.ws or self.bcs_client.ws.stream.closed():
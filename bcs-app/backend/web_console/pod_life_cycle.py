@@ -11,10 +11,13 @@
 # an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 #
+import copy
 import json
 import logging
+import random
 import shlex
 import time
+import uuid
 import base64
 from concurrent.futures import ThreadPoolExecutor
 
@@ -23,18 +26,22 @@ from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.translation import ugettext_lazy as _
 from django.utils.encoding import smart_text
-from kubernetes import client
+from kubernetes import client, watch
 from kubernetes.client.rest import ApiException
 from kubernetes.stream import stream
 from tornado.concurrent import run_on_executor
 from tornado.ioloop import PeriodicCallback
 
 from backend.utils.cache import rd_client
+from backend.utils.concurrency import fan_out
 from backend.utils.lock import redis_lock
 from backend.web_console import constants
 
 logger = logging.getLogger(__name__)
 
+# conf_tpl/pod.yaml 中挂载用户 kubeconfig 的卷名
+KUBECONFIG_VOLUME_NAME = "kube-config"
+
 
 class PodLifeError(Exception):
     pass
@@ -85,62 +92,334 @@ class PodLifeCycle:
             logger.error("clean user pod error: %s", error)
 
     def _clean_user_pod(self):
-        """单个集群清理
+        """并发清理所有集群
         """
-        alive_pods = self.get_active_user_pod()
+        start = time.monotonic()
+        alive_pods = set(self.get_active_user_pod())
+        min_expire_time = time.time() - constants.USER_POD_EXPIRE_TIME
 
-        for v1, cluster_id in K8SClient.iter_client():
-            try:
-                pod_list = v1.list_namespaced_pod(namespace=constants.NAMESPACE)
-                self._clean_user_pod_by_cluster(v1, pod_list, alive_pods)
-            except Exception as error:
-                logger.info("clean %s pod not success, %s", cluster_id, error)
+        calls = {cluster_id: (v1, cluster_id, alive_pods, min_expire_time) for v1, cluster_id in K8SClient.iter_client()}
+        results = fan_out(
+            self._clean_user_pod_by_cluster, calls, max_workers=constants.CLEAN_USER_POD_MAX_WORKERS, timeout=None
+        )
+        user_pod_cache.prune(calls.keys())
 
-    def _clean_user_pod_by_cluster(self, v1, pod_list, alive_pods):
-        min_expire_time = time.time() - constants.USER_POD_EXPIRE_TIME
+        for cluster_id, error in results.failed.items():
+            logger.info("clean %s pod not success, %s", cluster_id, error)
 
-        for pod in pod_list.items:
-            if pod.status.phase == "Pending":
-                continue
+        stats = {
+            "duration": round(time.monotonic() - start, 3),
+            "clusters": len(calls),
+            "failed_clusters": len(results.failed),
+            "deleted_pods": sum(results.succeeded.values()),
+            "finished_at": int(time.time()),
+        }
+        rd_client.hmset(constants.WEB_CONSOLE_CLEAN_STATS_KEY, stats)
+        logger.info("clean user pod finished, %s", stats)
+
+    def _clean_user_pod_by_cluster(self, v1, cluster_id, alive_pods, min_expire_time):
+        """单个集群清理，返回删除的 pod 数量
+        """
+        pods = user_pod_cache.sync(cluster_id, v1)
+
+        try:
+            pod_pool.replenish(v1, cluster_id, pods)
+        except Exception as error:
+            logger.error("replenish pod pool of %s error: %s", cluster_id, error)
 
-            # 小于一个周期的pod不清理
-            if pod.metadata.labels and pod.metadata.labels.get(constants.LABEL_WEB_CONSOLE_CREATE_TIMESTAMP):
-                pod_create_time = int(pod.metadata.labels[constants.LABEL_WEB_CONSOLE_CREATE_TIMESTAMP])
+        expired_pods = [pod for pod in pods if self._is_expired(pod, alive_pods, min_expire_time)]
+        if not expired_pods:
+            return 0
+
+        # 带有 pod 名称标签的按标签批量删除，之前创建的 pod 没有该标签，逐个删除
+        labeled_pods = []
+        for pod in expired_pods:
+            if (pod.metadata.labels or {}).get(constants.LABEL_WEB_CONSOLE_USER_POD) == pod.metadata.name:
+                labeled_pods.append(pod.metadata.name)
             else:
-                pod_create_time = None
+                self._delete_user_pod(v1, pod)
 
-            if pod_create_time and pod_create_time > min_expire_time:
-                logger.info(
-                    "pod %s exist time %s > %s, just ignore", pod.metadata.name, pod_create_time, min_expire_time
-                )
-                continue
+        for i in range(0, len(labeled_pods), constants.CLEAN_USER_POD_BATCH_SIZE):
+            names = labeled_pods[i : i + constants.CLEAN_USER_POD_BATCH_SIZE]
+            label_selector = "%s in (%s)" % (constants.LABEL_WEB_CONSOLE_USER_POD, ",".join(names))
+            v1.delete_collection_namespaced_pod(constants.NAMESPACE, label_selector=label_selector)
+            v1.delete_collection_namespaced_config_map(constants.NAMESPACE, label_selector=label_selector)
+            logger.info("delete pods and configmaps of %s: %s", cluster_id, names)
 
-            # 有心跳上报的pod不清理
-            if pod.metadata.name in alive_pods:
-                continue
+        return len(expired_pods)
 
-            v1.delete_namespaced_pod(
-                name=pod.metadata.name, namespace=constants.NAMESPACE, body=client.V1DeleteOptions()
-            )
-            logger.info("delete pod %s", pod.metadata.name)
+    def _is_expired(self, pod, alive_pods, min_expire_time):
+        if pod.status.phase == "Pending":
+            return False
 
-            for volume in pod.spec.volumes:
-                cm = getattr(volume, "config_map", None)
-                if not cm:
-                    continue
+        # 已经在删除中
+        if pod.metadata.deletion_timestamp:
+            return False
 
-                cm_name = cm.name
+        # 空闲的预热 pod 由 pod_pool 维护
+        if pod_pool.is_idle(pod):
+            return False
 
-                v1.delete_namespaced_config_map(
-                    name=cm_name, namespace=constants.NAMESPACE, body=client.V1DeleteOptions()
-                )
-                logger.info("delete configmap %s", cm_name)
+        # 小于一个周期的pod不清理
+        if pod.metadata.labels and pod.metadata.labels.get(constants.LABEL_WEB_CONSOLE_CREATE_TIMESTAMP):
+            pod_create_time = int(pod.metadata.labels[constants.LABEL_WEB_CONSOLE_CREATE_TIMESTAMP])
+        else:
+            pod_create_time = None
+
+        if pod_create_time and pod_create_time > min_expire_time:
+            logger.debug("pod %s exist time %s > %s, just ignore", pod.metadata.name, pod_create_time, min_expire_time)
+            return False
+
+        # 有心跳上报的pod不清理
+        return pod.metadata.name not in alive_pods
+
+    def _delete_user_pod(self, v1, pod):
+        v1.delete_namespaced_pod(name=pod.metadata.name, namespace=constants.NAMESPACE, body=client.V1DeleteOptions())
+        logger.info("delete pod %s", pod.metadata.name)
+
+        for volume in pod.spec.volumes or []:
+            cm = getattr(volume, "config_map", None)
+            if not cm:
+                continue
+
+            cm_name = cm.name
+
+            v1.delete_namespaced_config_map(name=cm_name, namespace=constants.NAMESPACE, body=client.V1DeleteOptions())
+            logger.info("delete configmap %s", cm_name)
 
     def start(self):
         self.scheduler = PeriodicCallback(self.clean_user_pod, constants.CLEAN_USER_POD_INTERVAL * 1000)
         self.scheduler.start()
 
 
+class ResourceVersionExpired(Exception):
+    pass
+
+
+class UserPodCache:
+    """按集群缓存 web console 命名空间下的用户 pod
+
+    首次同步时按标签全量 list(resource_version="0"，由 apiserver 缓存返回)，之后从上次的 resourceVersion
+    开始 watch 一小段时间，只拉取变化的 pod；resourceVersion 过期或 watch 出错时退回全量 list
+    """
+
+    label_selector = constants.LABEL_WEB_CONSOLE_CREATE_TIMESTAMP
+
+    def __init__(self):
+        # cluster_id: (resource_version, {pod_name: pod})
+        self._clusters = {}
+
+    def sync(self, cluster_id, v1):
+        cached = self._clusters.pop(cluster_id, None)
+        if cached is not None:
+            try:
+                cached = self._watch(v1, *cached)
+            except ResourceVersionExpired as error:
+                logger.info("resource version of %s expired, relist pods, %s", cluster_id, error)
+                cached = None
+
+        if cached is None:
+            cached = self._list(v1)
+
+        self._clusters[cluster_id] = cached
+        return list(cached[1].values())
+
+    def prune(self, cluster_ids):
+        """去掉已经不需要清理的集群
+        """
+        for cluster_id in set(self._clusters) - set(cluster_ids):
+            self._clusters.pop(cluster_id, None)
+
+    def _list(self, v1):
+        pod_list = v1.list_namespaced_pod(
+            namespace=constants.NAMESPACE, label_selector=self.label_selector, resource_version="0"
+        )
+        return pod_list.metadata.resource_version, {pod.metadata.name: pod for pod in pod_list.items}
+
+    def _watch(self, v1, resource_version, pods):
+        stream = watch.Watch().stream(
+            v1.list_namespaced_pod,
+            namespace=constants.NAMESPACE,
+            label_selector=self.label_selector,
+            resource_version=resource_version,
+            timeout_seconds=constants.CLEAN_USER_POD_WATCH_TIMEOUT,
+        )
+        try:
+            for event in stream:
+                if event["type"] == "ERROR":
+                    raise ResourceVersionExpired(event.get("raw_object"))
+
+                pod = event["object"]
+                if event["type"] == "DELETED":
+                    pods.pop(pod.metadata.name, None)
+                else:
+                    pods[pod.metadata.name] = pod
+                resource_version = pod.metadata.resource_version
+        except ApiException as error:
+            if error.status == 410:
+                raise ResourceVersionExpired(error.reason)
+            raise
+        return resource_version, pods
+
+
+user_pod_cache = UserPodCache()
+
+
+class PodPool:
+    """预热的 kubectld pod 池
+
+    - 打开 web console 时按集群保存 pod 模板，由清理任务按模板补齐每个集群的空闲 pod，模板过期后回收空闲 pod
+    - 领取时通过带 resourceVersion 的 patch 修改标签，避免并发领取同一个 pod；kubeconfig 通过 exec 写入容器
+    """
+
+    def __init__(self, size=constants.POD_POOL_SIZE):
+        self.size = size
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    @staticmethod
+    def is_idle(pod):
+        labels = pod.metadata.labels or {}
+        return labels.get(constants.LABEL_WEB_CONSOLE_POOL_STATE) == constants.PodPoolState.IDLE.value
+
+    @staticmethod
+    def get_template_key(cluster_id):
+        return constants.WEB_CONSOLE_POD_POOL_TEMPLATE_KEY.format(cluster_id=cluster_id.lower())
+
+    def save_template(self, ctx):
+        """用当前用户的上下文渲染 pod，去掉用户相关的名称和 kubeconfig 挂载后作为模板
+        """
+        body = render_pod_body(ctx)
+        body["metadata"] = {}
+        spec = body["spec"]
+        # 只去掉用户的 kubeconfig 挂载，保留环境配置(pod_spec)中的其它卷
+        for container in spec["containers"]:
+            container["name"] = "kubectld"
+            mounts = [m for m in container.get("volumeMounts") or [] if m.get("name") != KUBECONFIG_VOLUME_NAME]
+            if mounts:
+                container["volumeMounts"] = mounts
+            else:
+                container.pop("volumeMounts", None)
+        volumes = [v for v in spec.get("volumes") or [] if v.get("name") != KUBECONFIG_VOLUME_NAME]
+        if volumes:
+            spec["volumes"] = volumes
+        else:
+            spec.pop("volumes", None)
+        rd_client.set(self.get_template_key(ctx["source_cluster_id"]), json.dumps(body), ex=constants.USER_CTX_EXPIRE_TIME)
+
+    def get_template(self, cluster_id):
+        data = rd_client.get(self.get_template_key(cluster_id))
+        if not data:
+            return None
+        return json.loads(data)
+
+    def replenish(self, v1, cluster_id, pods):
+        """补齐或回收集群的空闲 pod，pods 为 web console 命名空间下的所有 pod
+        """
+        idle_pods = [
+            pod
+            for pod in pods
+            if self.is_idle(pod)
+            and not pod.metadata.deletion_timestamp
+            and pod.metadata.labels.get(constants.LABEL_WEB_CONSOLE_POOL) == cluster_id
+        ]
+        template = self.get_template(cluster_id) if self.enabled else None
+        size = self.size if template else 0
+
+        for pod in idle_pods[size:]:
+            v1.delete_namespaced_pod(name=pod.metadata.name, namespace=constants.NAMESPACE, body=client.V1DeleteOptions())
+            logger.info("delete idle pod %s", pod.metadata.name)
+
+        for __ in range(size - len(idle_pods)):
+            body = copy.deepcopy(template)
+            body["metadata"] = {
+                "name": f"kubectld-{cluster_id}-pool-{uuid.uuid4().hex[:8]}",
+                "labels": {
+                    constants.LABEL_WEB_CONSOLE_CREATE_TIMESTAMP: str(int(time.time())),
+                    constants.LABEL_WEB_CONSOLE_POOL: cluster_id,
+                    constants.LABEL_WEB_CONSOLE_POOL_STATE: constants.PodPoolState.IDLE.value,
+                },
+            }
+            v1.create_namespaced_pod(body=body, namespace=constants.NAMESPACE)
+            logger.info("create idle pod %s", body["metadata"]["name"])
+
+    def claim(self, v1, ctx):
+        """领取一个空闲 pod 并写入用户的 kubeconfig，没有可用的 pod 时返回 None
+        """
+        cluster_id = ctx["source_cluster_id"].lower()
+        label_selector = "%s=%s,%s=%s" % (
+            constants.LABEL_WEB_CONSOLE_POOL,
+            cluster_id,
+            constants.LABEL_WEB_CONSOLE_POOL_STATE,
+            constants.PodPoolState.IDLE.value,
+        )
+        pods = v1.list_namespaced_pod(constants.NAMESPACE, label_selector=label_selector, resource_version="0").items
+        pods = [pod for pod in pods if pod.status.phase == "Running" and not pod.metadata.deletion_timestamp]
+        random.shuffle(pods)
+
+        for pod in pods:
+            body = {
+                "metadata": {
+                    "resourceVersion": pod.metadata.resource_version,
+                    "labels": {
+                        constants.LABEL_WEB_CONSOLE_CREATE_TIMESTAMP: str(int(time.time())),
+                        constants.LABEL_WEB_CONSOLE_POOL_STATE: constants.PodPoolState.ASSIGNED.value,
+                        constants.LABEL_WEB_CONSOLE_USER_POD: get_user_pod_name(ctx),
+                    },
+                }
+            }
+            try:
+                pod = v1.patch_namespaced_pod(pod.metadata.name, constants.NAMESPACE, body)
+            except ApiException as error:
+                # 已经被其它会话领取
+                if error.status in (404, 409):
+                    continue
+                raise
+
+            try:
+                self.write_kubeconfig(v1, pod.metadata.name, render_kubeconfig(ctx))
+            except Exception as error:
+                logger.error("write kubeconfig to %s error: %s", pod.metadata.name, error)
+                v1.delete_namespaced_pod(
+                    name=pod.metadata.name, namespace=constants.NAMESPACE, body=client.V1DeleteOptions()
+                )
+                return None
+
+            logger.info("claim idle pod %s for %s", pod.metadata.name, get_user_pod_name(ctx))
+            return pod
+
+        return None
+
+    def write_kubeconfig(self, v1, name, kubeconfig):
+        """通过标准输入写入 kubeconfig，不在命令参数中传递 token
+        """
+        data = kubeconfig.encode()
+        command = ["sh", "-c", f"mkdir -p /root/.kube && head -c {len(data)} > /root/.kube/config"]
+        resp = stream(
+            v1.connect_get_namespaced_pod_exec,
+            name,
+            constants.NAMESPACE,
+            command=command,
+            stderr=True,
+            stdin=True,
+            stdout=True,
+            tty=False,
+            _preload_content=False,
+        )
+        try:
+            resp.write_stdin(kubeconfig)
+            resp.run_forever(timeout=constants.POD_POOL_EXEC_TIMEOUT)
+            if resp.returncode != 0:
+                raise PodLifeError("write kubeconfig failed: %s" % resp.read_stderr())
+        finally:
+            resp.close()
+
+
+pod_pool = PodPool()
+
+
 class K8SClient(object):
     CACHE_KEY_PREFIX = "K8S:USER_TOKEN"
 
@@ -310,6 +589,27 @@ def ensure_namespace(ctx):
                 raise error
 
 
+def get_user_pod_name(ctx):
+    name = "kubectld-%s-u%s" % (ctx["source_cluster_id"], ctx["username_slug"])
+    return name.lower()
+
+
+def render_pod_body(ctx):
+    ctx["LABEL_WEB_CONSOLE_CREATE_TIMESTAMP"] = constants.LABEL_WEB_CONSOLE_CREATE_TIMESTAMP
+    ctx["LABEL_WEB_CONSOLE_USER_POD"] = constants.LABEL_WEB_CONSOLE_USER_POD
+    ctx["create_timestamp"] = int(time.time())
+    body = yaml.load(render_to_string("conf_tpl/pod.yaml", ctx))
+    # 添加环境特有变量
+    body["spec"].update(ctx["pod_spec"])
+    return body
+
+
+def render_kubeconfig(ctx):
+    ctx["LABEL_WEB_CONSOLE_USER_POD"] = constants.LABEL_WEB_CONSOLE_USER_POD
+    body = yaml.load(render_to_string("conf_tpl/configmap.yaml", ctx))
+    return body["data"]["config"]
+
+
 def ensure_configmap(ctx):
     """创建configmap
     """
@@ -317,6 +617,7 @@ def ensure_configmap(ctx):
     name = name.lower()
 
     k8s_client = K8SClient(ctx)
+    ctx["LABEL_WEB_CONSOLE_USER_POD"] = constants.LABEL_WEB_CONSOLE_USER_POD
     try:
         cm = k8s_client.v1.read_namespaced_config_map(name, namespace=constants.NAMESPACE)
         return cm
@@ -336,8 +637,7 @@ def ensure_configmap(ctx):
 def ensure_pod(ctx):
     """创建configmap
     """
-    name = "kubectld-%s-u%s" % (ctx["source_cluster_id"], ctx["username_slug"])
-    name = name.lower()
+    name = get_user_pod_name(ctx)
 
     k8s_client = K8SClient(ctx)
 
@@ -349,12 +649,7 @@ def ensure_pod(ctx):
     except ApiException as error:
         # 不存在，则创建
         if error.status == 404:
-            # 添加时间戳
-            ctx["LABEL_WEB_CONSOLE_CREATE_TIMESTAMP"] = constants.LABEL_WEB_CONSOLE_CREATE_TIMESTAMP
-            ctx["create_timestamp"] = int(time.time())
-            body = yaml.load(render_to_string("conf_tpl/pod.yaml", ctx))
-            # 添加环境特有变量
-            body["spec"].update(ctx["pod_spec"])
+            body = render_pod_body(ctx)
             try:
                 k8s_client.v1.create_namespaced_pod(body=body, namespace=constants.NAMESPACE)
                 pod = wait_user_pod_ready(ctx, name)
@@ -366,3 +661,23 @@ def ensure_pod(ctx):
             except ApiException as error:
                 raise error
         raise error
+
+
+def ensure_pool_pod(ctx):
+    """启用预热池时，优先使用用户已有的 pod，否则从池中领取；返回 None 时走原有的创建流程
+    """
+    if not pod_pool.enabled:
+        return None
+
+    pod_pool.save_template(ctx)
+
+    v1 = K8SClient(ctx).v1
+    label_selector = "%s=%s" % (constants.LABEL_WEB_CONSOLE_USER_POD, get_user_pod_name(ctx))
+    for pod in v1.list_namespaced_pod(constants.NAMESPACE, label_selector=label_selector).items:
+        if pod.status.phase == "Running" and not pod.metadata.deletion_timestamp:
+            return pod
+
+    pod = pod_pool.claim(v1, ctx)
+    if pod:
+        PodLifeCycle.heartbeat(pod.metadata.name)
+    return pod
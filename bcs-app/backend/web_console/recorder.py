@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""终端输出记录
+"""
+import time
+from collections import deque
+from datetime import datetime
+
+from backend.web_console import constants
+from backend.web_console.utils import clean_bash_escape
+
+
+class OutputRecorder:
+    """有界的终端输出记录器
+
+    - 增量切分行，只保留未换行的尾部数据，单行超过 max_line_length 时只保留最新的部分(如进度条)
+    - 按行记录单调时钟，格式化时间和清理转义字符都推迟到 flush 时进行
+    - 使用环形缓冲区，每个上报周期最多保留 max_lines 行，超出时丢弃最早的行并计数
+
+    :param max_lines: 每个上报周期最多保留的行数
+    :param max_line_length: 单行最多保留的字符数
+    """
+
+    def __init__(
+        self, max_lines=constants.OUTPUT_RECORD_MAX_LINES, max_line_length=constants.OUTPUT_RECORD_MAX_LINE_LENGTH
+    ):
+        self.max_line_length = max_line_length
+        self.breaker = constants.OUTPUT_LINE_BREAKER
+        self._lines = deque(maxlen=max_lines)
+        self._partial = []
+        self._partial_length = 0
+        self._dropped = 0
+
+    def __len__(self):
+        return len(self._lines)
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def _append_partial(self, text):
+        if not text:
+            return
+        self._partial.append(text)
+        self._partial_length += len(text)
+        if self._partial_length > self.max_line_length:
+            tail = "".join(self._partial)[-self.max_line_length:]
+            self._partial = [tail]
+            self._partial_length = len(tail)
+
+    def _append_line(self, line, ts):
+        if len(self._lines) == self._lines.maxlen:
+            self._dropped += 1
+        self._lines.append((ts, line[-self.max_line_length:]))
+
+    def feed(self, message):
+        """写入一段输出"""
+        # 换行符可能被拆分在两段消息中
+        if self._partial and self._partial[-1].endswith(self.breaker[0]) and message.startswith(self.breaker[1:]):
+            last = self._partial.pop()
+            self._partial_length -= len(last)
+            message = last + message
+
+        if self.breaker not in message:
+            self._append_partial(message)
+            return
+
+        ts = time.monotonic()
+        lines = message.split(self.breaker)
+        first = lines[0]
+        if self._partial:
+            self._partial.append(first)
+            first = "".join(self._partial)
+            self._partial = []
+            self._partial_length = 0
+        self._append_line(first, ts)
+
+        # 只有最后的 max_lines 行会被保留
+        middle = lines[1:-1]
+        skip = max(len(middle) - self._lines.maxlen, 0)
+        if skip:
+            self._dropped += skip
+            middle = middle[skip:]
+        for line in middle:
+            self._append_line(line, ts)
+
+        self._append_partial(lines[-1])
+
+    def flush(self):
+        """取出已完成的行，格式化为 `时间: 内容`"""
+        if not self._lines:
+            return []
+
+        # 单调时钟转换为当前的墙上时间
+        offset = time.time() - time.monotonic()
+        records = []
+        if self._dropped:
+            records.append("... %s lines dropped ..." % self._dropped)
+        for ts, line in self._lines:
+            records.append(
+                "%s: %s" % (datetime.fromtimestamp(ts + offset).strftime("%Y-%m-%d %H:%M:%S.%f"), clean_bash_escape(line))
+            )
+        self._lines.clear()
+        self._dropped = 0
+        return records
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community Edition) available.
+# Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+# an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+"""进程内的 web console 会话登记，统一上报心跳
+"""
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+from backend.utils.cache import rd_client
+from backend.web_console import constants
+
+logger = logging.getLogger(__name__)
+
+
+class SessionRegistry:
+    """登记当前进程中存活的会话，每个周期用一次 ZADD 上报全部会话的心跳
+
+    Redis 写入在单独的线程中执行，不阻塞 IOLoop；上一次写入未完成时跳过本次上报
+    """
+
+    def __init__(self, interval=constants.HEARTBEAT_INTERVAL):
+        self.interval = interval
+        # 同一个 pod 可能被多个会话使用，按引用计数登记
+        self._pods = Counter()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._inflight = False
+        self._callback = None
+
+    def register(self, user_pod_name):
+        self._pods[user_pod_name] += 1
+
+    def unregister(self, user_pod_name):
+        self._pods[user_pod_name] -= 1
+        if self._pods[user_pod_name] <= 0:
+            del self._pods[user_pod_name]
+
+    @property
+    def pods(self):
+        return list(self._pods)
+
+    def start(self):
+        if self._callback is None:
+            self._callback = PeriodicCallback(self.heartbeat, self.interval * 1000)
+            self._callback.start()
+
+    def stop(self):
+        if self._callback is not None:
+            self._callback.stop()
+            self._callback = None
+
+    async def heartbeat(self):
+        if self._inflight or not self._pods:
+            return
+
+        self._inflight = True
+        try:
+            await IOLoop.current().run_in_executor(self._executor, self.report, self.pods)
+        except Exception as error:
+            logger.error("report web console heartbeat error: %s", error)
+        finally:
+            self._inflight = False
+
+    @staticmethod
+    def report(pods):
+        now = time.time()
+        logger.debug("heartbeat: %s", pods)
+        return rd_client.zadd(constants.WEB_CONSOLE_HEARTBEAT_KEY, **{name: now for name in pods})
+
+
+session_registry = SessionRegistry()
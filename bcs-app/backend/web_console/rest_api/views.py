@@ -76,9 +76,12 @@ class WebConsoleSession(views.APIView):
         ctx.update(bcs_context)
         try:
             pod_life_cycle.ensure_namespace(ctx)
-            configmap = pod_life_cycle.ensure_configmap(ctx)
-            logger.debug("get configmap %s", configmap)
-            pod = pod_life_cycle.ensure_pod(ctx)
+            # 优先使用预热的 pod
+            pod = pod_life_cycle.ensure_pool_pod(ctx)
+            if pod is None:
+                configmap = pod_life_cycle.ensure_configmap(ctx)
+                logger.debug("get configmap %s", configmap)
+                pod = pod_life_cycle.ensure_pod(ctx)
             logger.debug("get pod %s", pod)
         except pod_life_cycle.PodLifeError as error:
             logger.error("kubetctl apply error: %s", error)
@@ -11,14 +11,11 @@
 # an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 # specific language governing permissions and limitations under the License.
 #
-import copy
 import logging
 import time
 
-from django.conf import settings
 from logstash.formatter import LogstashFormatterBase
 
-from backend.utils.log import LogstashRedisHandler
 from backend.web_console import constants
 
 logger = logging.getLogger(__name__)
@@ -88,30 +85,6 @@ def clean_bash_escape(text):
     return text
 
 
-def get_auditor():
-    """操作审计记录
-    """
-    try:
-        # 复用redis的配置
-        auditor_handler = copy.deepcopy(settings.RDS_HANDER_SETTINGS)
-        auditor_handler['queue_name'] = 'bcs_web_console_record'
-        auditor_handler['tags'].append('bcs-web-console')
-
-        # 初始化logger
-        auditor = LogstashRedisHandler(
-            auditor_handler['redis_url'],
-            auditor_handler['queue_name'],
-            auditor_handler['tags'])
-        auditor.formatter = WebConsoleFormatter(
-            auditor_handler['message_type'],
-            auditor_handler['tags'], fqdn=False)
-    except Exception:
-        # fallbck to normal logger
-        auditor = logging.getLogger('auditor')
-
-    return auditor
-
-
 def _setup_logging(verbose=None, filename=None):
     """设置日志级别
     """